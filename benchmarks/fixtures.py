@@ -0,0 +1,142 @@
+import json
+import math
+import os
+import numpy as np
+import shapefile  # type: ignore
+from src.constants.data import (
+    ROUTE_NUMBER_COLUMN,
+    STOP_NUMBER_COLUMN,
+    RUN_NUMBER_COLUMN,
+    STOP_SEQUENCE_NUMBER_COLUMN,
+    STOP_TITLE_COLUMN,
+    X_COLUMN,
+    Y_COLUMN,
+    ROUTE_RUN_NUMBER,
+    ROUTES_COLUMN,
+)
+
+HUB_STOP_ID = "HUB"
+STOP_SPACING_METERS = 300
+STOPS_PER_ROUTE = 24
+
+
+class SyntheticNetwork:
+    """Paths of a generated network: the two tables the parsers read, plus a ``train_data.json`` with one map."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.routes_data_path = os.path.join(directory, "stops_per_route.dbf")
+        self.stops_data_path = os.path.join(directory, "stops.dbf")
+        self.training_data_path = os.path.join(directory, "train_data.json")
+
+
+def generate_network(directory: str, num_stops: int, seed: int = 0) -> SyntheticNetwork:
+    """
+    Writes a star-shaped network of roughly ``num_stops`` stops to ``directory``.
+
+    Every route is a jittered straight line through a shared hub stop, driven in both directions, so the map starting
+    at the hub contains every route: two lines of ``STOPS_PER_ROUTE // 2 + 1`` stops each per route.
+    """
+    assert num_stops >= STOPS_PER_ROUTE, f"A network needs at least {STOPS_PER_ROUTE} stops"
+
+    os.makedirs(directory, exist_ok=True)
+    network = SyntheticNetwork(directory)
+    rand_gen = np.random.default_rng(seed)
+
+    num_routes = num_stops // STOPS_PER_ROUTE
+    stop_positions: dict[str, tuple[int, int]] = {HUB_STOP_ID: (0, 0)}
+    runs: list[tuple[str, str, list[str]]] = []
+    for route_index in range(num_routes):
+        route_id = f"R{route_index}"
+        angle = 2 * math.pi * route_index / num_routes + rand_gen.uniform(-0.1, 0.1)
+
+        arms: list[list[str]] = []
+        for side in (1, -1):
+            arm: list[str] = []
+            for distance in range(1, STOPS_PER_ROUTE // 2 + 1):
+                stop_id = f"{route_id}_{'A' if side == 1 else 'B'}{distance}"
+                jitter = rand_gen.integers(-STOP_SPACING_METERS // 4, STOP_SPACING_METERS // 4, size=2)
+                stop_positions[stop_id] = (
+                    int(side * distance * STOP_SPACING_METERS * math.cos(angle) + jitter[0]),
+                    int(side * distance * STOP_SPACING_METERS * math.sin(angle) + jitter[1]),
+                )
+                arm.append(stop_id)
+            arms.append(arm)
+
+        # Maps follow a single run per route from the starting stop, so each direction is a route of its own
+        runs.append((f"{route_id}A", "1", arms[1][::-1] + [HUB_STOP_ID] + arms[0]))
+        runs.append((f"{route_id}B", "1", arms[0][::-1] + [HUB_STOP_ID] + arms[1]))
+
+    __write_stops_per_route(network.routes_data_path, runs, stop_positions)
+    __write_stops(network.stops_data_path, runs, stop_positions)
+    __write_training_data(network.training_data_path, runs, rand_gen)
+
+    return network
+
+
+def __write_stops_per_route(
+    path: str, runs: list[tuple[str, str, list[str]]], stop_positions: dict[str, tuple[int, int]]
+) -> None:
+    writer = shapefile.Writer(path.removesuffix(".dbf"), shapeType=shapefile.POINT)
+    writer.field(ROUTE_NUMBER_COLUMN, "C", 10)
+    writer.field(STOP_NUMBER_COLUMN, "C", 16)
+    writer.field(RUN_NUMBER_COLUMN, "C", 4)
+    writer.field(STOP_SEQUENCE_NUMBER_COLUMN, "N", 6)
+    writer.field(STOP_TITLE_COLUMN, "C", 40)
+    writer.field(X_COLUMN, "N", 12)
+    writer.field(Y_COLUMN, "N", 12)
+    writer.field(ROUTE_RUN_NUMBER, "C", 16)
+
+    for route_id, run_id, stop_ids in runs:
+        for sequence_number, stop_id in enumerate(stop_ids):
+            x, y = stop_positions[stop_id]
+            writer.point(x, y)
+            writer.record(route_id, stop_id, run_id, sequence_number, f"Stop {stop_id}", x, y, f"{route_id}_{run_id}")
+
+    writer.close()
+
+
+def __write_stops(
+    path: str, runs: list[tuple[str, str, list[str]]], stop_positions: dict[str, tuple[int, int]]
+) -> None:
+    routes_per_stop: dict[str, set[str]] = {stop_id: set() for stop_id in stop_positions}
+    for route_id, _, stop_ids in runs:
+        for stop_id in stop_ids:
+            routes_per_stop[stop_id].add(route_id)
+
+    writer = shapefile.Writer(path.removesuffix(".dbf"), shapeType=shapefile.POINT)
+    writer.field(STOP_NUMBER_COLUMN, "C", 16)
+    writer.field(STOP_TITLE_COLUMN, "C", 40)
+    writer.field(X_COLUMN, "N", 12)
+    writer.field(Y_COLUMN, "N", 12)
+    writer.field(ROUTES_COLUMN, "C", 254)
+
+    for stop_id, (x, y) in stop_positions.items():
+        writer.point(x, y)
+        writer.record(stop_id, f"Stop {stop_id}", x, y, " ".join(sorted(routes_per_stop[stop_id]))[:254].rstrip())
+
+    writer.close()
+
+
+def __write_training_data(path: str, runs: list[tuple[str, str, list[str]]], rand_gen: np.random.Generator) -> None:
+    directions = ["E", "NE", "N", "NW", "W", "SW", "S", "SE"]
+    starting_positions = {}
+    line_color_map = {}
+    for index, (route_id, run_id, _) in enumerate(runs):
+        line_id = f"{route_id}_{run_id}"
+        # Fan the lines out from the origin so they do not start on top of each other
+        starting_positions[line_id] = [[(index % 8) * 4, (index // 8) * 4], directions[index % len(directions)]]
+        line_color_map[line_id] = rand_gen.integers(64, 256, size=3).tolist()
+
+    training_data = {
+        "synthetic": {
+            "starting_stops": [HUB_STOP_ID],
+            "starting_positions": starting_positions,
+            "line_color_map": line_color_map,
+            "turn_limits": [4, 7],
+            "stop_spacing": 4,
+        }
+    }
+
+    with open(path, "w") as json_file:
+        json.dump(training_data, json_file)
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any
+import numpy as np
+from benchmarks.fixtures import SyntheticNetwork, generate_network
+from src.data_handling.load import load_training_data
+from src.environment.metro_map_env import MetroMapEnv
+from src.environment.random_options import RandomOptions
+
+DEFAULT_SIZES = [50, 500, 2000, 10000]
+# Probabilities of actions 0-5 in the scripted sequences: mostly forward, with regular turns and stop placements
+ACTION_PROBABILITIES = [0.4, 0.1, 0.05, 0.1, 0.05, 0.3]
+
+
+def scripted_actions(num_actions: int, seed: int) -> list[int]:
+    rand_gen = np.random.default_rng(seed)
+    return rand_gen.choice(len(ACTION_PROBABILITIES), size=num_actions, p=ACTION_PROBABILITIES).tolist()
+
+
+def make_env(network: SyntheticNetwork, max_steps: int, render_mode: str | None = None) -> MetroMapEnv:
+    training_data = load_training_data(network.training_data_path)
+    random_options = RandomOptions(
+        training_data, routes_data_path=network.routes_data_path, stops_data_path=network.stops_data_path
+    )
+
+    return MetroMapEnv(training_data, max_steps=max_steps, render_mode=render_mode, random_options=random_options)
+
+
+def measure_steps(env: MetroMapEnv, actions: list[int], seed: int) -> dict[str, float]:
+    env.reset(seed=seed)
+
+    episodes = 0
+    elapsed = 0.0
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            elapsed += time.perf_counter() - start
+            episodes += 1
+            env.reset()
+            start = time.perf_counter()
+    elapsed += time.perf_counter() - start
+
+    return {"steps_per_sec": len(actions) / elapsed, "episodes": episodes}
+
+
+def measure_resets(env: MetroMapEnv, num_resets: int, seed: int) -> dict[str, float]:
+    start = time.perf_counter()
+    env.reset(seed=seed)
+    first_reset = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(num_resets):
+        start = time.perf_counter()
+        env.reset()
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "first_reset_ms": first_reset * 1000,
+        "reset_mean_ms": float(np.mean(latencies)) * 1000,
+        "reset_p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "reset_p95_ms": float(np.percentile(latencies, 95)) * 1000,
+    }
+
+
+def measure_renders(env: MetroMapEnv, actions: list[int], render_every: int, seed: int) -> dict[str, float]:
+    env.reset(seed=seed)
+
+    latencies = []
+    for step, action in enumerate(actions):
+        _, _, terminated, truncated, _ = env.step(action)
+        if step % render_every == 0:
+            start = time.perf_counter()
+            env.render()
+            latencies.append(time.perf_counter() - start)
+        if terminated or truncated:
+            env.reset()
+
+    return {
+        "render_mean_ms": float(np.mean(latencies)) * 1000,
+        "render_p95_ms": float(np.percentile(latencies, 95)) * 1000,
+    }
+
+
+def measure_peak_memory(network: SyntheticNetwork, actions: list[int], max_steps: int, seed: int) -> dict[str, float]:
+    """Peak traced allocation of building an env, compiling its map and running ``actions``."""
+    tracemalloc.start()
+    try:
+        env = make_env(network, max_steps)
+        env.reset(seed=seed)
+        for action in actions:
+            _, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                env.reset()
+
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"peak_memory_mb": peak / 2**20}
+
+
+def run_size(num_stops: int, args: argparse.Namespace, directory: str) -> dict[str, Any]:
+    network = generate_network(os.path.join(directory, str(num_stops)), num_stops, seed=args.seed)
+    actions = scripted_actions(args.steps, args.seed)
+
+    result: dict[str, Any] = {"num_stops": num_stops}
+
+    env = make_env(network, args.max_steps)
+    result.update(measure_resets(env, args.resets, args.seed))
+    result.update(measure_steps(env, actions, args.seed))
+
+    render_env = make_env(network, args.max_steps, render_mode="rgb_array")
+    result.update(measure_renders(render_env, actions[: args.render_steps], args.render_every, args.seed))
+
+    if not args.skip_memory:
+        result.update(measure_peak_memory(network, actions[: args.memory_steps], args.max_steps, args.seed))
+
+    return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark MetroMapEnv on synthetic networks of increasing size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Number of stops per network")
+    parser.add_argument("--steps", type=int, default=20000, help="Scripted steps timed per size")
+    parser.add_argument("--resets", type=int, default=20, help="Warm resets timed per size")
+    parser.add_argument("--render-steps", type=int, default=2000)
+    parser.add_argument("--render-every", type=int, default=10)
+    parser.add_argument("--memory-steps", type=int, default=2000)
+    parser.add_argument("--skip-memory", action="store_true", help="Skip the (slow) tracemalloc pass")
+    parser.add_argument("--max-steps", type=int, default=15000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=None, help="Where to write the networks (a temp dir by default)")
+    parser.add_argument("--out", default=None, help="Results file (benchmarks/results/<revision>.json by default)")
+    args = parser.parse_args()
+
+    revision = git_revision()
+    report: dict[str, Any] = {
+        "revision": revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": vars(args),
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = args.data_dir if args.data_dir is not None else temp_dir
+        for num_stops in args.sizes:
+            result = run_size(num_stops, args, directory)
+            report["results"].append(result)
+            print(json.dumps(result))
+
+    out = args.out
+    if out is None:
+        out = os.path.join("benchmarks", "results", f"{(revision or 'unknown')[:12]}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as out_file:
+        json.dump(report, out_file, indent=2)
+
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
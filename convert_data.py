@@ -0,0 +1,15 @@
+import sys
+from src.data_handling.load import convert_dbf_to_columnar
+from src.constants.data import ROUTES_DATA_PATH, STOPS_DATA_PATH
+
+
+def main() -> None:
+    paths = sys.argv[1:] if len(sys.argv) > 1 else [ROUTES_DATA_PATH, STOPS_DATA_PATH]
+
+    for path in paths:
+        assert path.endswith(".dbf"), f"{path} is not a .dbf file"
+        print(f"{path} -> {convert_dbf_to_columnar(path)}")
+
+
+if __name__ == "__main__":
+    main()
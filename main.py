@@ -1,47 +1,84 @@
 import os
-from sb3_contrib import QRDQN
+from sb3_contrib.common.maskable.callbacks import MaskableEvalCallback
 from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import VecMonitor
 from stable_baselines3.common.env_checker import check_env
-from src.environment import MetroMapEnv
+from src.environment import MetroMapEnv, MetroMapVecEnv
 from src.data_handling.load import load_training_data
-from stable_baselines3.common.callbacks import EvalCallback
+from stable_baselines3.common.callbacks import EvalCallback, BaseCallback
+from src.training.algorithms import ALGORITHMS, make_model, save_algorithm
+from src.training.instrumentation import InstrumentationCallback
 
 
 def main() -> None:
     version = 28
+    # "qrdqn", or "maskable_ppo" to train on the env's action_masks
+    algorithm = "qrdqn"
+    # Above 1, trains on a MetroMapVecEnv of that many episodes instead of a single MetroMapEnv
+    num_envs = 1
+    # Logs per-phase env timings to TensorBoard, at a small cost per step
+    instrument = False
+
+    train(version, algorithm, num_envs, instrument)
+
+
+def train(version: int, algorithm: str, num_envs: int = 1, instrument: bool = False, device: str = "auto") -> None:
+    assert algorithm in ALGORITHMS, f"Unknown algorithm {algorithm}, expected one of {', '.join(ALGORITHMS)}"
+
     timesteps = 10000000
     models_dir = f"./generated_models/RewardFunctions_v{version}"
     log_dir = f"./logs/RewardFunctions_v{version}_logs"
+    episode_cache_dir = "./src/data/cache"
 
     os.makedirs(log_dir, exist_ok=True)
+    # Lets produce_map.py and produce_maps.py load the models of this version with the right algorithm
+    save_algorithm(models_dir, algorithm)
 
     training_data = load_training_data("./src/data/train_data.json")
 
-    eval_env = MetroMapEnv(training_data=training_data, max_steps=8000)
+    eval_env = MetroMapEnv(training_data=training_data, max_steps=8000, episode_cache_dir=episode_cache_dir)
     eval_monitor = Monitor(eval_env)  # type: ignore
 
-    env = MetroMapEnv(render_mode="rgb_array", training_data=training_data, max_steps=8000)
-    check_env(env)
+    env: MetroMapEnv | MetroMapVecEnv
+    monitor: Monitor | VecMonitor
+    if num_envs == 1:
+        env = MetroMapEnv(
+            render_mode="rgb_array",
+            training_data=training_data,
+            max_steps=8000,
+            random_options=eval_env.random_options,
+        )
+        check_env(env)
+        monitor = Monitor(env)  # type: ignore
+    else:
+        env = MetroMapVecEnv(
+            training_data=training_data,
+            num_envs=num_envs,
+            max_steps=8000,
+            random_options=eval_env.random_options,
+        )
+        monitor = VecMonitor(env)
+
+    if instrument:
+        env.enable_instrumentation()
 
-    monitor = Monitor(env)  # type: ignore
     monitor.reset()
 
-    eval_callback = EvalCallback(
+    eval_callback_type = MaskableEvalCallback if algorithm == "maskable_ppo" else EvalCallback
+    eval_callback = eval_callback_type(
         eval_monitor,
         best_model_save_path=models_dir,
-        eval_freq=50000,
+        eval_freq=max(50000 // num_envs, 1),
         n_eval_episodes=5,
     )
+    callbacks: list[BaseCallback] = [eval_callback]
+    if instrument:
+        callbacks.append(InstrumentationCallback())
 
-    model = QRDQN(
-        "MultiInputPolicy",
-        monitor,
-        tensorboard_log=log_dir,
-        device="cuda",
-    )
+    model = make_model(algorithm, monitor, num_envs, log_dir, device)
 
     model.learn(
-        callback=eval_callback,
+        callback=callbacks,
         total_timesteps=timesteps,
         log_interval=2,
         tb_log_name=f"RewardFunctions_v{version}",
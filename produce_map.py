@@ -1,25 +1,32 @@
+import argparse
 import cv2  # type: ignore
 from sb3_contrib import QRDQN
 from stable_baselines3.common.monitor import Monitor
 from src.environment import MetroMapEnv
 from src.data_handling.load import load_training_data
+from src.models.env_data import EnvDataDef
+from src.search.beam_search import PolicyBeamSearch
+from src.training.algorithms import load_model, predict
 from typing import SupportsFloat
-import sys
 import os
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Produce the map of one trained model.")
+    parser.add_argument("version")
+    parser.add_argument("map_id")
+    parser.add_argument("model_name", choices=["final_model", "best_model"])
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--beam", action="store_true", help="Search with a policy-guided beam instead of greedily")
+    parser.add_argument("--beam-width", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=2, help="Actions expanded per beam member")
+    parser.add_argument("--time-budget", type=float, default=60.0, help="Seconds the beam search may take")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
 
-    args = sys.argv
-    version = args[1]
-    map_id = args[2]
-    model_name = args[3]
-
-    assert version, "You must enter a version number"
-    assert map_id, "You must enter a map_id"
-
-    models_list = ["final_model", "best_model"]
-    assert model_name in models_list, "Model choice invalid, must be 'final_model' or 'best_model'"
+    version = args.version
+    map_id = args.map_id
+    model_name = args.model_name
 
     models_dir = f"./generated_models/RewardFunctions_v{version}/"
 
@@ -27,10 +34,14 @@ def main() -> None:
 
     assert map_id in training_data.keys(), "You must enter a valid map id, defined in the train_data.json file"
 
+    if args.beam:
+        produce_with_beam_search(args, training_data, f"{models_dir}/{model_name}.zip")
+        return
+
     env = MetroMapEnv(training_data=training_data, render_mode="rgb_array")
     monitor = Monitor(env, reset_keywords=tuple(["options"]))  # type: ignore
 
-    model = QRDQN.load(f"{models_dir}/{model_name}.zip", monitor, device="cuda")
+    model = load_model(f"{models_dir}/{model_name}.zip", monitor, device=args.device)
 
     terminated = False
     truncated = False
@@ -39,7 +50,7 @@ def main() -> None:
     steps = 0
 
     while not terminated and not truncated:
-        action, _ = model.predict(obs, deterministic=True)
+        action = predict(model, obs, env)
         obs, step_reward, terminated, truncated, info = monitor.step(action)
         reward += step_reward  # type: ignore
         steps += 1
@@ -51,5 +62,29 @@ def main() -> None:
     cv2.waitKey(0)
 
 
+def produce_with_beam_search(args: argparse.Namespace, training_data: dict[str, EnvDataDef], model_path: str) -> None:
+    search_env = MetroMapEnv(training_data=training_data)
+    model = load_model(model_path, device=args.device)
+    assert isinstance(model, QRDQN), "The beam search ranks actions by QRDQN quantiles, so it needs a QRDQN model"
+
+    beam_search = PolicyBeamSearch(model, search_env, args.beam_width, args.top_k, args.time_budget)
+    result = beam_search.search(args.map_id, seed=args.seed)
+
+    print(f"Finished: {result.finished}")
+    print(f"Steps: {len(result.actions)}")
+    print(f"Reward: {result.reward}")
+    print(f"Expanded: {result.expanded} states in {result.elapsed:.1f}s")
+
+    # The search env does not render, so the chosen layout is drawn by replaying it
+    env = MetroMapEnv(training_data=training_data, render_mode="rgb_array")
+    env.reset(seed=args.seed, options={"env_data_def": args.map_id})
+    for action in result.actions:
+        env.step(action)
+
+    title = f"{args.map_id} | {args.model_name} | v{args.version} | beam"
+    cv2.imshow(title, cv2.cvtColor(env.render(), cv2.COLOR_BGR2RGB))  # type: ignore
+    cv2.waitKey(0)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,104 @@
+import argparse
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.data_handling.load import load_training_data
+from src.training.production import (
+    MANIFEST_NAME,
+    ProductionJob,
+    init_worker,
+    is_up_to_date,
+    load_manifest,
+    log_dir,
+    model_dir,
+    produce_map,
+    sync_file,
+    sync_tree,
+    write_manifest,
+)
+
+TRAINING_DATA_PATH = "./src/data/train_data.json"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Produce the maps of every (version, map, checkpoint) combination.")
+    parser.add_argument("--versions", nargs="+", required=True)
+    parser.add_argument("--maps", nargs="+", default=None, help="Map ids (every map in train_data.json by default)")
+    parser.add_argument("--checkpoints", nargs="+", default=["final_model", "best_model"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-steps", type=int, default=15000)
+    parser.add_argument("--out-dir", default="./generated_maps")
+    parser.add_argument("--sync-dir", default=None, help="Where to mirror maps, models and logs per version")
+    parser.add_argument("--force", action="store_true", help="Also redo maps whose model has not changed")
+    parser.add_argument("--record", action="store_true", help="Also save every rollout as a replayable trajectory")
+    args = parser.parse_args()
+
+    assert args.workers > 0, "You must run at least one worker"
+
+    training_data = load_training_data(TRAINING_DATA_PATH)
+    map_ids = args.maps if args.maps is not None else list(training_data.keys())
+    for map_id in map_ids:
+        assert map_id in training_data.keys(), f"Unknown map id {map_id}, it must be defined in train_data.json"
+
+    manifest = load_manifest(args.out_dir)
+
+    jobs = []
+    for version in args.versions:
+        for checkpoint in args.checkpoints:
+            for map_id in map_ids:
+                job = ProductionJob(version, map_id, checkpoint)
+                if not os.path.exists(job.model_path):
+                    print(f"Skipping {job.key}: no model at {job.model_path}")
+                    continue
+
+                if not args.force and is_up_to_date(job, manifest, args.out_dir):
+                    continue
+
+                jobs.append(job)
+
+    print(f"Producing {len(jobs)} maps with {args.workers} workers")
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        # spawn is available on every platform, and init_worker reloads everything a worker needs
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(TRAINING_DATA_PATH, args.max_steps, "./src/data/cache"),
+    ) as executor:
+        futures = {executor.submit(produce_map, job, args.out_dir, args.record): job for job in jobs}
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                job = futures[future]
+                entry = future.result()
+                manifest[job.key] = entry
+                write_manifest(args.out_dir, manifest)
+
+                print(
+                    f"[{done}/{len(jobs)}] {job.key}: {entry['termination_reason']} after {entry['steps']} steps, "
+                    f"reward {entry['reward']:.1f}"
+                )
+
+                if args.sync_dir is not None:
+                    version_sync_dir = os.path.join(args.sync_dir, f"RewardFunctions_v{job.version}")
+                    sync_file(os.path.join(args.out_dir, job.image_name), version_sync_dir)
+                    if entry["trajectory"] is not None:
+                        sync_file(os.path.join(args.out_dir, entry["trajectory"]), version_sync_dir)
+                    sync_file(os.path.join(args.out_dir, MANIFEST_NAME), args.sync_dir)
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            raise
+
+    if args.sync_dir is not None:
+        for version in args.versions:
+            version_sync_dir = os.path.join(args.sync_dir, f"RewardFunctions_v{version}")
+            copied = sync_tree(model_dir(version), os.path.join(version_sync_dir, "models"))
+            copied += sync_tree(log_dir(version), os.path.join(version_sync_dir, f"RewardFunctions_v{version}_logs"))
+            print(f"Synced {copied} changed model and log files of v{version}")
+
+
+if __name__ == "__main__":
+    main()
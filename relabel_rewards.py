@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from src.data_handling.load import load_training_data
+from src.environment import MetroMapEnv
+from src.models.trajectory import read_trajectories
+from src.training.reward_relabeling import (
+    RewardVersion,
+    episode_returns,
+    load_versions,
+    relabel,
+    return_stats,
+    trace_rewards,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score recorded trajectories under alternative reward structures.")
+    parser.add_argument("trajectories", nargs="+", help="Trajectory files, or directories to take every .traj from")
+    parser.add_argument("--versions", default=None, help="JSON file of {name: {constant: value}}, or a Python file")
+    parser.add_argument("--max-steps", type=int, default=15000, help="max_steps of the env that recorded them")
+    parser.add_argument("--adjacency-features", action="store_true", help="Also trace the stop adjacency reward")
+    parser.add_argument("--out", default=None, help="Write the stats of every version to this JSON file")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.trajectories:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".traj"))
+        else:
+            paths.append(path)
+
+    trajectories = [trajectory for path in paths for trajectory in read_trajectories(path)]
+    assert len(trajectories) > 0, "No trajectories found"
+
+    env = MetroMapEnv(
+        training_data=load_training_data("./src/data/train_data.json"),
+        max_steps=args.max_steps,
+        adjacency_features=args.adjacency_features,
+    )
+
+    start = time.perf_counter()
+    trace = trace_rewards(env, trajectories)
+    print(f"Traced {len(trajectories)} episodes ({trace.num_steps} steps) in {time.perf_counter() - start:.1f}s")
+
+    versions = [RewardVersion("current")]
+    if args.versions is not None:
+        versions += load_versions(args.versions)
+
+    drift = np.abs(relabel(trace, versions[0]) - trace.rewards).max(initial=0)
+    assert drift < 1e-6, f"Relabeling the current rewards is off by up to {drift}, the trace is not reproducible"
+
+    results = {}
+    start = time.perf_counter()
+    for version in versions:
+        results[version.name] = return_stats(trace, episode_returns(trace, relabel(trace, version)))
+    print(f"Relabeled {len(versions)} versions in {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'version':<20}{'mean':>12}{'std':>12}{'min':>12}{'median':>12}{'max':>12}")
+    for name, stats in results.items():
+        print(
+            f"{name:<20}{stats['mean']:>12.1f}{stats['std']:>12.1f}{stats['min']:>12.1f}"
+            f"{stats['median']:>12.1f}{stats['max']:>12.1f}"
+        )
+
+    if args.out is not None:
+        with open(args.out, "w") as out_file:
+            json.dump(results, out_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import cv2  # type: ignore
+from src.data_handling.load import load_training_data
+from src.environment import MetroMapEnv
+from src.environment.trajectory_replayer import TrajectoryReplayer
+from src.models.trajectory import read_trajectories
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Draw the map of a recorded episode at any of its steps.")
+    parser.add_argument("path", help="Trajectory file, e.g. one written by produce_maps.py --record")
+    parser.add_argument("--index", type=int, default=-1, help="Which episode of the file to replay")
+    parser.add_argument("--step", type=int, nargs="+", default=None, help="Steps to draw (the last one by default)")
+    parser.add_argument("--max-steps", type=int, default=15000, help="max_steps of the env that recorded it")
+    parser.add_argument("--out", default=None, help="Save the maps as <out>_<step>.png instead of showing them")
+    parser.add_argument("--list", action="store_true", help="Only list the episodes of the file")
+    args = parser.parse_args()
+
+    trajectories = list(read_trajectories(args.path))
+    if args.list:
+        for index, trajectory in enumerate(trajectories):
+            print(
+                f"#{index}: {trajectory.map_id}, seed {trajectory.seed}, {len(trajectory)} steps, "
+                f"{trajectory.termination_reason or 'unfinished'}"
+            )
+        return
+
+    trajectory = trajectories[args.index]
+    env = MetroMapEnv(
+        training_data=load_training_data("./src/data/train_data.json"),
+        max_steps=args.max_steps,
+        render_mode="rgb_array",
+    )
+    replayer = TrajectoryReplayer(env, trajectory)
+
+    for step in args.step if args.step is not None else [len(trajectory)]:
+        replayer.seek(step)
+        print(f"Step {step}/{len(trajectory)}: {len(replayer.placed_stops)} stops placed, reward {replayer.reward:.1f}")
+
+        image = cv2.cvtColor(env.render(), cv2.COLOR_RGB2BGR)  # type: ignore
+        if args.out is not None:
+            cv2.imwrite(f"{args.out}_{step}.png", image)
+        else:
+            cv2.imshow(f"{trajectory.map_id} | step {step}", image)
+            cv2.waitKey(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-from sb3_contrib import QRDQN
 from stable_baselines3.common.monitor import Monitor
 from src.environment import MetroMapEnv
 from src.data_handling.load import load_training_data
+from src.training.algorithms import load_model, predict
 from typing import SupportsFloat
 import sys
 import os
@@ -32,7 +32,7 @@ def main() -> None:
     monitor = Monitor(env, reset_keywords=tuple(["options"]))  # type: ignore
 
     for model_name in models_list:
-        model = QRDQN.load(f"{models_dir}/{model_name}.zip", monitor, device="cuda")
+        model = load_model(f"{models_dir}/{model_name}.zip", monitor, device="cuda")
 
         terminated = False
         truncated = False
@@ -41,7 +41,7 @@ def main() -> None:
         steps = 0
 
         while not terminated and not truncated:
-            action, _ = model.predict(obs, deterministic=True)
+            action = predict(model, obs, env)
             obs, step_reward, terminated, truncated, info = monitor.step(action)
             reward += step_reward  # type: ignore
             steps += 1
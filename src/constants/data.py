@@ -7,3 +7,5 @@ X_COLUMN = "x"
 Y_COLUMN = "y"
 STOP_TITLE_COLUMN = "maptext"
 ROUTE_RUN_NUMBER = "route_run"
+ROUTES_DATA_PATH = "./src/data/stops_per_route.dbf"
+STOPS_DATA_PATH = "./src/data/stops.dbf"
@@ -0,0 +1,96 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from pandas import DataFrame  # type: ignore
+
+MANIFEST_FILE_NAME = "columns.json"
+STORE_EXTENSION = ".columns"
+
+
+def columnar_store_path(source_path: str) -> str:
+    """Returns where the columnar store converted from the table at ``source_path`` is kept (next to it)."""
+    return os.path.splitext(source_path)[0] + STORE_EXTENSION
+
+
+def is_columnar_store_fresh(directory: str, source_path: str) -> bool:
+    """Checks that ``directory`` holds a complete store, converted from the current version of ``source_path``."""
+    manifest_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path) or not os.path.exists(source_path):
+        return False
+
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    return manifest.get("source") == __source_signature(source_path)
+
+
+def write_columnar_table(frame: DataFrame, directory: str, source_path: str | None = None) -> None:
+    """
+    Writes ``frame`` to ``directory`` as one ``.npy`` file per column, so it can be memory-mapped back in.
+
+    Numeric columns are stored as-is. Every other column is interned: its values are replaced by small integer codes
+    into a table of the distinct values, which is what lets string columns be mapped without materializing objects.
+
+    If the frame was read from ``source_path``, its size and modification time are recorded so stale stores can be
+    detected with ``is_columnar_store_fresh``.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    manifest_path = os.path.join(directory, MANIFEST_FILE_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    columns: list[dict[str, str]] = []
+    for i, column in enumerate(frame.columns):
+        values = frame[column]
+        column_file = f"{i}.npy"
+
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            np.save(os.path.join(directory, column_file), values.to_numpy())
+            columns.append({"name": column, "kind": "numeric", "file": column_file})
+            continue
+
+        categorical = values.astype("category")
+        categories_file = f"{i}.categories.npy"
+        np.save(os.path.join(directory, column_file), categorical.cat.codes.to_numpy())
+        np.save(
+            os.path.join(directory, categories_file),
+            np.array(categorical.cat.categories.to_list(), dtype=object),
+            allow_pickle=True,
+        )
+        columns.append({"name": column, "kind": "categorical", "file": column_file, "categories": categories_file})
+
+    source = __source_signature(source_path) if source_path is not None else None
+
+    # The manifest is written last, so an interrupted conversion never looks complete
+    with open(manifest_path, "w") as manifest_file:
+        json.dump({"columns": columns, "source": source}, manifest_file)
+
+
+def read_columnar_table(directory: str) -> DataFrame:
+    """
+    Loads a table written by ``write_columnar_table``.
+
+    Column data is memory-mapped read-only and wrapped without copying, so any number of processes reading the same
+    directory share one copy of it through the page cache.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE_NAME)) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    data: dict[str, object] = {}
+    for column in manifest["columns"]:
+        values = np.load(os.path.join(directory, column["file"]), mmap_mode="r")
+
+        if column["kind"] == "categorical":
+            categories = np.load(os.path.join(directory, column["categories"]), allow_pickle=True)
+            values = pd.Categorical.from_codes(values, categories=pd.Index(categories.tolist()))
+
+        data[column["name"]] = values
+
+    return DataFrame(data, copy=False)
+
+
+def __source_signature(source_path: str) -> dict[str, int]:
+    stat = os.stat(source_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
@@ -1,4 +1,5 @@
 from pandas import DataFrame, concat  # type: ignore
+import numpy as np
 from src.constants.data import (
     STOP_TITLE_COLUMN,
     STOP_NUMBER_COLUMN,
@@ -9,6 +10,7 @@ from src.constants.data import (
     STOP_SEQUENCE_NUMBER_COLUMN,
 )
 from src.models import Stop, Coordinates2d
+from src.models.stop_angles import StopAngles
 from src.utils.list import flat_map
 from typing import NamedTuple
 
@@ -22,13 +24,13 @@ def remove_duplicate_stops(stops_per_route: DataFrame, stops: DataFrame, exclude
     excluded_rows = stops_per_route[stops_per_route[STOP_NUMBER_COLUMN].isin(excluded_stops)]
     stops_per_route.drop(excluded_rows.index, inplace=True)
 
-    stops_per_route[STOP_NUMBER_COLUMN] = stops_per_route.groupby(STOP_TITLE_COLUMN)[STOP_NUMBER_COLUMN].transform(
-        "first"
-    )
+    stops_per_route[STOP_NUMBER_COLUMN] = stops_per_route.groupby(STOP_TITLE_COLUMN, observed=True)[
+        STOP_NUMBER_COLUMN
+    ].transform("first")
 
-    stops_per_route[X_COLUMN] = stops_per_route.groupby(STOP_TITLE_COLUMN)[X_COLUMN].transform("first")
+    stops_per_route[X_COLUMN] = stops_per_route.groupby(STOP_TITLE_COLUMN, observed=True)[X_COLUMN].transform("first")
 
-    stops_per_route[Y_COLUMN] = stops_per_route.groupby(STOP_TITLE_COLUMN)[Y_COLUMN].transform("first")
+    stops_per_route[Y_COLUMN] = stops_per_route.groupby(STOP_TITLE_COLUMN, observed=True)[Y_COLUMN].transform("first")
 
     stops_per_route = concat([stops_per_route, excluded_rows])
 
@@ -58,76 +60,63 @@ def dataframe_as_routes_and_stops(data: DataFrame) -> dict[str, list[Stop]]:
     return routes_with_stops
 
 
-def extract_stop_angle_mappings(data: dict[str, list[Stop]]) -> dict[str, dict[str, float]]:
-    all_stops: list[Stop] = flat_map(list(data.values()))
-    stop_angle_mapping: dict[str, dict[str, float]] = {}
-
-    for stop in all_stops:
-        relative_stop_angles: dict[str, float] = {}
-        for related_stop in all_stops:
-            if stop == related_stop:
-                continue
-
-            relative_stop_angles[related_stop.id] = stop.position.angle_to(related_stop.position)
-
-        stop_angle_mapping[stop.id] = relative_stop_angles
-
-    return stop_angle_mapping
+def extract_stop_angle_mappings(data: dict[str, list[Stop]]) -> StopAngles:
+    return StopAngles.from_routes(data)
 
 
 def normalize_stop_positions(stops: dict[str, list[Stop]], starting_stops: list[str]) -> dict[str, list[Stop]]:
-    all_stops = set(flat_map(stops.values()))
-
-    scale = 0.1
-
-    x_values = [stop.position.x for stop in all_stops]
-    y_values = [stop.position.y for stop in all_stops]
-
-    origin_all = Coordinates2d((min(x_values) + max(x_values)) * 0.5, (min(y_values) + max(y_values)) * 0.5)
-
-    starting_stops_locations = [
-        Coordinates2d(
-            origin_all.x * (1 - scale) + stop.position.x * scale, origin_all.y * (1 - scale) + stop.position.y * scale
-        )
-        for stop in all_stops
-        if stop.id in starting_stops
-    ]
-    starting_stops_x_values = [pos.x for pos in starting_stops_locations]
-    starting_stops_y_values = [pos.y for pos in starting_stops_locations]
-    origin_starting_stops = Coordinates2d(
-        (min(starting_stops_x_values) + max(starting_stops_x_values)) * 0.5,
-        (min(starting_stops_y_values) + max(starting_stops_y_values)) * 0.5,
-    )
+    return normalize_stop_positions_batch([(stops, starting_stops)])[0]
 
-    for stop in all_stops:
-        stop.position = Coordinates2d(
-            (origin_all.x * (1 - scale) + stop.position.x * scale) - origin_starting_stops.x,
-            (origin_all.y * (1 - scale) + stop.position.y * scale) - origin_starting_stops.y,
-        )
 
-    # all_pos = np.array([stop.position.to_tuple() for stop in all_stops])
-    # origin_all = (all_pos.min(axis=0) + all_pos.max(axis=0)) * 0.5
+def normalize_stop_positions_batch(
+    maps: list[tuple[dict[str, list[Stop]], list[str]]], scale: float = 0.1
+) -> list[dict[str, list[Stop]]]:
+    """
+    Shrinks every map towards the centre of its bounding box and re-centres it on its starting stops.
 
-    # starting_stops_locations = origin_all * (1 - scale) + starting_stops_locations * scale
+    The coordinates of all maps are stacked into one array, so the transform is a few NumPy reductions no matter how
+    many maps or stops there are. Stops sharing an id all get the position of the first stop with that id.
+    """
+    stops_by_map: list[dict[str, Stop]] = []
+    starting_masks: list[list[bool]] = []
+    for stops, starting_stops in maps:
+        unique_stops: dict[str, Stop] = {}
+        for stop in flat_map(stops.values()):
+            unique_stops.setdefault(stop.id, stop)
+
+        starting_ids = set(starting_stops)
+        stops_by_map.append(unique_stops)
+        starting_masks.append([stop_id in starting_ids for stop_id in unique_stops])
+
+    counts = np.array([len(unique_stops) for unique_stops in stops_by_map], dtype=np.int64)
+    assert np.all(counts > 0), "Every map must contain at least one stop"
+
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = np.array(
+        [stop.position.to_tuple() for unique_stops in stops_by_map for stop in unique_stops.values()], dtype=np.float64
+    )
+    is_starting = np.concatenate(starting_masks)
+    assert np.all(np.logical_or.reduceat(is_starting, offsets)), "Every map must contain one of its starting stops"
 
-    # origin_starting_stops = (starting_stops_locations.min(axis=0) + starting_stops_locations.max(axis=0)) * 0.5
-    # origin_starting_stops.astype("float")
+    origin_all = (np.minimum.reduceat(positions, offsets) + np.maximum.reduceat(positions, offsets)) * 0.5
+    scaled = np.repeat(origin_all, counts, axis=0) * (1 - scale) + positions * scale
 
-    # q = np.subtract(origin_all * (1 - scale) + all_pos * scale, origin_starting_stops, dtype=float)
+    starting_scaled = np.where(is_starting[:, np.newaxis], scaled, np.nan)
+    origin_starting_stops = (
+        np.fmin.reduceat(starting_scaled, offsets) + np.fmax.reduceat(starting_scaled, offsets)
+    ) * 0.5
 
-    for stop_list in stops.values():
-        for stop in stop_list:
-            for norm_stop in all_stops:
-                if stop == norm_stop:
-                    stop.position = norm_stop.position
+    normalized = (scaled - np.repeat(origin_starting_stops, counts, axis=0)).tolist()
 
-    # ax = plt.subplot(111)
-    # ax.scatter(*p.T, c="b")
-    # ax.scatter(*origin_all, marker="x", c="g")
-    # ax.scatter(*q.T, c="r")
-    # plt.show()
+    for (stops, _), unique_stops, offset in zip(maps, stops_by_map, offsets.tolist()):
+        new_positions = {
+            stop_id: Coordinates2d(*normalized[offset + index]) for index, stop_id in enumerate(unique_stops)
+        }
+        for stop_list in stops.values():
+            for stop in stop_list:
+                stop.position = new_positions[stop.id]
 
-    return stops
+    return [stops for stops, _ in maps]
 
 
 # def generate_starting_positions(routes_dict: dict[str, list[Stop]]) -> dict[str, tuple[Coordinates2d, Direction]]:
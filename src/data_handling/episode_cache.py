@@ -0,0 +1,150 @@
+import hashlib
+import os
+import pickle
+from src.constants.data import STOP_NUMBER_COLUMN
+from src.data_handling.parser import StopsPerRouteParser, StopsParser
+from src.data_handling.data_modifiers import (
+    normalize_stop_positions_batch,
+    remove_duplicate_stops,
+    dataframe_as_routes_and_stops,
+    extract_stop_angle_mappings,
+)
+from src.models.env_data import EnvDataDef
+from src.models.episode_template import EpisodeTemplate
+from src.models.stop import Stop
+from src.models.stop_angles import StopAngles
+
+# Bump whenever the compile step changes its output, so stale on-disk templates are never picked up.
+CACHE_FORMAT_VERSION = 3
+
+
+def compile_episode_template(
+    routes_parser: StopsPerRouteParser, stops_parser: StopsParser, env_data_def: EnvDataDef
+) -> EpisodeTemplate:
+    return compile_episode_templates(routes_parser, stops_parser, [env_data_def])[0]
+
+
+def compile_episode_templates(
+    routes_parser: StopsPerRouteParser, stops_parser: StopsParser, env_data_defs: list[EnvDataDef]
+) -> list[EpisodeTemplate]:
+    """Compiles several maps at once, so their stop positions are normalized in a single vectorized pass."""
+    routes_dicts: list[dict[str, list[Stop]]] = []
+    stop_angle_mappings: list[StopAngles] = []
+    for env_data_def in env_data_defs:
+        routes_data = routes_parser.filter_data(env_data_def.starting_stops)
+        stops_data = stops_parser.filter_data(list(routes_data[STOP_NUMBER_COLUMN].drop_duplicates()))
+        routes_df = remove_duplicate_stops(routes_data, stops_data, env_data_def.starting_stops)
+
+        routes_dict = dataframe_as_routes_and_stops(routes_df)
+        routes_dicts.append(routes_dict)
+        stop_angle_mappings.append(extract_stop_angle_mappings(routes_dict))
+
+    normalized_routes_dicts = normalize_stop_positions_batch(
+        [(routes_dict, env_data_def.starting_stops) for routes_dict, env_data_def in zip(routes_dicts, env_data_defs)]
+    )
+
+    templates: list[EpisodeTemplate] = []
+    for normalized_routes_dict, stop_angle_mapping, env_data_def in zip(
+        normalized_routes_dicts, stop_angle_mappings, env_data_defs
+    ):
+        final_routes_dict = {key: normalized_routes_dict[key] for key in env_data_def.starting_positions.keys()}
+        templates.append(EpisodeTemplate.from_routes(final_routes_dict, stop_angle_mapping))
+
+    return templates
+
+
+class EpisodeCache:
+    """
+    Compiles every ``EnvDataDef`` at most once per process.
+
+    If ``cache_dir`` is given, compiled templates are also pickled to disk, keyed by a hash of the source tables and
+    the map definition, so later processes can skip the pandas work entirely.
+    """
+
+    def __init__(
+        self,
+        routes_parser: StopsPerRouteParser,
+        stops_parser: StopsParser,
+        source_paths: list[str],
+        cache_dir: str | None = None,
+    ) -> None:
+        self.routes_parser = routes_parser
+        self.stops_parser = stops_parser
+        self.source_paths = source_paths
+        self.cache_dir = cache_dir
+        self.__templates: dict[str, EpisodeTemplate] = {}
+        self.__source_hash: str | None = None
+
+    def get(self, data_name: str, env_data_def: EnvDataDef) -> EpisodeTemplate:
+        return self.get_many({data_name: env_data_def})[data_name]
+
+    def get_many(self, env_data_defs: dict[str, EnvDataDef]) -> dict[str, EpisodeTemplate]:
+        """Like ``get`` for several maps; the ones missing from both caches are compiled together in one batch."""
+        missing: dict[str, EnvDataDef] = {}
+        for data_name, env_data_def in env_data_defs.items():
+            if data_name in self.__templates:
+                continue
+
+            template = self.__load_from_disk(data_name, env_data_def)
+            if template is None:
+                missing[data_name] = env_data_def
+            else:
+                self.__templates[data_name] = template
+
+        if len(missing) > 0:
+            templates = compile_episode_templates(self.routes_parser, self.stops_parser, list(missing.values()))
+            for (data_name, env_data_def), template in zip(missing.items(), templates):
+                self.__save_to_disk(data_name, env_data_def, template)
+                self.__templates[data_name] = template
+
+        return {data_name: self.__templates[data_name] for data_name in env_data_defs}
+
+    def __cache_path(self, data_name: str, env_data_def: EnvDataDef) -> str:
+        assert self.cache_dir is not None
+
+        key = hashlib.sha1(
+            f"{CACHE_FORMAT_VERSION}|{self.__get_source_hash()}|{env_data_def!r}".encode("utf-8")
+        ).hexdigest()
+
+        return os.path.join(self.cache_dir, f"{data_name}-{key[:16]}.pkl")
+
+    def __get_source_hash(self) -> str:
+        if self.__source_hash is None:
+            source_hash = hashlib.sha1()
+            for path in self.source_paths:
+                with open(path, "rb") as source_file:
+                    for chunk in iter(lambda: source_file.read(1 << 20), b""):
+                        source_hash.update(chunk)
+
+            self.__source_hash = source_hash.hexdigest()
+
+        return self.__source_hash
+
+    def __load_from_disk(self, data_name: str, env_data_def: EnvDataDef) -> EpisodeTemplate | None:
+        if self.cache_dir is None:
+            return None
+
+        path = self.__cache_path(data_name, env_data_def)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "rb") as cache_file:
+                template = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        return template if isinstance(template, EpisodeTemplate) else None
+
+    def __save_to_disk(self, data_name: str, env_data_def: EnvDataDef, template: EpisodeTemplate) -> None:
+        if self.cache_dir is None:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        path = self.__cache_path(data_name, env_data_def)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as cache_file:
+            pickle.dump(template, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_path, path)
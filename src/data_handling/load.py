@@ -2,6 +2,12 @@ import json5  # type: ignore
 from pandas import DataFrame  # type: ignore
 import shapefile  # type: ignore
 from src.models.env_data import EnvDataDef
+from src.data_handling.columnar import (
+    columnar_store_path,
+    is_columnar_store_fresh,
+    read_columnar_table,
+    write_columnar_table,
+)
 
 
 def load_dbf_table(path: str) -> DataFrame:
@@ -14,6 +20,26 @@ def load_dbf_table(path: str) -> DataFrame:
     return DataFrame(columns=fields, data=records)
 
 
+def load_table(path: str) -> DataFrame:
+    """
+    Loads the .dbf table at ``path``, memory-mapping its columnar store instead if an up to date one exists.
+
+    Stores are created with ``convert_dbf_to_columnar`` (see ``convert_data.py``).
+    """
+    store_path = columnar_store_path(path)
+    if is_columnar_store_fresh(store_path, path):
+        return read_columnar_table(store_path)
+
+    return load_dbf_table(path)
+
+
+def convert_dbf_to_columnar(path: str) -> str:
+    store_path = columnar_store_path(path)
+    write_columnar_table(load_dbf_table(path), store_path, source_path=path)
+
+    return store_path
+
+
 def load_training_data(data_path: str) -> dict[str, EnvDataDef]:
     env_data_result: dict[str, EnvDataDef] = {}
 
@@ -1,30 +1,61 @@
-from .load import load_dbf_table
+from .load import load_table
 from .filters import filter_by_routes_and_stops, filter_by_stops
+from .route_index import RouteStopIndex
 from pandas import DataFrame  # type: ignore
 
 
-class StopsPerRouteParser:
+class TableParser:
+    """
+    Holds one table, either passed in directly or loaded from ``load_data``'s path the first time ``data`` is read.
+    """
+
     def __init__(self, data: DataFrame | None = None) -> None:
-        self.data = data
+        self.__data = data
+        self.__file_path: str | None = None
+
+    @property
+    def data(self) -> DataFrame | None:
+        if self.__data is None and self.__file_path is not None:
+            self.__data = load_table(self.__file_path)
+
+        return self.__data
+
+    @data.setter
+    def data(self, data: DataFrame | None) -> None:
+        self.__data = data
 
     def load_data(self, file_path: str) -> None:
-        self.data = load_dbf_table(file_path)
+        self.__file_path = file_path
+        self.__data = None
 
-    def filter_data(self, stop_ids: list[str]) -> DataFrame:
+
+class StopsPerRouteParser(TableParser):
+    def __init__(self, data: DataFrame | None = None) -> None:
+        super().__init__(data)
+        self.__index: RouteStopIndex | None = None
+        self.__indexed_data: DataFrame | None = None
+
+    @property
+    def index(self) -> RouteStopIndex:
         assert (
             self.data is not None
         ), "You must first load data either through the constructor or by calling 'load_data' on the parser"
 
-        return filter_by_routes_and_stops(self.data, stop_ids)
+        if self.__index is None or self.__indexed_data is not self.data:
+            self.__index = RouteStopIndex(self.data)
+            self.__indexed_data = self.data
 
+        return self.__index
 
-class StopsParser:
-    def __init__(self, data: DataFrame | None = None) -> None:
-        self.data = data
+    def filter_data(self, stop_ids: list[str]) -> DataFrame:
+        assert (
+            self.data is not None
+        ), "You must first load data either through the constructor or by calling 'load_data' on the parser"
+
+        return filter_by_routes_and_stops(self.data, stop_ids, self.index)
 
-    def load_data(self, file_path: str) -> None:
-        self.data = load_dbf_table(file_path)
 
+class StopsParser(TableParser):
     def filter_data(self, stop_ids: list[str]) -> DataFrame:
         assert (
             self.data is not None
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame  # type: ignore
+from src.constants.data import ROUTE_NUMBER_COLUMN, STOP_NUMBER_COLUMN, RUN_NUMBER_COLUMN, STOP_SEQUENCE_NUMBER_COLUMN
+
+
+class RouteStopIndex:
+    """
+    Index over a stops per route table, built once so selecting routes costs time proportional to the selection.
+
+    It maps every (route number, run number) to its rows sorted by stop sequence number, and every stop number to the
+    rows that serve it. Rows are referred to by position in the indexed table.
+    """
+
+    def __init__(self, stops_per_route: DataFrame) -> None:
+        route_codes, _ = pd.factorize(stops_per_route[ROUTE_NUMBER_COLUMN])
+        run_codes, _ = pd.factorize(stops_per_route[RUN_NUMBER_COLUMN], sort=True)
+        stop_codes, stop_values = pd.factorize(stops_per_route[STOP_NUMBER_COLUMN])
+        seq_nums = stops_per_route[STOP_SEQUENCE_NUMBER_COLUMN].to_numpy()
+        positions = np.arange(len(stops_per_route))
+
+        self.route_codes = route_codes
+        self.run_codes = run_codes
+        self.stop_codes = stop_codes
+        self.seq_nums = seq_nums
+
+        # Rows grouped by (route, run), each group sorted by stop sequence number
+        self.sorted_rows = np.lexsort((positions, seq_nums, run_codes, route_codes))
+        self.sorted_seq_nums = seq_nums[self.sorted_rows]
+        self.route_runs: dict[tuple[int, int], tuple[int, int]] = self.__group_bounds(
+            self.sorted_rows, route_codes, run_codes
+        )
+
+        # Rows serving each stop, in table order
+        rows_by_stop = np.argsort(stop_codes, kind="stable")
+        self.stop_rows: dict[str, np.ndarray] = {
+            stop_values[stop_code]: rows_by_stop[start:end]
+            for (stop_code,), (start, end) in self.__group_bounds(rows_by_stop, stop_codes).items()
+        }
+
+        self.__entry_points: dict[tuple[int, int], tuple[int, int]] = {}
+
+    def rows_from_stops(self, stop_ids: list[str]) -> np.ndarray:
+        """
+        Positions of the rows of every route run passing through ``stop_ids``, starting from that stop.
+
+        Each row serving one of the stops selects the run of its route on which the stop comes first (lowest
+        stop sequence number, then lowest run number), from the stop onwards.
+        """
+        rows_by_stop = {stop_id: self.stop_rows[stop_id] for stop_id in set(stop_ids) if stop_id in self.stop_rows}
+        if len(rows_by_stop) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        serving_rows = {int(row): rows for rows in rows_by_stop.values() for row in rows}
+
+        route_rows: list[np.ndarray] = []
+        for row in sorted(serving_rows.keys()):
+            run_code, seq_num = self.__entry_point(row, serving_rows[row])
+            start, end = self.route_runs[(int(self.route_codes[row]), run_code)]
+            first = start + int(np.searchsorted(self.sorted_seq_nums[start:end], seq_num, side="left"))
+            route_rows.append(self.sorted_rows[first:end])
+
+        return np.concatenate(route_rows)
+
+    def __entry_point(self, row: int, serving_rows: np.ndarray) -> tuple[int, int]:
+        route_code = int(self.route_codes[row])
+        key = (route_code, int(self.stop_codes[row]))
+
+        if key not in self.__entry_points:
+            candidates = serving_rows[self.route_codes[serving_rows] == route_code]
+            first = candidates[np.lexsort((self.run_codes[candidates], self.seq_nums[candidates]))[0]]
+            self.__entry_points[key] = (int(self.run_codes[first]), self.seq_nums[first])
+
+        return self.__entry_points[key]
+
+    @staticmethod
+    def __group_bounds(rows: np.ndarray, *key_codes: np.ndarray) -> dict[tuple[int, ...], tuple[int, int]]:
+        if len(rows) == 0:
+            return {}
+
+        keys = np.stack([codes[rows] for codes in key_codes], axis=1)
+        starts = np.flatnonzero(np.concatenate([[True], (keys[1:] != keys[:-1]).any(axis=1)]))
+        ends = np.append(starts[1:], len(rows))
+
+        return {tuple(int(code) for code in keys[start]): (int(start), int(end)) for start, end in zip(starts, ends)}
@@ -1 +1,2 @@
 from .metro_map_env import MetroMapEnv
+from .metro_map_vec_env import MetroMapVecEnv
@@ -0,0 +1,40 @@
+"""
+Array versions of the reward functions in ``score_funcs``, for scoring a whole batch of environments at once.
+
+Each function mirrors its scalar counterpart exactly and reads the ``C_*`` constants from ``score_funcs`` at call
+time, so both stay in sync.
+"""
+
+import numpy as np
+from src.environment import score_funcs
+
+
+def line_overlap(consecutive_overlaps: np.ndarray) -> np.ndarray:
+    return np.select(
+        [consecutive_overlaps <= 0, consecutive_overlaps <= 1],
+        [score_funcs.C_LINE_OVERLAP * 0, score_funcs.C_LINE_OVERLAP * -0.5],
+        score_funcs.C_LINE_OVERLAP * -1,
+    ).astype(np.float64)
+
+
+def stop_adjacency(stop_placed_adjacent_wrong: np.ndarray, stop_placed_adjacent: np.ndarray) -> np.ndarray:
+    return np.where(
+        stop_placed_adjacent_wrong,
+        score_funcs.C_STOP_ADJACENCY * -1,
+        score_funcs.C_STOP_ADJACENCY * np.where(stop_placed_adjacent, 1, -0.5),
+    ).astype(np.float64)
+
+
+def stop_placed(distance_to_real_stop: np.ndarray) -> np.ndarray:
+    return np.where(
+        np.abs(distance_to_real_stop) <= score_funcs.STOP_PLACEMENT_RADIUS,
+        score_funcs.C_STOP_RELATIVE_POS * 1,
+        score_funcs.C_STOP_RELATIVE_POS * -1,
+    ).astype(np.float64)
+
+
+def distance_to_real_stop(distance: np.ndarray, prev_distance: np.ndarray, steps_since_stop: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        closer_reward = score_funcs.C_DIST_TO_REAL_STOP * 1 / (steps_since_stop / 3)
+
+    return np.where(distance < prev_distance, closer_reward, score_funcs.C_DIST_TO_REAL_STOP * -1).astype(np.float64)
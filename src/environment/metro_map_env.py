@@ -7,71 +7,245 @@ from src.models.coordinates2d import Coordinates2d
 from src.models.env_data import EnvDataDef
 from src.models.grid import Direction
 from src.models.stop_adjacency import StopAdjacency
+from src.models.spatial_hash_grid import SpatialHashGrid
+from src.models.occupancy_grid import OccupancyGrid
+from src.models.episode_schedule import EpisodeSchedule
+from src.models.env_snapshot import EnvSnapshot
 from src.environment import score_funcs
 from src.environment.random_options import RandomOptions
-from src.utils.list import flat_map
-from src.environment.render import render_map
-from src.environment.overlap import stop_overlap, any_overlap
+from src.environment.render import MapRenderer
+from src.environment.trajectory_recorder import TrajectoryRecorder
+from src.utils.instrumentation import Instrumentation
 import numpy as np
 import cv2  # type: ignore
 
+# Layers of the ``local_view`` observation: placed lines, placed stops and the target of the current stop
+LOCAL_VIEW_LAYERS = 3
+
+
+def observation_spaces(
+    local_view_size: int | None = None, adjacency_features: bool = False, nearest_stops: int = 0
+) -> dict[str, gym.spaces.Space]:
+    spaces: dict[str, gym.spaces.Space] = {
+        "stop_in_adjacent_fields": gym.spaces.Box(0, 1, (8,), dtype=np.uint8),
+        "line_in_adjacent_fields": gym.spaces.Box(0, 1, (8,), dtype=np.uint8),
+        "num_of_consecutive_overlaps": gym.spaces.Box(0, 2, (1,), dtype=np.uint8),
+        # "num_of_turns": gym.spaces.Box(0, np.inf, (1,), dtype=np.int16),
+        # "stop_spacing": gym.spaces.Box(0, np.inf, (1,), dtype=np.int16),
+        "steps_since_stop": gym.spaces.Box(0, np.inf, (1,), dtype=np.int16),
+        "curr_direction": gym.spaces.Discrete(8),
+        "curr_position": gym.spaces.Box(-np.inf, np.inf, (2,), dtype=np.int16),
+        "next_stop_distance": gym.spaces.Box(0, np.inf, (1,), dtype=np.float32),
+        "should_place_stop": gym.spaces.Discrete(2),
+    }
+    if adjacency_features:
+        spaces["adjacent_to_same_stop"] = gym.spaces.Discrete(2)
+        spaces["adjacent_to_other_stop"] = gym.spaces.Discrete(2)
+        spaces["nearest_adjacent_position"] = gym.spaces.Box(0, np.inf, (1,), dtype=np.float32)
+    if nearest_stops > 0:
+        spaces["nearest_stops"] = gym.spaces.Box(-np.inf, np.inf, (nearest_stops, 3), dtype=np.float32)
+    if local_view_size is not None:
+        spaces["local_view"] = gym.spaces.Box(
+            0, 1, (LOCAL_VIEW_LAYERS, local_view_size, local_view_size), dtype=np.uint8
+        )
+
+    return spaces
+
+
+# Field -> slice of the flat observation vector (``flat_observations=True``). It holds the same values as the dict
+# observations, as float32, with ``curr_direction`` one-hot encoded over its 8 directions.
+FLAT_OBSERVATION_FIELDS: dict[str, slice] = {
+    "stop_in_adjacent_fields": slice(0, 8),
+    "line_in_adjacent_fields": slice(8, 16),
+    "num_of_consecutive_overlaps": slice(16, 17),
+    "steps_since_stop": slice(17, 18),
+    "curr_direction": slice(18, 26),
+    "curr_position": slice(26, 28),
+    "next_stop_distance": slice(28, 29),
+    "should_place_stop": slice(29, 30),
+}
+FLAT_OBSERVATION_SIZE = 30
+
+_FLAT_STOP_FIELDS = FLAT_OBSERVATION_FIELDS["stop_in_adjacent_fields"]
+_FLAT_LINE_FIELDS = FLAT_OBSERVATION_FIELDS["line_in_adjacent_fields"]
+_FLAT_OVERLAPS = FLAT_OBSERVATION_FIELDS["num_of_consecutive_overlaps"].start
+_FLAT_STEPS_SINCE_STOP = FLAT_OBSERVATION_FIELDS["steps_since_stop"].start
+_FLAT_DIRECTION = FLAT_OBSERVATION_FIELDS["curr_direction"]
+_FLAT_POSITION = FLAT_OBSERVATION_FIELDS["curr_position"]
+_FLAT_NEXT_STOP_DISTANCE = FLAT_OBSERVATION_FIELDS["next_stop_distance"].start
+_FLAT_SHOULD_PLACE_STOP = FLAT_OBSERVATION_FIELDS["should_place_stop"].start
+
+
+def flat_observation_space(local_view_size: int | None = None) -> gym.spaces.Box:
+    return gym.spaces.Box(-np.inf, np.inf, (flat_observation_size(local_view_size),), dtype=np.float32)
+
+
+def flat_observation_size(local_view_size: int | None = None) -> int:
+    """``FLAT_OBSERVATION_SIZE``, plus the flattened local view that follows the other fields when there is one."""
+    if local_view_size is None:
+        return FLAT_OBSERVATION_SIZE
+
+    return FLAT_OBSERVATION_SIZE + LOCAL_VIEW_LAYERS * local_view_size**2
+
+
+# Undo journal entry kinds, see ``MetroMapEnv.snapshot``
+_UNDO_LINE = 0
+_UNDO_STOP = 1
+_UNDO_ADJACENCY_ADD = 2
+_UNDO_ADJACENCY_REMOVE = 3
+_UNDO_STOP_TARGET = 4
+
+
+# Methods timed by ``MetroMapEnv.enable_instrumentation``, mapped to the phase they are reported under
+INSTRUMENTED_ENV_METHODS = {
+    "step": "step",
+    "reset": "reset",
+    "_MetroMapEnv__move_forward": "step/move",
+    "_MetroMapEnv__place_stop": "step/place_stop",
+    "_MetroMapEnv__update_line_and_stop_adjacent": "step/adjacency",
+    "_MetroMapEnv__compile_observations": "step/observations",
+}
+INSTRUMENTED_OCCUPANCY_METHODS = {
+    "any_overlap": "step/overlap",
+    "stop_overlap": "step/overlap",
+    "line_overlap": "step/overlap",
+}
+INSTRUMENTED_RENDERER_METHODS = {"render": "render"}
+INSTRUMENTED_RANDOM_OPTIONS_METHODS = {"generate_env_data": "reset/env_data"}
+INSTRUMENTED_EPISODE_CACHE_METHODS = {
+    "get_many": "reset/env_data/template",
+    "_EpisodeCache__load_from_disk": "reset/env_data/template/disk_load",
+    "_EpisodeCache__save_to_disk": "reset/env_data/template/disk_save",
+}
+
 
 class MetroMapEnv(gym.Env):
+    """
+    Draws the lines of a map one step at a time.
+
+    With ``flat_observations`` observations are a single float32 vector laid out as ``FLAT_OBSERVATION_FIELDS``
+    instead of a dict. With ``reuse_observation_buffers`` every step fills and returns the same preallocated arrays,
+    so callers must copy anything they keep (``DummyVecEnv`` and ``SubprocVecEnv`` already do).
+
+    With ``local_view_size`` set to an odd K, observations also hold a ``local_view`` of the K x K fields around
+    ``curr_position`` (see ``LOCAL_VIEW_LAYERS``), turned so that ``curr_direction`` points up. Diagonal directions
+    are turned like the direction 45 degrees counter-clockwise of them. Flat observations append it after the other
+    fields.
+
+    ``adjacency_features`` turns the interchange observations (``adjacent_to_same_stop``, ``adjacent_to_other_stop``,
+    ``nearest_adjacent_position``) and the ``score_funcs.stop_adjacency`` reward on.
+
+    ``nearest_stops`` adds the offsets ``(dx, dy, 1)`` from ``curr_position`` to the targets of the ``nearest_stops``
+    closest stops still to be placed, closest first and padded with zero rows.
+
+    ``snapshot`` and ``restore`` branch an episode without copying it, for searching over actions.
+
+    With a ``recorder``, every episode is recorded as its seed, map id and actions (see ``TrajectoryReplayer``).
+    Resets without a seed then draw one from the env's generator, so that each episode can be replayed on its own.
+    """
+
+    # Every reward goes through this, so an env can swap it for anything with the same functions
+    score_funcs: Any = score_funcs
+
     def __init__(
         self,
         training_data: dict[str, EnvDataDef],
         max_steps: int = 15000,
         max_stops: int = 250,
         render_mode: str | None = None,
+        episode_cache_dir: str | None = None,
+        random_options: RandomOptions | None = None,
+        flat_observations: bool = False,
+        reuse_observation_buffers: bool = False,
+        local_view_size: int | None = None,
+        adjacency_features: bool = False,
+        nearest_stops: int = 0,
+        recorder: TrajectoryRecorder | None = None,
     ) -> None:
         super().__init__()
+        assert not (
+            flat_observations and (adjacency_features or nearest_stops > 0)
+        ), "The stop adjacency and nearest stop observations are not part of the flat observation layout"
+        assert local_view_size is None or (
+            local_view_size > 0 and local_view_size % 2 == 1
+        ), "The local view must have an odd size, so that it is centered on the current position"
+
         self.max_steps = max_steps
         self.max_stops = max_stops
-        self.random_options = RandomOptions(training_data)
+        self.random_options = (
+            random_options if random_options is not None else RandomOptions(training_data, cache_dir=episode_cache_dir)
+        )
         self.action_space = gym.spaces.Discrete(6)
-        spaces: dict[str, gym.spaces.Space] = {
-            "stop_in_adjacent_fields": gym.spaces.Box(0, 1, (8,), dtype=np.uint8),
-            "line_in_adjacent_fields": gym.spaces.Box(0, 1, (8,), dtype=np.uint8),
-            "num_of_consecutive_overlaps": gym.spaces.Box(0, 2, (1,), dtype=np.uint8),
-            # "num_of_turns": gym.spaces.Box(0, np.inf, (1,), dtype=np.int16),
-            # "stop_spacing": gym.spaces.Box(0, np.inf, (1,), dtype=np.int16),
-            "steps_since_stop": gym.spaces.Box(0, np.inf, (1,), dtype=np.int16),
-            "curr_direction": gym.spaces.Discrete(8),
-            "curr_position": gym.spaces.Box(-np.inf, np.inf, (2,), dtype=np.int16),
-            "next_stop_distance": gym.spaces.Box(0, np.inf, (1,), dtype=np.float32),
-            # "adjacent_to_same_stop": gym.spaces.Discrete(2),
-            # "adjacent_to_other_stop": gym.spaces.Discrete(2),
-            # "nearest_adjacent_position": gym.spaces.Box(0, np.inf, (1,), dtype=np.float32),
-            "should_place_stop": gym.spaces.Discrete(2),
-        }
-        self.observation_space = gym.spaces.Dict(spaces)
+        self.observation_space = (
+            flat_observation_space(local_view_size)
+            if flat_observations
+            else gym.spaces.Dict(observation_spaces(local_view_size, adjacency_features, nearest_stops))
+        )
+        self.flat_observations = flat_observations
+        self.reuse_observation_buffers = reuse_observation_buffers
+        self.local_view_size = local_view_size
+        self.adjacency_features = adjacency_features
+        self.nearest_stops = nearest_stops
+        # Targets of the stops from the cursor on, keyed by schedule position. Only kept when nearest_stops > 0
+        self.stop_targets: SpatialHashGrid[int] = SpatialHashGrid(score_funcs.STOP_PLACEMENT_RADIUS)
+        self.__distance_key: tuple[Coordinates2d, Coordinates2d] | None = None
+        self.__distance = 0.0
+        self.recorder = recorder
         self.render_mode = render_mode
+        self.renderer = MapRenderer({}) if render_mode is not None else None
+        self.instrumentation: Instrumentation | None = None
+
+        self.stop_in_adjacent_fields = np.zeros((8,), dtype=np.uint8)
+        self.line_in_adjacent_fields = np.zeros((8,), dtype=np.uint8)
+        self.out_of_bounds_in_adjacent_fields = np.zeros((8,), dtype=np.uint8)
+        self.__observation_buffers: dict[str, Any] = {
+            "stop_in_adjacent_fields": np.zeros((8,), dtype=np.uint8),
+            "line_in_adjacent_fields": np.zeros((8,), dtype=np.uint8),
+            "num_of_consecutive_overlaps": np.zeros((1,), dtype=np.uint8),
+            "curr_direction": 0,
+            "curr_position": np.zeros((2,), dtype=np.int16),
+            "steps_since_stop": np.zeros((1,), dtype=np.int16),
+            "should_place_stop": 0,
+            "next_stop_distance": np.zeros((1,), dtype=np.float32),
+        }
+        if nearest_stops > 0:
+            self.__observation_buffers["nearest_stops"] = np.zeros((nearest_stops, 3), dtype=np.float32)
+        if local_view_size is not None:
+            self.__observation_buffers["local_view"] = np.zeros(
+                (LOCAL_VIEW_LAYERS, local_view_size, local_view_size), dtype=np.uint8
+            )
+        self.__flat_observation_buffer = np.zeros((flat_observation_size(local_view_size),), dtype=np.float32)
+
+        self.episode = 0
+        # Undo log of everything placed since the first snapshot of the episode, None until a snapshot is taken
+        self.__journal: list[Any] | None = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the episode has reached the end of its last line, i.e. it ended by completing the map."""
+        return self.__end_of_all_lines()
 
     @property
     def stops_remaining_curr(self) -> int:
-        return len(self.lines[self.curr_line]) - (self.curr_stop_index + 1)
+        return self.line_offsets[self.curr_line_index + 1] - (self.cursor + 1)
 
     @property
     def curr_line(self) -> str:
-        return list(self.lines.keys())[self.curr_line_index]
+        return self.line_ids[self.curr_line_index]
 
     @property
     def stops_remaining_all(self) -> int:
-        all_stops: list[Stop] = []
-        for i, (_, stops) in enumerate(self.lines.items()):
-            if i <= self.curr_line_index:
-                continue
-            all_stops.extend(stops)
-
-        return len(all_stops) + self.stops_remaining_curr
+        return self.total_num_stops - (self.cursor + 1)
 
     @property
     def curr_stop(self) -> Stop:
-        return self.lines[self.curr_line][self.curr_stop_index]
+        return self.schedule_stops[self.cursor]
 
     def reset(
         self, *, seed: int | None = None, options: dict[str, Any] | None = None
-    ) -> tuple[dict[str, Any], dict[str, Any]]:
+    ) -> tuple[dict[str, Any] | np.ndarray, dict[str, Any]]:
+        if self.recorder is not None and seed is None:
+            seed = int(self.np_random.integers(2**63))
         super().reset(seed=seed, options=options)
 
         info: dict[str, Any] = {}
@@ -90,44 +264,69 @@ class MetroMapEnv(gym.Env):
 
             env_data = self.random_options.generate_env_data(self.np_random)
 
+        self.episode += 1
+        self.__journal = None
         self.placed_lines: dict[Coordinates2d, str] = {}
         self.placed_stops: dict[Coordinates2d, Stop] = {}
+        self.occupancy = OccupancyGrid()
+        if self.instrumentation is not None:
+            self.instrumentation.wrap(self.occupancy, INSTRUMENTED_OCCUPANCY_METHODS)
         self.lines = env_data.lines
+        schedule = env_data.schedule
+        if schedule is None:
+            schedule = EpisodeSchedule.from_lines(self.lines.items(), env_data.starting_positions)
+        # The episode's stops flattened in placement order; ``cursor`` indexes the current one
+        self.line_ids = schedule.line_ids
+        self.line_indices = {line_id: i + 1 for i, line_id in enumerate(self.line_ids)}
+        self.line_offsets = schedule.line_offsets.tolist()
+        self.schedule_stops = [stop for stops in self.lines.values() for stop in stops]
+        self.total_num_stops = schedule.num_stops
+        if self.nearest_stops > 0:
+            self.schedule_targets = [stop.position for stop in self.schedule_stops]
+            self.stop_targets.clear()
+            for index, target in enumerate(self.schedule_targets):
+                self.stop_targets.insert(target, index)
         self.stop_spacing = env_data.stop_spacing
         self.real_stop_angles = env_data.stop_angle_mapping
         self.max_turns, self.steps_to_count_turns = env_data.turn_limits
         self.starting_positions = env_data.starting_positions
         self.line_color_map = env_data.line_color_map
-        self.total_num_stops = len(flat_map(self.lines.values()))
+        if self.renderer is not None:
+            self.renderer.reset(self.line_color_map)
 
         self.steps_since_stop = 0
         self.consecutive_overlaps = 0
         self.stop_adjacency_map: StopAdjacency = StopAdjacency()
-        self.stop_in_adjacent_fields: np.ndarray = np.zeros((8,))
-        self.line_in_adjacent_fields: np.ndarray = np.zeros((8,))
-        self.out_of_bounds_in_adjacent_fields: np.ndarray = np.zeros((8,))
+        self.stop_in_adjacent_fields.fill(0)
+        self.line_in_adjacent_fields.fill(0)
+        self.out_of_bounds_in_adjacent_fields.fill(0)
         self.recent_turns = deque([0 for _ in range(self.steps_to_count_turns)], maxlen=self.steps_to_count_turns)
 
         self.curr_line_index = 0
-        self.lines_remaining_all = len(self.lines.keys()) - 1
+        self.lines_remaining_all = len(self.line_ids) - 1
         self.curr_position, self.curr_direction = self.starting_positions[self.curr_line]
         self.curr_stop_index = 0
-        self.curr_stop_init_distance: float = self.curr_position.distance_to(self.curr_stop.position)
+        self.cursor = 0
+        self.curr_stop_init_distance: float = self.__distance_to_curr_stop()
         self.curr_stop_prev_distance: float = 0
 
         self.total_steps = 0
 
+        if self.recorder is not None:
+            map_drawn = options is None or "env_data_def" not in options.keys()
+            self.recorder.begin(seed, env_data.name, map_drawn)  # type: ignore
+
         return (self.__compile_observations(), info)
 
-    def step(self, action: int) -> tuple[dict[str, Any], SupportsFloat, bool, bool, dict[str, Any]]:
+    def step(self, action: int) -> tuple[dict[str, Any] | np.ndarray, SupportsFloat, bool, bool, dict[str, Any]]:
         terminated: bool = False
         truncated: bool = False
         reward: float = 0
         info: dict[str, Any] = {}
 
-        self.line_in_adjacent_fields = np.zeros((8,))
-        self.stop_in_adjacent_fields = np.zeros((8,))
-        self.out_of_bounds_in_adjacent_fields = np.zeros((8,))
+        self.line_in_adjacent_fields.fill(0)
+        self.stop_in_adjacent_fields.fill(0)
+        self.out_of_bounds_in_adjacent_fields.fill(0)
 
         match action:
             case 0:
@@ -150,13 +349,26 @@ class MetroMapEnv(gym.Env):
 
         if self.total_steps > self.max_steps:
             truncated = True
-            reward += score_funcs.max_steps_reached()
+            reward += self.score_funcs.max_steps_reached()
+
+        # Overlaps and finishing record their reason where they end the episode
+        if truncated and not terminated:
+            info["termination_reason"] = "max_steps"
+
+        if self.recorder is not None:
+            self.recorder.record(action)
+            if terminated or truncated:
+                self.recorder.end(info["termination_reason"])
 
         if self.render_mode == "human":
-            img = render_map(self.placed_lines, self.placed_stops, self.line_color_map)
+            img = self.renderer.render()  # type: ignore
             cv2.imshow("a", cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
             cv2.waitKey(1)
 
+        if self.instrumentation is not None and (terminated or truncated):
+            self.instrumentation.count("episodes")
+            info["instrumentation"] = self.instrumentation.snapshot()
+
         return self.__compile_observations(), reward, terminated, truncated, info
 
     def render(self) -> RenderFrame | list[RenderFrame] | None:
@@ -167,12 +379,191 @@ class MetroMapEnv(gym.Env):
             return None
 
         if self.render_mode == "rgb_array":
-            return render_map(self.placed_lines, self.placed_stops, self.line_color_map)  # type: ignore
+            return self.renderer.render()  # type: ignore
 
         return super().render()
 
-    def __compile_observations(self) -> dict[str, Any]:
-        observations: dict[str, Any] = {}
+    def enable_instrumentation(self, instrumentation: Instrumentation | None = None) -> Instrumentation:
+        """
+        Starts timing the phases of ``step`` and ``reset`` (see ``INSTRUMENTED_ENV_METHODS``).
+
+        Totals accumulate until ``pop_instrumentation_stats`` is called, and are also added to ``info`` at the end of
+        every episode. Without this the env runs entirely uninstrumented.
+        """
+        if self.instrumentation is None:
+            self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+
+        self.instrumentation.wrap(self, INSTRUMENTED_ENV_METHODS)
+        self.instrumentation.wrap(self.random_options, INSTRUMENTED_RANDOM_OPTIONS_METHODS)
+        self.instrumentation.wrap(self.random_options.episode_cache, INSTRUMENTED_EPISODE_CACHE_METHODS)
+        if self.renderer is not None:
+            self.instrumentation.wrap(self.renderer, INSTRUMENTED_RENDERER_METHODS)
+        if hasattr(self, "occupancy"):
+            self.instrumentation.wrap(self.occupancy, INSTRUMENTED_OCCUPANCY_METHODS)
+
+        return self.instrumentation
+
+    def pop_instrumentation_stats(self) -> dict[str, float]:
+        """Returns the instrumentation totals since the last call and clears them (empty if not instrumented)."""
+        return self.instrumentation.pop() if self.instrumentation is not None else {}
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Which of the 6 actions would not end the episode on an overlap, for the maskable policies of ``sb3_contrib``.
+
+        Moves are masked when they land on a stop, or on a line right after another overlap. Placing a stop is masked
+        when the field ahead is taken, or when the move that follows it would be masked. When every action would end
+        the episode, none of them are masked.
+        """
+        direction = self.curr_direction
+        masks = np.empty((6,), dtype=bool)
+        for action, new_direction in enumerate(
+            (
+                direction,
+                direction.get_45_left(),
+                direction.get_90_left(),
+                direction.get_45_right(),
+                direction.get_90_right(),
+            )
+        ):
+            masks[action] = self.__can_move_to(self.curr_position + new_direction.value)
+
+        ahead = self.curr_position + direction.value
+        masks[5] = not self.occupancy.any_overlap(ahead) and (
+            self.__end_of_curr_line() or self.__can_move_to(ahead + direction.value)
+        )
+
+        if not masks.any():
+            masks.fill(True)
+
+        return masks
+
+    def snapshot(self) -> EnvSnapshot:
+        """
+        Captures the current state of the episode, for ``restore`` to return to.
+
+        Taking the first snapshot of an episode starts an undo journal of everything placed from then on, so only
+        the scalar state is copied. A snapshot can be restored as long as the episode has not been rolled back to
+        before it; restoring one snapshot does not invalidate the snapshots taken before it.
+        """
+        if self.__journal is None:
+            self.__journal = []
+
+        marker = object()
+        self.__journal.append(marker)
+
+        return EnvSnapshot(
+            self.episode,
+            len(self.__journal),
+            marker,
+            self.curr_position,
+            self.curr_direction,
+            self.curr_line_index,
+            self.lines_remaining_all,
+            self.curr_stop_index,
+            self.cursor,
+            self.curr_stop_init_distance,
+            self.curr_stop_prev_distance,
+            self.steps_since_stop,
+            self.consecutive_overlaps,
+            self.total_steps,
+            tuple(self.recent_turns),
+            self.stop_in_adjacent_fields.copy(),
+            self.line_in_adjacent_fields.copy(),
+        )
+
+    def restore(self, snapshot: EnvSnapshot) -> dict[str, Any] | np.ndarray:
+        """Rolls the episode back to ``snapshot`` and returns the observation of that state."""
+        journal = self.__journal
+        assert (
+            snapshot.episode == self.episode
+            and journal is not None
+            and len(journal) >= snapshot.journal_length
+            and journal[snapshot.journal_length - 1] is snapshot.marker
+        ), "The snapshot does not belong to the current path of this episode"
+
+        while len(journal) > snapshot.journal_length:
+            self.__undo(journal.pop())
+
+        self.curr_position = snapshot.curr_position
+        self.curr_direction = snapshot.curr_direction
+        self.curr_line_index = snapshot.curr_line_index
+        self.lines_remaining_all = snapshot.lines_remaining_all
+        self.curr_stop_index = snapshot.curr_stop_index
+        self.cursor = snapshot.cursor
+        self.curr_stop_init_distance = snapshot.curr_stop_init_distance
+        self.curr_stop_prev_distance = snapshot.curr_stop_prev_distance
+        self.steps_since_stop = snapshot.steps_since_stop
+        self.consecutive_overlaps = snapshot.consecutive_overlaps
+        self.total_steps = snapshot.total_steps
+        self.recent_turns.clear()
+        self.recent_turns.extend(snapshot.recent_turns)
+        self.stop_in_adjacent_fields[:] = snapshot.stop_in_adjacent_fields
+        self.line_in_adjacent_fields[:] = snapshot.line_in_adjacent_fields
+
+        if self.recorder is not None:
+            self.recorder.rewind(snapshot.total_steps)
+
+        if self.renderer is not None:
+            self.renderer.paint(self.placed_lines, self.placed_stops)
+
+        return self.__compile_observations()
+
+    def __undo(self, entry: Any) -> None:
+        if not isinstance(entry, tuple):
+            return
+
+        kind = entry[0]
+        if kind == _UNDO_LINE:
+            _, position, line_id, occupancy_line_id = entry
+            if line_id is None:
+                del self.placed_lines[position]
+            else:
+                self.placed_lines[position] = line_id
+            self.occupancy.set_line(position, occupancy_line_id)
+        elif kind == _UNDO_STOP:
+            _, position, stop, stop_position = entry
+            del self.placed_stops[position]
+            self.occupancy.set_stop(position, 0)
+            stop.position = stop_position
+        elif kind == _UNDO_ADJACENCY_ADD:
+            _, stop_id, position, was_first = entry
+            self.stop_adjacency_map.undo_add_adjacency_position(stop_id, position, was_first)
+        elif kind == _UNDO_ADJACENCY_REMOVE:
+            _, stop_id, position = entry
+            self.stop_adjacency_map.add_adjacency_position(stop_id, position)
+        elif kind == _UNDO_STOP_TARGET:
+            _, index = entry
+            self.stop_targets.insert(self.schedule_targets[index], index)
+
+    def __compile_observations(self) -> dict[str, Any] | np.ndarray:
+        distance = self.__distance_to_curr_stop()
+        should_place_stop = 1 if distance <= score_funcs.STOP_PLACEMENT_RADIUS else 0
+        next_stop_distance = 0 if self.curr_stop_index == 0 else distance
+
+        if self.flat_observations:
+            return self.__compile_flat_observations(should_place_stop, next_stop_distance)
+
+        if self.reuse_observation_buffers:
+            observations = self.__observation_buffers
+            observations["stop_in_adjacent_fields"][:] = self.stop_in_adjacent_fields
+            observations["line_in_adjacent_fields"][:] = self.line_in_adjacent_fields
+            observations["num_of_consecutive_overlaps"][0] = self.consecutive_overlaps
+            observations["curr_direction"] = int(self.curr_direction)
+            observations["curr_position"][:] = self.curr_position
+            observations["steps_since_stop"][0] = self.steps_since_stop
+            observations["should_place_stop"] = should_place_stop
+            observations["next_stop_distance"][0] = next_stop_distance
+            if self.adjacency_features:
+                observations.update(self.__compile_adjacency_observations())
+            if self.nearest_stops > 0:
+                self.__compile_nearest_stops(observations["nearest_stops"])
+            if self.local_view_size is not None:
+                observations["local_view"][:] = self.__compile_local_view()
+
+            return observations
+
+        observations = {}
 
         # "stop_in_adjacent_fields": gym.spaces.Box(0, 1, (8,), dtype=np.int16),
         # "line_in_adjacent_fields": gym.spaces.Box(0, 1, (8,), dtype=np.int16),
@@ -182,38 +573,94 @@ class MetroMapEnv(gym.Env):
         # "next_stop_distance": gym.spaces.Box(0, np.inf, (1,), dtype=np.float32),
         # "should_place_stop": gym.spaces.Discrete(2),
 
-        observations["stop_in_adjacent_fields"] = np.array(self.stop_in_adjacent_fields, dtype=np.uint8)
-        observations["line_in_adjacent_fields"] = np.array(self.line_in_adjacent_fields, dtype=np.uint8)
+        observations["stop_in_adjacent_fields"] = self.stop_in_adjacent_fields.copy()
+        observations["line_in_adjacent_fields"] = self.line_in_adjacent_fields.copy()
         observations["num_of_consecutive_overlaps"] = np.array([self.consecutive_overlaps], dtype=np.uint8)
         # observations["num_of_turns"] = np.array([sum(self.recent_turns)], dtype=np.int16)
         observations["curr_direction"] = int(self.curr_direction)
-        observations["curr_position"] = np.array(self.curr_position.to_tuple(), dtype=np.int16)
+        observations["curr_position"] = np.array(self.curr_position, dtype=np.int16)
         # observations["stop_spacing"] = np.array([self.stop_spacing], dtype=np.int16)
         observations["steps_since_stop"] = np.array([self.steps_since_stop], dtype=np.int16)
-        observations["should_place_stop"] = 1 if self.curr_position.distance_to(self.curr_stop.position) <= 25 else 0
-        observations["next_stop_distance"] = np.array(
-            [0 if self.curr_stop_index == 0 else self.curr_position.distance_to(self.curr_stop.position)],
-            dtype=np.float32,
-        )
-        # observations["adjacent_to_same_stop"] = (
-        #     1
-        #     if self.stop_adjacency_map.is_first(self.curr_stop.id)
-        #     or self.stop_adjacency_map.is_adjacent(self.curr_stop.id, self.curr_position + self.curr_direction.value)
-        #     else 0
-        # )
-        # observations["nearest_adjacent_position"] = np.array(
-        #     [self.__get_distance_to_nearest_adjacent()], dtype=np.float32
-        # )
-        # observations["adjacent_to_other_stop"] = (
-        #     1
-        #     if self.stop_adjacency_map.adjacent_to_other(
-        #         self.curr_stop.id, self.curr_position + self.curr_direction.value
-        #     )
-        #     else 0
-        # )
+        observations["should_place_stop"] = should_place_stop
+        observations["next_stop_distance"] = np.array([next_stop_distance], dtype=np.float32)
+        if self.adjacency_features:
+            observations.update(self.__compile_adjacency_observations())
+        if self.nearest_stops > 0:
+            observations["nearest_stops"] = self.__compile_nearest_stops(
+                np.empty((self.nearest_stops, 3), dtype=np.float32)
+            )
+        if self.local_view_size is not None:
+            observations["local_view"] = np.ascontiguousarray(self.__compile_local_view())
 
         return observations
 
+    def __compile_flat_observations(self, should_place_stop: int, next_stop_distance: float) -> np.ndarray:
+        if self.reuse_observation_buffers:
+            observations = self.__flat_observation_buffer
+        else:
+            observations = np.empty((flat_observation_size(self.local_view_size),), dtype=np.float32)
+
+        observations[_FLAT_STOP_FIELDS] = self.stop_in_adjacent_fields
+        observations[_FLAT_LINE_FIELDS] = self.line_in_adjacent_fields
+        observations[_FLAT_OVERLAPS] = self.consecutive_overlaps
+        observations[_FLAT_STEPS_SINCE_STOP] = self.steps_since_stop
+        observations[_FLAT_DIRECTION] = 0
+        observations[_FLAT_DIRECTION.start + int(self.curr_direction)] = 1
+        observations[_FLAT_POSITION] = self.curr_position
+        observations[_FLAT_NEXT_STOP_DISTANCE] = next_stop_distance
+        observations[_FLAT_SHOULD_PLACE_STOP] = should_place_stop
+        if self.local_view_size is not None:
+            observations[FLAT_OBSERVATION_SIZE:].reshape(LOCAL_VIEW_LAYERS, -1)[
+                :
+            ] = self.__compile_local_view().reshape(LOCAL_VIEW_LAYERS, -1)
+
+        return observations
+
+    def __compile_nearest_stops(self, out: np.ndarray) -> np.ndarray:
+        out.fill(0)
+        nearest = self.stop_targets.nearest(self.curr_position, self.nearest_stops)
+        for row, (_, index) in enumerate(nearest):
+            target = self.schedule_targets[index]
+            out[row] = (target.x - self.curr_position.x, target.y - self.curr_position.y, 1)
+
+        return out
+
+    def __compile_adjacency_observations(self) -> dict[str, Any]:
+        next_position = self.curr_position + self.curr_direction.value
+
+        return {
+            "adjacent_to_same_stop": (
+                1
+                if self.stop_adjacency_map.is_first(self.curr_stop.id)
+                or self.stop_adjacency_map.is_adjacent(self.curr_stop.id, next_position)
+                else 0
+            ),
+            "adjacent_to_other_stop": (
+                1 if self.stop_adjacency_map.adjacent_to_other(self.curr_stop.id, next_position) else 0
+            ),
+            "nearest_adjacent_position": np.array([self.__get_distance_to_nearest_adjacent()], dtype=np.float32),
+        }
+
+    def __compile_local_view(self) -> np.ndarray:
+        """The local view as a (possibly non-contiguous) ``(LOCAL_VIEW_LAYERS, K, K)`` view, see the class docstring."""
+        size = self.local_view_size
+        assert size is not None
+        radius = size // 2
+        x, y = int(self.curr_position.x), int(self.curr_position.y)
+
+        local_view = np.empty((LOCAL_VIEW_LAYERS, size, size), dtype=np.uint8)
+        # Rows of the window run along +y, i.e. north
+        np.not_equal(self.occupancy.grid.window(x - radius, y - radius, size, size), 0, out=local_view[:2])
+
+        local_view[2] = 0
+        # Targets are not always on a field, so they are shown on the nearest one
+        target_dx, target_dy = round(self.curr_stop.position.x) - x, round(self.curr_stop.position.y) - y
+        if -radius <= target_dx <= radius and -radius <= target_dy <= radius:
+            local_view[2, target_dy + radius, target_dx + radius] = 1
+
+        # Flipped to put north in the first row, then turned counter-clockwise in 90 degree steps per direction
+        return np.rot90(local_view[:, ::-1], k=int(self.curr_direction) // 2, axes=(1, 2))
+
     def __move_forward(self, after_stop: bool = False) -> tuple[bool, bool, float, dict[str, Any]]:
         terminated: bool = False
         truncated: bool = False
@@ -225,16 +672,18 @@ class MetroMapEnv(gym.Env):
         self.steps_since_stop += 1
         self.recent_turns.append(0)
 
-        if any_overlap(self.placed_lines, self.placed_stops, self.curr_position):
+        if self.occupancy.any_overlap(self.curr_position):
             self.consecutive_overlaps += 1
 
-            if stop_overlap(self.placed_stops, self.curr_position):
-                reward += score_funcs.stop_overlap()
+            if self.occupancy.stop_overlap(self.curr_position):
+                reward += self.score_funcs.stop_overlap()
                 terminated = True
+                info["termination_reason"] = "stop_overlap"
 
             if self.consecutive_overlaps > 1:
-                reward += score_funcs.line_overlap(self.consecutive_overlaps)
+                reward += self.score_funcs.line_overlap(self.consecutive_overlaps)
                 terminated = True
+                info.setdefault("termination_reason", "line_overlap")
 
             if terminated:
                 return terminated, truncated, reward, info
@@ -242,16 +691,28 @@ class MetroMapEnv(gym.Env):
         else:
             self.consecutive_overlaps = 0
 
-        reward += score_funcs.line_overlap(self.consecutive_overlaps)
+        reward += self.score_funcs.line_overlap(self.consecutive_overlaps)
         # reward += score_funcs.stop_distribution(self.steps_since_stop, self.stop_spacing)
-        dist_to_real_stop = self.curr_position.distance_to(self.curr_stop.position)
+        dist_to_real_stop = self.__distance_to_curr_stop()
         if not after_stop:
-            reward += score_funcs.distance_to_real_stop(
+            reward += self.score_funcs.distance_to_real_stop(
                 dist_to_real_stop, self.curr_stop_prev_distance, self.steps_since_stop
             )
         self.curr_stop_prev_distance = dist_to_real_stop
 
+        if self.__journal is not None:
+            self.__journal.append(
+                (
+                    _UNDO_LINE,
+                    self.curr_position,
+                    self.placed_lines.get(self.curr_position),
+                    self.occupancy.line_at(self.curr_position),
+                )
+            )
         self.placed_lines[self.curr_position] = self.curr_line
+        if self.renderer is not None:
+            self.renderer.add_line(self.curr_position, self.curr_line)
+        self.occupancy.set_line(self.curr_position, self.line_indices[self.curr_line])
 
         self.__update_line_and_stop_adjacent()
 
@@ -285,34 +746,44 @@ class MetroMapEnv(gym.Env):
         # Move one step forward
         self.curr_position += self.curr_direction.value
 
-        if any_overlap(self.placed_lines, self.placed_stops, self.curr_position):
-            reward += score_funcs.stop_overlap()
+        if self.occupancy.any_overlap(self.curr_position):
+            reward += self.score_funcs.stop_overlap()
             terminated = True
+            # Penalized as a stop overlap whether the field holds a stop or a line
+            info["termination_reason"] = "stop_overlap"
 
             return terminated, truncated, reward, info
 
-        stop_to_place = self.lines[self.curr_line][self.curr_stop_index]
+        stop_to_place = self.curr_stop
+        if self.__journal is not None:
+            self.__journal.append((_UNDO_STOP, self.curr_position, stop_to_place, stop_to_place.position))
         self.placed_stops[self.curr_position] = stop_to_place
+        if self.renderer is not None:
+            self.renderer.add_stop(self.curr_position)
+        self.occupancy.set_stop(self.curr_position, self.cursor + 1)
 
         if self.curr_stop_index == 0:
-            reward += score_funcs.stop_placed(0)
+            reward += self.score_funcs.stop_placed(0)
         else:
-            reward += score_funcs.stop_placed(stop_to_place.position.distance_to(self.curr_position))
+            reward += self.score_funcs.stop_placed(self.__distance_to_curr_stop())
 
         stop_to_place.position = self.curr_position
 
         is_stop_first = self.stop_adjacency_map.is_first(stop_to_place.id)
-        # is_stop_placed_adjacent_wrong = self.stop_adjacency_map.adjacent_to_other(stop_to_place.id, self.curr_position) # noqa: E501
+        is_stop_placed_adjacent_wrong = self.adjacency_features and self.stop_adjacency_map.adjacent_to_other(
+            stop_to_place.id, self.curr_position
+        )
 
         if not is_stop_first:
             is_stop_placed_adjacent = self.stop_adjacency_map.is_adjacent(stop_to_place.id, self.curr_position)
             if is_stop_placed_adjacent:
                 self.__update_adjacency_map(stop_to_place)
 
-            # reward += score_funcs.stop_adjacency(is_stop_placed_adjacent_wrong, is_stop_placed_adjacent)
+            if self.adjacency_features:
+                reward += self.score_funcs.stop_adjacency(is_stop_placed_adjacent_wrong, is_stop_placed_adjacent)
         else:
-            # if self.curr_stop_index == 0:
-            # reward += score_funcs.stop_adjacency(is_stop_placed_adjacent_wrong, is_stop_first)
+            if self.adjacency_features:
+                reward += self.score_funcs.stop_adjacency(is_stop_placed_adjacent_wrong, is_stop_first)
             self.__update_adjacency_map(stop_to_place)
 
         self.steps_since_stop = 0
@@ -321,42 +792,59 @@ class MetroMapEnv(gym.Env):
 
         if not self.__end_of_curr_line():
             self.curr_stop_index += 1
-            self.curr_stop_init_distance = self.curr_position.distance_to(self.curr_stop.position)
+            self.__advance_cursor()
+            self.curr_stop_init_distance = self.__distance_to_curr_stop()
             self.curr_stop_prev_distance = 0
             step_terminated, step_truncated, step_reward, step_info = self.__move_forward(True)
             info.update(step_info)
         else:
             self.__handle_end_of_curr_line()
-            reward += score_funcs.finished()
+            reward += self.score_funcs.finished()
 
         terminated = self.__end_of_all_lines()
+        if terminated:
+            info["termination_reason"] = "finished"
 
         return (terminated or step_terminated, truncated or step_truncated, reward + step_reward, info)
 
     def __update_adjacency_map(self, stop_to_place: Stop):
-        self.stop_adjacency_map.remove_adjacency_position(stop_to_place.id, self.curr_position)
+        removed = self.stop_adjacency_map.remove_adjacency_position(stop_to_place.id, self.curr_position)
+        if self.__journal is not None and removed:
+            self.__journal.append((_UNDO_ADJACENCY_REMOVE, stop_to_place.id, self.curr_position))
 
         left_of_stop = self.curr_position + self.curr_direction.get_90_left().value
         right_of_stop = self.curr_position + self.curr_direction.get_90_right().value
 
-        if not any_overlap(self.placed_lines, self.placed_stops, left_of_stop):
-            self.stop_adjacency_map.add_adjacency_position(stop_to_place.id, left_of_stop)
+        for adjacent_position in (left_of_stop, right_of_stop):
+            if self.occupancy.any_overlap(adjacent_position):
+                continue
 
-        if not any_overlap(self.placed_lines, self.placed_stops, right_of_stop):
-            self.stop_adjacency_map.add_adjacency_position(stop_to_place.id, right_of_stop)
+            was_first = self.stop_adjacency_map.add_adjacency_position(stop_to_place.id, adjacent_position)
+            if self.__journal is not None:
+                self.__journal.append((_UNDO_ADJACENCY_ADD, stop_to_place.id, adjacent_position, was_first))
 
-    def __update_line_and_stop_adjacent(self) -> None:
-        for i, dir in enumerate(Direction.list()):
-            check_pos = self.curr_position + dir.value
+    def __advance_cursor(self) -> None:
+        if self.nearest_stops > 0:
+            self.stop_targets.remove(self.schedule_targets[self.cursor], self.cursor)
+            if self.__journal is not None:
+                self.__journal.append((_UNDO_STOP_TARGET, self.cursor))
 
-            if not any_overlap(self.placed_lines, self.placed_stops, check_pos):
-                continue
+        self.cursor += 1
 
-            if stop_overlap(self.placed_stops, check_pos):
-                self.stop_in_adjacent_fields[i] = 1
-                continue
+    def __distance_to_curr_stop(self) -> float:
+        """Distance from ``curr_position`` to the current stop, computed once per position and target."""
+        position, target = self.curr_position, self.curr_stop.position
+        key = self.__distance_key
+        if key is None or key[0] is not position or key[1] is not target:
+            self.__distance_key = (position, target)
+            self.__distance = position.distance_to(target)
 
-            self.line_in_adjacent_fields[i] = 1
+        return self.__distance
+
+    def __update_line_and_stop_adjacent(self) -> None:
+        self.occupancy.fill_adjacent_fields(
+            self.curr_position, self.stop_in_adjacent_fields, self.line_in_adjacent_fields
+        )
 
     def __get_distance_to_nearest_adjacent(self) -> float:
         if self.stop_adjacency_map.is_first(self.curr_stop.id):
@@ -380,10 +868,18 @@ class MetroMapEnv(gym.Env):
         self.lines_remaining_all -= 1
 
         self.curr_stop_index = 0
+        self.__advance_cursor()
         self.curr_position, self.curr_direction = self.starting_positions[self.curr_line]
-        self.curr_stop_init_distance = self.curr_position.distance_to(self.curr_stop.position)
+        self.curr_stop_init_distance = self.__distance_to_curr_stop()
         self.curr_stop_prev_distance = 0
 
+    def __can_move_to(self, position: Coordinates2d) -> bool:
+        """Whether moving onto ``position`` keeps the episode going, mirroring the overlap checks of ``__move_forward``."""
+        if self.occupancy.stop_overlap(position):
+            return False
+
+        return self.consecutive_overlaps == 0 or not self.occupancy.line_overlap(position)
+
     def __end_of_curr_line(self) -> bool:
         return self.stops_remaining_curr == 0
 
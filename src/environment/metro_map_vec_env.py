@@ -0,0 +1,394 @@
+from typing import Any, Sequence
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvIndices, VecEnvObs, VecEnvStepReturn
+from src.environment import score_funcs
+from src.environment import batched_score_funcs
+from src.environment.metro_map_env import (
+    observation_spaces,
+    flat_observation_space,
+    FLAT_OBSERVATION_FIELDS,
+    FLAT_OBSERVATION_SIZE,
+)
+from src.environment.random_options import RandomOptions
+from src.models.env_data import EnvDataDef
+from src.models.grid import Direction
+from src.models.batched_occupancy_grid import BatchedOccupancyGrid
+from src.utils.instrumentation import Instrumentation
+
+DIRECTION_VECTORS = np.array([direction.value for direction in Direction.list()], dtype=np.int64)
+
+# Change of direction index caused by each action, matching ``MetroMapEnv.step`` (5, placing a stop, keeps it)
+ACTION_TURNS = np.array([0, -1, -2, 1, 2, 0], dtype=np.int64)
+PLACE_STOP_ACTION = 5
+
+# ``MetroMapEnv`` methods that ``MetroMapVecEnv`` computes for the whole batch at once, so ``env_method`` can call them
+BATCHED_ENV_METHODS = ("action_masks",)
+
+# Methods timed by ``MetroMapVecEnv.enable_instrumentation``, mapped to the phase they are reported under
+INSTRUMENTED_VEC_ENV_METHODS = {
+    "step_wait": "step",
+    "reset": "reset",
+    "_MetroMapVecEnv__reset_envs": "reset/envs",
+    "_MetroMapVecEnv__move_forward": "step/move",
+    "_MetroMapVecEnv__place_stop": "step/place_stop",
+    "_MetroMapVecEnv__compile_observations": "step/observations",
+}
+INSTRUMENTED_BATCHED_OCCUPANCY_METHODS = {
+    "get_lines": "step/overlap",
+    "get_stops": "step/overlap",
+    "fill_adjacent_fields": "step/adjacency",
+}
+
+
+class MetroMapVecEnv(VecEnv):
+    """
+    Runs ``num_envs`` ``MetroMapEnv`` episodes side by side, stepping all of them with one set of NumPy operations.
+
+    Episode state is kept as struct-of-arrays and the maps are taken from the precompiled ``EpisodeSchedule`` of each
+    training map, so a batch step never touches pandas or per-episode Python objects. Finished episodes are reset
+    automatically, following the usual ``VecEnv`` conventions (``terminal_observation`` and ``TimeLimit.truncated``
+    in ``infos``).
+
+    Observations, rewards and terminations match ``MetroMapEnv`` step for step. The stop adjacency bookkeeping and
+    rendering are not replicated, as neither feeds into the observations or rewards. ``flat_observations`` selects
+    the same flat layout as ``MetroMapEnv``.
+    """
+
+    def __init__(
+        self,
+        training_data: dict[str, EnvDataDef],
+        num_envs: int,
+        max_steps: int = 15000,
+        random_options: RandomOptions | None = None,
+        episode_cache_dir: str | None = None,
+        flat_observations: bool = False,
+    ) -> None:
+        self.max_steps = max_steps
+        self.flat_observations = flat_observations
+        self.random_options = (
+            random_options if random_options is not None else RandomOptions(training_data, cache_dir=episode_cache_dir)
+        )
+        self.map_names = list(training_data.keys())
+        self.__load_maps()
+
+        self.render_mode = None
+        observation_space = flat_observation_space() if flat_observations else gym.spaces.Dict(observation_spaces())
+        super().__init__(num_envs, observation_space, gym.spaces.Discrete(6))
+
+        self.rand_gens = [np.random.default_rng() for _ in range(num_envs)]
+        self.occupancy = BatchedOccupancyGrid(num_envs)
+
+        self.map_indices = np.zeros(num_envs, dtype=np.int64)
+        self.positions = np.zeros((num_envs, 2), dtype=np.int64)
+        self.directions = np.zeros(num_envs, dtype=np.int64)
+        self.line_indices = np.zeros(num_envs, dtype=np.int64)
+        self.stop_indices = np.zeros(num_envs, dtype=np.int64)
+        self.cursors = np.zeros(num_envs, dtype=np.int64)
+        self.consecutive_overlaps = np.zeros(num_envs, dtype=np.int64)
+        self.steps_since_stop = np.zeros(num_envs, dtype=np.int64)
+        self.total_steps = np.zeros(num_envs, dtype=np.int64)
+        self.prev_distances = np.zeros(num_envs, dtype=np.float64)
+        self.all_stops_placed = np.zeros(num_envs, dtype=bool)
+        self.stop_in_adjacent_fields = np.zeros((num_envs, 8), dtype=np.uint8)
+        self.line_in_adjacent_fields = np.zeros((num_envs, 8), dtype=np.uint8)
+
+        self.actions = np.zeros(num_envs, dtype=np.int64)
+        self.instrumentation: Instrumentation | None = None
+
+    def __load_maps(self) -> None:
+        schedules = [self.random_options.get_schedule(name) for name in self.map_names]
+        num_maps = len(schedules)
+        max_lines = max(schedule.num_lines for schedule in schedules)
+        max_stops = max(schedule.num_stops for schedule in schedules)
+
+        self.map_num_lines = np.array([schedule.num_lines for schedule in schedules], dtype=np.int64)
+        self.map_line_offsets = np.zeros((num_maps, max_lines + 1), dtype=np.int64)
+        self.map_targets = np.zeros((num_maps, max_stops, 2), dtype=np.float64)
+        self.map_start_positions = np.zeros((num_maps, max_lines, 2), dtype=np.int64)
+        self.map_start_directions = np.zeros((num_maps, max_lines), dtype=np.int64)
+
+        for i, schedule in enumerate(schedules):
+            self.map_line_offsets[i, : schedule.num_lines + 1] = schedule.line_offsets
+            self.map_targets[i, : schedule.num_stops] = schedule.targets
+            self.map_start_positions[i, : schedule.num_lines] = schedule.start_positions
+            self.map_start_directions[i, : schedule.num_lines] = schedule.start_directions
+
+    def reset(self) -> VecEnvObs:
+        for i, seed in enumerate(self._seeds):
+            if seed is not None:
+                self.rand_gens[i] = np.random.default_rng(seed)
+
+        self.__reset_envs(np.arange(self.num_envs))
+        self._reset_seeds()
+        self._reset_options()
+
+        return self.__compile_observations()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        actions = self.actions
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+
+        self.stop_in_adjacent_fields[:] = 0
+        self.line_in_adjacent_fields[:] = 0
+
+        moving = np.flatnonzero((actions >= 0) & (actions < PLACE_STOP_ACTION))
+        self.directions[moving] = (self.directions[moving] + ACTION_TURNS[actions[moving]]) % len(DIRECTION_VECTORS)
+
+        self.__move_forward(moving, rewards, terminated)
+        self.__place_stop(np.flatnonzero(actions == PLACE_STOP_ACTION), rewards, terminated)
+
+        self.total_steps += 1
+        truncated = self.total_steps > self.max_steps
+        rewards[truncated] += score_funcs.max_steps_reached()
+
+        observations = self.__compile_observations()
+        dones = terminated | truncated
+        infos: list[dict[str, Any]] = [{} for _ in range(self.num_envs)]
+
+        done_envs = np.flatnonzero(dones)
+        if len(done_envs) > 0:
+            for i in done_envs:
+                if isinstance(observations, dict):
+                    infos[i]["terminal_observation"] = {key: value[i].copy() for key, value in observations.items()}
+                else:
+                    infos[i]["terminal_observation"] = observations[i].copy()
+                infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+
+            self.__reset_envs(done_envs)
+            reset_observations = self.__compile_observations()
+            if isinstance(observations, dict):
+                for key, value in observations.items():
+                    value[done_envs] = reset_observations[key][done_envs]
+            else:
+                observations[done_envs] = reset_observations[done_envs]
+
+        return observations, rewards.astype(np.float32), dones, infos
+
+    def close(self) -> None:
+        pass
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        assert (
+            indices is None
+        ), "MetroMapVecEnv attributes are shared by the whole batch, so they can only be set for all"
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> list[Any]:
+        """Answers the ``MetroMapEnv`` methods in ``BATCHED_ENV_METHODS`` for the envs at ``indices``."""
+        if method_name not in BATCHED_ENV_METHODS:
+            raise NotImplementedError(
+                f"MetroMapVecEnv holds no per-episode envs to call '{method_name}' on, env_method only supports "
+                f"{', '.join(BATCHED_ENV_METHODS)}"
+            )
+
+        results = getattr(self, method_name)(*method_args, **method_kwargs)
+
+        return [results[i] for i in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class: type[gym.Wrapper], indices: VecEnvIndices = None) -> list[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def action_masks(self) -> np.ndarray:
+        """``MetroMapEnv.action_masks`` of every env, as a ``(num_envs, 6)`` array."""
+        envs = np.arange(self.num_envs)
+        masks = np.empty((self.num_envs, 6), dtype=bool)
+
+        move_directions = (self.directions[:, None] + ACTION_TURNS[None, :PLACE_STOP_ACTION]) % len(DIRECTION_VECTORS)
+        move_targets = (self.positions[:, None] + DIRECTION_VECTORS[move_directions]).reshape(-1, 2)
+        masks[:, :PLACE_STOP_ACTION] = self.__can_move_to(
+            np.repeat(envs, PLACE_STOP_ACTION), move_targets[:, 0], move_targets[:, 1]
+        ).reshape(self.num_envs, PLACE_STOP_ACTION)
+
+        ahead = self.positions + DIRECTION_VECTORS[self.directions]
+        beyond = ahead + DIRECTION_VECTORS[self.directions]
+        ahead_free = (self.occupancy.get_stops(envs, ahead[:, 0], ahead[:, 1]) == 0) & (
+            self.occupancy.get_lines(envs, ahead[:, 0], ahead[:, 1]) == 0
+        )
+        end_of_line = self.cursors + 1 == self.map_line_offsets[self.map_indices, self.line_indices + 1]
+        masks[:, PLACE_STOP_ACTION] = ahead_free & (end_of_line | self.__can_move_to(envs, beyond[:, 0], beyond[:, 1]))
+
+        masks[~masks.any(axis=1)] = True
+
+        return masks
+
+    def enable_instrumentation(self, instrumentation: Instrumentation | None = None) -> Instrumentation:
+        """Starts timing the phases of a batch step and reset (see ``INSTRUMENTED_VEC_ENV_METHODS``)."""
+        if self.instrumentation is None:
+            self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+
+        self.instrumentation.wrap(self, INSTRUMENTED_VEC_ENV_METHODS)
+        self.instrumentation.wrap(self.occupancy, INSTRUMENTED_BATCHED_OCCUPANCY_METHODS)
+
+        return self.instrumentation
+
+    def pop_instrumentation_stats(self) -> dict[str, float]:
+        """Returns the instrumentation totals since the last call and clears them (empty if not instrumented)."""
+        return self.instrumentation.pop() if self.instrumentation is not None else {}
+
+    def __reset_envs(self, envs: np.ndarray | Sequence[int]) -> None:
+        envs = np.asarray(envs, dtype=np.int64)
+
+        for i in envs:
+            data_name = self._options[i].get("env_data_def")
+            if data_name is not None:
+                self.map_indices[i] = self.map_names.index(data_name)
+            else:
+                self.map_indices[i] = self.rand_gens[i].integers(0, len(self.map_names))
+
+        maps = self.map_indices[envs]
+        self.positions[envs] = self.map_start_positions[maps, 0]
+        self.directions[envs] = self.map_start_directions[maps, 0]
+        self.line_indices[envs] = 0
+        self.stop_indices[envs] = 0
+        self.cursors[envs] = 0
+        self.consecutive_overlaps[envs] = 0
+        self.steps_since_stop[envs] = 0
+        self.total_steps[envs] = 0
+        self.prev_distances[envs] = 0
+        self.all_stops_placed[envs] = False
+        self.stop_in_adjacent_fields[envs] = 0
+        self.line_in_adjacent_fields[envs] = 0
+
+        self.occupancy.clear(envs, self.positions[envs])
+
+    def __distances_to_curr_stop(self, envs: np.ndarray) -> np.ndarray:
+        delta = self.positions[envs] - self.map_targets[self.map_indices[envs], self.cursors[envs]]
+        return np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+
+    def __can_move_to(self, envs: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        on_line = self.occupancy.get_lines(envs, xs, ys) != 0
+
+        return (self.occupancy.get_stops(envs, xs, ys) == 0) & ((self.consecutive_overlaps[envs] == 0) | ~on_line)
+
+    def __move_forward(
+        self, envs: np.ndarray, rewards: np.ndarray, terminated: np.ndarray, after_stop: bool = False
+    ) -> None:
+        if len(envs) == 0:
+            return
+
+        self.positions[envs] += DIRECTION_VECTORS[self.directions[envs]]
+        self.steps_since_stop[envs] += 1
+
+        xs, ys = self.positions[envs, 0], self.positions[envs, 1]
+        on_stop = self.occupancy.get_stops(envs, xs, ys) != 0
+        overlap = on_stop | (self.occupancy.get_lines(envs, xs, ys) != 0)
+
+        consecutive_overlaps = np.where(overlap, self.consecutive_overlaps[envs] + 1, 0)
+        self.consecutive_overlaps[envs] = consecutive_overlaps
+
+        repeated_overlap = overlap & (consecutive_overlaps > 1)
+        step_terminated = on_stop | repeated_overlap
+        rewards[envs[on_stop]] += score_funcs.stop_overlap()
+        rewards[envs[repeated_overlap]] += batched_score_funcs.line_overlap(consecutive_overlaps[repeated_overlap])
+        terminated[envs[step_terminated]] = True
+
+        alive = ~step_terminated
+        envs = envs[alive]
+        if len(envs) == 0:
+            return
+
+        step_rewards = batched_score_funcs.line_overlap(consecutive_overlaps[alive])
+        distances = self.__distances_to_curr_stop(envs)
+        if not after_stop:
+            step_rewards += batched_score_funcs.distance_to_real_stop(
+                distances, self.prev_distances[envs], self.steps_since_stop[envs]
+            )
+        self.prev_distances[envs] = distances
+        rewards[envs] += step_rewards
+
+        self.occupancy.set_lines(envs, xs[alive], ys[alive], (self.line_indices[envs] + 1).astype(np.int16))
+        self.occupancy.fill_adjacent_fields(
+            envs, self.positions[envs], self.stop_in_adjacent_fields, self.line_in_adjacent_fields
+        )
+
+    def __place_stop(self, envs: np.ndarray, rewards: np.ndarray, terminated: np.ndarray) -> None:
+        if len(envs) == 0:
+            return
+
+        self.positions[envs] += DIRECTION_VECTORS[self.directions[envs]]
+
+        xs, ys = self.positions[envs, 0], self.positions[envs, 1]
+        overlap = (self.occupancy.get_stops(envs, xs, ys) != 0) | (self.occupancy.get_lines(envs, xs, ys) != 0)
+        rewards[envs[overlap]] += score_funcs.stop_overlap()
+        terminated[envs[overlap]] = True
+
+        envs = envs[~overlap]
+        if len(envs) == 0:
+            return
+
+        self.occupancy.set_stops(
+            envs, self.positions[envs, 0], self.positions[envs, 1], (self.cursors[envs] + 1).astype(np.int16)
+        )
+        distances = np.where(self.stop_indices[envs] == 0, 0, self.__distances_to_curr_stop(envs))
+        rewards[envs] += batched_score_funcs.stop_placed(distances)
+
+        self.steps_since_stop[envs] = 0
+        self.occupancy.fill_adjacent_fields(
+            envs, self.positions[envs], self.stop_in_adjacent_fields, self.line_in_adjacent_fields
+        )
+
+        maps = self.map_indices[envs]
+        end_of_line = self.cursors[envs] + 1 == self.map_line_offsets[maps, self.line_indices[envs] + 1]
+
+        continuing = envs[~end_of_line]
+        self.cursors[continuing] += 1
+        self.stop_indices[continuing] += 1
+        self.prev_distances[continuing] = 0
+        self.__move_forward(continuing, rewards, terminated, after_stop=True)
+
+        finished_line = envs[end_of_line]
+        rewards[finished_line] += score_funcs.finished()
+
+        last_line = self.line_indices[finished_line] + 1 == self.map_num_lines[self.map_indices[finished_line]]
+        finished_all = finished_line[last_line]
+        self.all_stops_placed[finished_all] = True
+        terminated[finished_all] = True
+
+        next_line = finished_line[~last_line]
+        maps = self.map_indices[next_line]
+        self.line_indices[next_line] += 1
+        self.cursors[next_line] += 1
+        self.stop_indices[next_line] = 0
+        self.positions[next_line] = self.map_start_positions[maps, self.line_indices[next_line]]
+        self.directions[next_line] = self.map_start_directions[maps, self.line_indices[next_line]]
+        self.prev_distances[next_line] = 0
+
+    def __compile_observations(self) -> dict[str, np.ndarray] | np.ndarray:
+        envs = np.arange(self.num_envs)
+        # Once every stop is placed the current stop sits under the current position, as in ``MetroMapEnv``
+        distances = np.where(self.all_stops_placed, 0, self.__distances_to_curr_stop(envs))
+        next_stop_distances = np.where(self.stop_indices == 0, 0, distances)
+
+        if self.flat_observations:
+            observations = np.zeros((self.num_envs, FLAT_OBSERVATION_SIZE), dtype=np.float32)
+            observations[:, FLAT_OBSERVATION_FIELDS["stop_in_adjacent_fields"]] = self.stop_in_adjacent_fields
+            observations[:, FLAT_OBSERVATION_FIELDS["line_in_adjacent_fields"]] = self.line_in_adjacent_fields
+            observations[:, FLAT_OBSERVATION_FIELDS["num_of_consecutive_overlaps"].start] = self.consecutive_overlaps
+            observations[:, FLAT_OBSERVATION_FIELDS["steps_since_stop"].start] = self.steps_since_stop
+            observations[envs, FLAT_OBSERVATION_FIELDS["curr_direction"].start + self.directions] = 1
+            observations[:, FLAT_OBSERVATION_FIELDS["curr_position"]] = self.positions
+            observations[:, FLAT_OBSERVATION_FIELDS["next_stop_distance"].start] = next_stop_distances
+            observations[:, FLAT_OBSERVATION_FIELDS["should_place_stop"].start] = (
+                distances <= score_funcs.STOP_PLACEMENT_RADIUS
+            )
+
+            return observations
+
+        return {
+            "stop_in_adjacent_fields": self.stop_in_adjacent_fields.copy(),
+            "line_in_adjacent_fields": self.line_in_adjacent_fields.copy(),
+            "num_of_consecutive_overlaps": self.consecutive_overlaps.astype(np.uint8)[:, None],
+            "curr_direction": self.directions.copy(),
+            "curr_position": self.positions.astype(np.int16),
+            "steps_since_stop": self.steps_since_stop.astype(np.int16)[:, None],
+            "should_place_stop": (distances <= score_funcs.STOP_PLACEMENT_RADIUS).astype(np.int64),
+            "next_stop_distance": next_stop_distances.astype(np.float32)[:, None],
+        }
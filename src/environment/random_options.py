@@ -1,26 +1,49 @@
 from src.models.env_data import EnvDataDef, EnvData
 from src.data_handling.parser import StopsPerRouteParser, StopsParser
-from src.data_handling.data_modifiers import (
-    normalize_stop_positions,
-    remove_duplicate_stops,
-    dataframe_as_routes_and_stops,
-    extract_stop_angle_mappings,
-)
-from src.constants.data import STOP_NUMBER_COLUMN
-from pandas import DataFrame  # type: ignore
+from src.data_handling.episode_cache import EpisodeCache
+from src.models.episode_schedule import EpisodeSchedule
+from src.constants.data import ROUTES_DATA_PATH, STOPS_DATA_PATH
 import numpy as np
-from src.models.stop import Stop
 
 
 class RandomOptions:
-    def __init__(self, data: dict[str, EnvDataDef]) -> None:
+    def __init__(
+        self,
+        data: dict[str, EnvDataDef],
+        cache_dir: str | None = None,
+        routes_parser: StopsPerRouteParser | None = None,
+        stops_parser: StopsParser | None = None,
+        routes_data_path: str = ROUTES_DATA_PATH,
+        stops_data_path: str = STOPS_DATA_PATH,
+    ) -> None:
         self.data = data
 
-        self.routes_parser = StopsPerRouteParser()
-        self.routes_parser.load_data("./src/data/stops_per_route.dbf")
+        if routes_parser is None:
+            routes_parser = StopsPerRouteParser()
+            routes_parser.load_data(routes_data_path)
+        self.routes_parser = routes_parser
 
-        self.stops_parser = StopsParser()
-        self.stops_parser.load_data("./src/data/stops.dbf")
+        if stops_parser is None:
+            stops_parser = StopsParser()
+            stops_parser.load_data(stops_data_path)
+        self.stops_parser = stops_parser
+
+        self.episode_cache = EpisodeCache(
+            self.routes_parser, self.stops_parser, [routes_data_path, stops_data_path], cache_dir
+        )
+        self.__schedules: dict[str, EpisodeSchedule] = {}
+
+    def precompile(self) -> None:
+        """Compiles the episode templates of every map up front, instead of on the first reset that draws them."""
+        self.episode_cache.get_many(self.data)
+
+    def get_schedule(self, data_name: str) -> EpisodeSchedule:
+        if data_name not in self.__schedules:
+            env_data_def = self.data[data_name]
+            template = self.episode_cache.get(data_name, env_data_def)
+            self.__schedules[data_name] = EpisodeSchedule.compile(template, env_data_def.starting_positions)
+
+        return self.__schedules[data_name]
 
     def generate_env_data(self, rand_gen: np.random.Generator | None = None, data_name: str | None = None) -> EnvData:
         if data_name is None:
@@ -37,47 +60,16 @@ class RandomOptions:
             max_turns, lookback_range = env_data_def.turn_limits
             stop_distribution = env_data_def.stop_spacing
 
-        routes_df = self._load_and_parse_data(env_data_def.starting_stops)
-
-        routes_dict = dataframe_as_routes_and_stops(routes_df)
-
-        stop_angle_mapping = extract_stop_angle_mappings(routes_dict)
-
-        normalized_routes_dict: dict[str, list[Stop]] = normalize_stop_positions(
-            routes_dict, env_data_def.starting_stops
-        )
-
-        final_routes_dict: dict[str, list[Stop]] = {
-            key: normalized_routes_dict[key] for key in env_data_def.starting_positions.keys()
-        }
-
-        # all_stops = flat_map(normalized_routes_dict.values())
-        # plt.subplot(111)
-        # plt.scatter(
-        #     [stop.position.x for stop in all_stops],
-        #     [stop.position.y for stop in all_stops],
-        #     c="r",
-        # )
-        # plt.scatter(
-        #     [stop.get_original_position().x for stop in all_stops],
-        #     [stop.get_original_position().y for stop in all_stops],
-        #     c="g",
-        # )
-
-        # plt.show()
+        template = self.episode_cache.get(data_name, env_data_def)
 
         return EnvData(
-            final_routes_dict,
+            template.instantiate_lines(),
             env_data_def.starting_stops,
             env_data_def.starting_positions,
-            stop_angle_mapping,
+            template.stop_angle_mapping,
             env_data_def.line_color_map,
             (max_turns, lookback_range),
             stop_distribution,
+            self.get_schedule(data_name),
+            data_name,
         )
-
-    def _load_and_parse_data(self, starting_stops: list[str]) -> DataFrame:
-        routes_data = self.routes_parser.filter_data(starting_stops)
-        stops_data = self.stops_parser.filter_data(list(routes_data[STOP_NUMBER_COLUMN].drop_duplicates()))
-
-        return remove_duplicate_stops(routes_data, stops_data, starting_stops)
@@ -1,49 +1,151 @@
 import numpy as np
 from src.models import Coordinates2d, Stop
-import cv2  # type: ignore
+
+STOP_COLOR = (255, 255, 255)
+
+
+class MapRenderer:
+    """
+    Keeps a canvas of everything placed so far, so a frame only costs painting the cells added since the last one.
+
+    Each cell is drawn as a ``scale`` x ``scale`` block, stops on top of lines, and frames are cropped to the bounding
+    box of the placed cells plus ``margin // 2`` cells of border on every side. The canvas grows (with slack) only
+    when that bounding box leaves it.
+    """
+
+    def __init__(self, color_map: dict[str, tuple[int, int, int]], margin: int = 10, scale: int = 2) -> None:
+        self.margin = margin
+        self.scale = scale
+        self.reset(color_map)
+
+    def reset(self, color_map: dict[str, tuple[int, int, int]] | None = None) -> None:
+        if color_map is not None:
+            self.color_map = color_map
+
+        self.__canvas = np.zeros((0, 0, 3), dtype=np.uint8)
+        self.__origin = (0, 0)
+        self.__bounds: tuple[int, int, int, int] | None = None
+        self.__stop_cells: set[tuple[int, int]] = set()
+        self.__pending_lines: dict[tuple[int, int], str] = {}
+        self.__pending_stops: dict[tuple[int, int], None] = {}
+
+    def add_line(self, position: Coordinates2d, line_id: str) -> None:
+        self.__pending_lines[(int(position.x), int(-position.y))] = line_id
+
+    def add_stop(self, position: Coordinates2d) -> None:
+        self.__pending_stops[(int(position.x), int(-position.y))] = None
+
+    def paint(self, lines: dict[Coordinates2d, str], stops: dict[Coordinates2d, Stop]) -> None:
+        """Clears the canvas and paints every given cell in bulk."""
+        self.reset()
+
+        for position, line_id in lines.items():
+            self.add_line(position, line_id)
+
+        for position in stops.keys():
+            self.add_stop(position)
+
+    def render(self) -> np.ndarray:
+        self.__flush()
+
+        half_margin = self.margin // 2
+        if self.__bounds is None:
+            min_col, min_row, max_col, max_row = 0, 0, 0, 0
+        else:
+            min_col, min_row, max_col, max_row = self.__bounds
+
+        width = max(max_col - min_col + self.margin, 1)
+        height = max(max_row - min_row + self.margin, 1)
+        if self.__bounds is None:
+            return np.zeros((height * self.scale, width * self.scale, 3), dtype=np.uint8)
+
+        top = (min_row - half_margin - self.__origin[1]) * self.scale
+        left = (min_col - half_margin - self.__origin[0]) * self.scale
+
+        return self.__canvas[top : top + height * self.scale, left : left + width * self.scale].copy()
+
+    def __flush(self) -> None:
+        if len(self.__pending_lines) == 0 and len(self.__pending_stops) == 0:
+            return
+
+        lines = [(cell, line_id) for cell, line_id in self.__pending_lines.items() if cell not in self.__stop_cells]
+        stops = [cell for cell in self.__pending_stops.keys() if cell not in self.__stop_cells]
+        self.__pending_lines.clear()
+        self.__pending_stops.clear()
+
+        cells = np.array([cell for cell, _ in lines] + stops, dtype=np.int64).reshape(-1, 2)
+        if len(cells) == 0:
+            return
+
+        self.__include(cells)
+
+        if len(lines) > 0:
+            colors = np.array([self.color_map[line_id] for _, line_id in lines], dtype=np.uint8)
+            self.__paint_cells(cells[: len(lines)], colors)
+
+        if len(stops) > 0:
+            self.__paint_cells(cells[len(lines) :], np.array(STOP_COLOR, dtype=np.uint8))
+            self.__stop_cells.update(stops)
+
+    def __paint_cells(self, cells: np.ndarray, colors: np.ndarray) -> None:
+        rows = (cells[:, 1] - self.__origin[1]) * self.scale
+        cols = (cells[:, 0] - self.__origin[0]) * self.scale
+
+        for row_offset in range(self.scale):
+            for col_offset in range(self.scale):
+                self.__canvas[rows + row_offset, cols + col_offset] = colors
+
+    def __include(self, cells: np.ndarray) -> None:
+        min_col, min_row = cells.min(axis=0).tolist()
+        max_col, max_row = cells.max(axis=0).tolist()
+        if self.__bounds is not None:
+            min_col = min(min_col, self.__bounds[0])
+            min_row = min(min_row, self.__bounds[1])
+            max_col = max(max_col, self.__bounds[2])
+            max_row = max(max_row, self.__bounds[3])
+        self.__bounds = (min_col, min_row, max_col, max_row)
+
+        # The crop spans [min - margin // 2, max + margin - margin // 2) on both axes.
+        needed_left = min_col - self.margin // 2
+        needed_top = min_row - self.margin // 2
+        needed_right = max_col + self.margin - self.margin // 2
+        needed_bottom = max_row + self.margin - self.margin // 2
+
+        origin_col, origin_row = self.__origin
+        num_rows, num_cols = self.__canvas.shape[0] // self.scale, self.__canvas.shape[1] // self.scale
+        if (
+            needed_left >= origin_col
+            and needed_top >= origin_row
+            and needed_right <= origin_col + num_cols
+            and needed_bottom <= origin_row + num_rows
+        ):
+            return
+
+        slack = max(self.margin // 2, 32, num_rows // 2, num_cols // 2)
+        if num_rows == 0 or num_cols == 0:
+            new_left, new_top = needed_left - slack, needed_top - slack
+            new_right, new_bottom = needed_right + slack, needed_bottom + slack
+        else:
+            right, bottom = origin_col + num_cols, origin_row + num_rows
+            new_left = origin_col if needed_left >= origin_col else needed_left - slack
+            new_top = origin_row if needed_top >= origin_row else needed_top - slack
+            new_right = right if needed_right <= right else needed_right + slack
+            new_bottom = bottom if needed_bottom <= bottom else needed_bottom + slack
+
+        canvas = np.zeros(((new_bottom - new_top) * self.scale, (new_right - new_left) * self.scale, 3), dtype=np.uint8)
+        if num_rows > 0 and num_cols > 0:
+            top = (origin_row - new_top) * self.scale
+            left = (origin_col - new_left) * self.scale
+            canvas[top : top + self.__canvas.shape[0], left : left + self.__canvas.shape[1]] = self.__canvas
+
+        self.__canvas = canvas
+        self.__origin = (new_left, new_top)
 
 
 def render_map(
     lines: dict[Coordinates2d, str], stops: dict[Coordinates2d, Stop], color_map: dict[str, tuple[int, int, int]]
 ) -> np.ndarray:
-    try:
-        min_x = min([pos.x for pos in lines.keys()] + [pos.x for pos in stops.keys()])  # -1499
-        min_y = min([-pos.y for pos in lines.keys()] + [-pos.y for pos in stops.keys()])  # -1324
-        max_x = max([pos.x for pos in lines.keys()] + [pos.x for pos in stops.keys()])  # 1422
-        max_y = max([-pos.y for pos in lines.keys()] + [-pos.y for pos in stops.keys()])  # 1530
-    except ValueError:
-        min_x, max_x, min_y, max_y = 0, 0, 0, 0
-
-    margin = 10
-
-    width = abs(max_x - min_x) + margin
-    height = abs(max_y - min_y) + margin
-
-    width = max(width, 1)
-    height = max(height, 1)
-
-    img = np.zeros((height * 2, width * 2, 3), dtype="uint8")  # type: ignore
-
-    for pos, line_id in lines.items():
-        pos_x = (pos.x + abs(min_x) + margin // 2) * 2
-        pos_y = (-pos.y + abs(min_y) + margin // 2) * 2
-        cv2.rectangle(
-            img,
-            (pos_x, pos_y),
-            (pos_x + 1, pos_y + 1),
-            color_map[line_id],
-            thickness=cv2.FILLED,
-        )
-
-    for pos, _ in stops.items():
-        pos_x = (pos.x + abs(min_x) + margin // 2) * 2
-        pos_y = (-pos.y + abs(min_y) + margin // 2) * 2
-        cv2.rectangle(
-            img,
-            (pos_x, pos_y),
-            (pos_x + 1, pos_y + 1),
-            (255, 255, 255),
-            thickness=cv2.FILLED,
-        )
-
-    return img
+    renderer = MapRenderer(color_map)
+    renderer.paint(lines, stops)
+
+    return renderer.render()
@@ -9,6 +9,9 @@ C_MINIMIZE_TURNS = 2
 C_FINISHED = 50
 C_TIME_ALIVE = 1
 
+# Stops placed within this distance of their real position count as placed correctly
+STOP_PLACEMENT_RADIUS = 25
+
 
 def line_overlap(consecutive_overlaps: int) -> float:
     if consecutive_overlaps <= 0:
@@ -29,11 +32,11 @@ def max_steps_reached() -> float:
     return C_OUT_OF_BOUNDS * -1
 
 
-# def stop_adjacency(stop_placed_adjacent_wrong: bool, stop_placed_adjacent: bool) -> float:
-#     if stop_placed_adjacent_wrong:
-#         return C_STOP_ADJACENCY * -1
+def stop_adjacency(stop_placed_adjacent_wrong: bool, stop_placed_adjacent: bool) -> float:
+    if stop_placed_adjacent_wrong:
+        return C_STOP_ADJACENCY * -1
 
-#     return C_STOP_ADJACENCY * (1 if stop_placed_adjacent else -0.5)
+    return C_STOP_ADJACENCY * (1 if stop_placed_adjacent else -0.5)
 
 
 # def stop_distribution(steps_since_stop: int, stop_distribution: int) -> float:
@@ -46,7 +49,7 @@ def max_steps_reached() -> float:
 
 
 def stop_placed(distance_to_real_stop: float) -> float:
-    if abs(distance_to_real_stop) <= 25:
+    if abs(distance_to_real_stop) <= STOP_PLACEMENT_RADIUS:
         return C_STOP_RELATIVE_POS * 1
 
     return C_STOP_RELATIVE_POS * -1
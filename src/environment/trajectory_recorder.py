@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+import numpy as np
+from src.models.trajectory import TRAJECTORY_FILE_MAGIC, Trajectory
+
+
+class TrajectoryRecorder:
+    """
+    Records the episodes of a ``MetroMapEnv`` as trajectories appended to the file at ``path``.
+
+    Actions are buffered in memory during an episode. Ended episodes are handed to a background thread, which packs
+    them and writes them out, so stepping never waits on compression or the disk. Pass the recorder to the env as
+    ``recorder``; every env needs its own file, and ``close`` must be called to write out what is still queued.
+    """
+
+    def __init__(self, path: str, max_queued: int = 1024) -> None:
+        self.path = path
+        self.episodes = 0
+
+        self.__episode: tuple[int, str, bool] | None = None
+        self.__actions = bytearray()
+        self.__queue: queue.Queue[Trajectory | None] = queue.Queue(max_queued)
+        self.__error: BaseException | None = None
+        self.__writer = threading.Thread(target=self.__write, name=f"TrajectoryRecorder({path})", daemon=True)
+        self.__writer.start()
+
+    def begin(self, seed: int, map_id: str, map_drawn: bool) -> None:
+        """Starts recording an episode, ending the one still in progress (without a termination reason) first."""
+        if self.__episode is not None:
+            self.end(None)
+
+        self.__episode = (seed, map_id, map_drawn)
+        self.__actions.clear()
+
+    def record(self, action: int) -> None:
+        if self.__episode is not None:
+            self.__actions.append(action)
+
+    def rewind(self, num_actions: int) -> None:
+        """Drops the actions after the first ``num_actions`` of the episode in progress, for ``MetroMapEnv.restore``."""
+        if self.__episode is not None:
+            del self.__actions[num_actions:]
+
+    def end(self, termination_reason: str | None) -> None:
+        assert self.__episode is not None, "No episode is being recorded"
+        self.__raise_writer_error()
+
+        seed, map_id, map_drawn = self.__episode
+        actions = np.frombuffer(bytes(self.__actions), dtype=np.uint8)
+        self.__queue.put(Trajectory(seed, map_id, map_drawn, actions, termination_reason))
+        self.__episode = None
+        self.episodes += 1
+
+    def flush(self) -> None:
+        """Waits until every ended episode has been written."""
+        self.__queue.join()
+        self.__raise_writer_error()
+
+    def close(self) -> None:
+        """Writes out the episode in progress and everything queued, then stops the writer."""
+        if self.__episode is not None:
+            self.end(None)
+
+        if self.__writer.is_alive():
+            self.__queue.put(None)
+            self.__writer.join()
+        self.__raise_writer_error()
+
+    def __enter__(self) -> "TrajectoryRecorder":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __raise_writer_error(self) -> None:
+        if self.__error is not None:
+            raise RuntimeError(f"Writing trajectories to {self.path} failed") from self.__error
+
+    def __write(self) -> None:
+        try:
+            directory = os.path.dirname(self.path)
+            if directory != "":
+                os.makedirs(directory, exist_ok=True)
+
+            with open(self.path, "ab") as file:
+                if file.tell() == 0:
+                    file.write(TRAJECTORY_FILE_MAGIC)
+
+                while True:
+                    trajectory = self.__queue.get()
+                    try:
+                        if trajectory is None:
+                            return
+
+                        file.write(trajectory.encode())
+                        if self.__queue.empty():
+                            file.flush()
+                    finally:
+                        self.__queue.task_done()
+        except BaseException as error:
+            self.__error = error
+            # Keep draining, so that the env never blocks on a full queue nobody reads anymore
+            while self.__queue.get() is not None:
+                self.__queue.task_done()
+            self.__queue.task_done()
@@ -0,0 +1,73 @@
+from typing import Any
+import numpy as np
+from src.environment.metro_map_env import MetroMapEnv
+from src.models import Coordinates2d, Stop
+from src.models.env_snapshot import EnvSnapshot
+from src.models.trajectory import Trajectory
+
+_DIVERGED = "The replay diverged from the recording, the env must be built like the one that recorded it"
+
+
+class TrajectoryReplayer:
+    """
+    Rebuilds the state of a recorded episode at any of its steps, by replaying its actions instead of the policy.
+
+    ``env`` must be built like the env that recorded the trajectory (same training data, ``max_steps`` and random
+    options). Playing forward snapshots the env every ``checkpoint_every`` steps, so seeking backwards only replays
+    the steps since the nearest checkpoint before the target.
+    """
+
+    def __init__(self, env: MetroMapEnv, trajectory: Trajectory, checkpoint_every: int = 500) -> None:
+        assert checkpoint_every > 0, "Checkpoints must be at least one step apart"
+
+        self.env = env
+        self.trajectory = trajectory
+        self.checkpoint_every = checkpoint_every
+
+        self.observation, self.info = env.reset(seed=trajectory.seed, options=trajectory.reset_options)
+        self.step = 0
+        self.reward = 0.0
+        self.done = False
+        # Entry i is the state after i * checkpoint_every steps
+        self.__checkpoints: list[tuple[EnvSnapshot, float]] = [(env.snapshot(), 0.0)]
+
+    @property
+    def placed_lines(self) -> dict[Coordinates2d, str]:
+        return self.env.placed_lines
+
+    @property
+    def placed_stops(self) -> dict[Coordinates2d, Stop]:
+        return self.env.placed_stops
+
+    def seek(self, step: int) -> dict[str, Any] | np.ndarray:
+        """Brings the env to its state after the first ``step`` actions and returns the observation of it."""
+        assert 0 <= step <= len(self.trajectory), f"The trajectory only has {len(self.trajectory)} steps"
+
+        checkpoint = min(step // self.checkpoint_every, len(self.__checkpoints) - 1)
+        if step < self.step or checkpoint * self.checkpoint_every > self.step:
+            # Restoring a checkpoint invalidates the ones after it, they are taken again when playing past them
+            del self.__checkpoints[checkpoint + 1 :]
+            snapshot, self.reward = self.__checkpoints[checkpoint]
+            self.observation = self.env.restore(snapshot)
+            self.step = snapshot.total_steps
+            self.done = False
+
+        actions = self.trajectory.actions
+        while self.step < step:
+            self.observation, reward, terminated, truncated, self.info = self.env.step(int(actions[self.step]))
+            self.reward += float(reward)
+            self.step += 1
+            self.done = terminated or truncated
+
+            if self.done:
+                assert self.step == len(self.trajectory), _DIVERGED
+            elif self.step == len(self.__checkpoints) * self.checkpoint_every:
+                self.__checkpoints.append((self.env.snapshot(), self.reward))
+
+        if self.step == len(self.trajectory) and self.trajectory.termination_reason is not None:
+            assert self.done and self.info["termination_reason"] == self.trajectory.termination_reason, _DIVERGED
+
+        return self.observation
+
+    def seek_end(self) -> dict[str, Any] | np.ndarray:
+        return self.seek(len(self.trajectory))
@@ -0,0 +1,144 @@
+import numpy as np
+
+CHUNK_BITS = 5
+CHUNK_SIZE = 1 << CHUNK_BITS
+CHUNK_MASK = CHUNK_SIZE - 1
+
+# (dx, dy) offsets of the 8 neighbouring fields, in the same order as ``Direction.list()``
+NEIGHBOUR_OFFSETS = np.array([(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)], dtype=np.int64)
+
+
+class BatchedOccupancyGrid:
+    """
+    Line and stop occupancy for a batch of independent episodes, queried and updated for all of them at once.
+
+    Every grid is made of ``CHUNK_SIZE`` x ``CHUNK_SIZE`` tiles from a shared pool, allocated on first write and
+    found through a per-grid page table, so memory follows the drawn area rather than the bounding box. Chunk 0 is an
+    always-empty sentinel that unwritten page table entries point at.
+    """
+
+    def __init__(self, num_grids: int, initial_pages: int = 8, initial_chunks: int = 64) -> None:
+        self.num_grids = num_grids
+        self.page_table = np.zeros((num_grids, initial_pages, initial_pages), dtype=np.int32)
+        self.origins = np.zeros((num_grids, 2), dtype=np.int64)
+        self.lines = np.zeros((initial_chunks, CHUNK_SIZE, CHUNK_SIZE), dtype=np.int16)
+        self.stops = np.zeros((initial_chunks, CHUNK_SIZE, CHUNK_SIZE), dtype=np.int16)
+        self.__num_chunks = 1
+        self.__free_chunks: list[int] = []
+
+    def clear(self, grids: np.ndarray, centers: np.ndarray) -> None:
+        """Empties ``grids`` and re-centers their page tables on ``centers`` (world (x, y) per grid)."""
+        if len(grids) == 0:
+            return
+
+        pages = self.page_table[grids]
+        used_chunks = pages[pages > 0]
+        self.lines[used_chunks] = 0
+        self.stops[used_chunks] = 0
+        self.__free_chunks.extend(used_chunks.tolist())
+        self.page_table[grids] = 0
+
+        page_height, page_width = self.page_table.shape[1:]
+        self.origins[grids, 0] = centers[:, 0] - (page_width * CHUNK_SIZE) // 2
+        self.origins[grids, 1] = centers[:, 1] - (page_height * CHUNK_SIZE) // 2
+
+    def get_lines(self, grids: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        chunks, rows, cols = self.__locate(grids, xs, ys)
+        return self.lines[chunks, rows, cols]
+
+    def get_stops(self, grids: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        chunks, rows, cols = self.__locate(grids, xs, ys)
+        return self.stops[chunks, rows, cols]
+
+    def set_lines(self, grids: np.ndarray, xs: np.ndarray, ys: np.ndarray, values: np.ndarray) -> None:
+        chunks, rows, cols = self.__locate(grids, xs, ys, allocate=True)
+        self.lines[chunks, rows, cols] = values
+
+    def set_stops(self, grids: np.ndarray, xs: np.ndarray, ys: np.ndarray, values: np.ndarray) -> None:
+        chunks, rows, cols = self.__locate(grids, xs, ys, allocate=True)
+        self.stops[chunks, rows, cols] = values
+
+    def fill_adjacent_fields(
+        self, grids: np.ndarray, positions: np.ndarray, stop_fields: np.ndarray, line_fields: np.ndarray
+    ) -> None:
+        """
+        Flags the 8 neighbours of each position in the matching rows of ``stop_fields`` and ``line_fields``.
+
+        Same semantics as ``OccupancyGrid.fill_adjacent_fields``: stops win over lines and flags are never cleared.
+        """
+        if len(grids) == 0:
+            return
+
+        xs = (positions[:, 0, None] + NEIGHBOUR_OFFSETS[None, :, 0]).ravel()
+        ys = (positions[:, 1, None] + NEIGHBOUR_OFFSETS[None, :, 1]).ravel()
+        neighbour_grids = np.repeat(grids, len(NEIGHBOUR_OFFSETS))
+
+        chunks, rows, cols = self.__locate(neighbour_grids, xs, ys)
+        stops = (self.stops[chunks, rows, cols] != 0).reshape(-1, len(NEIGHBOUR_OFFSETS))
+        lines = (self.lines[chunks, rows, cols] != 0).reshape(-1, len(NEIGHBOUR_OFFSETS))
+
+        stop_fields[grids] |= stops
+        line_fields[grids] |= lines & ~stops
+
+    def __locate(
+        self, grids: np.ndarray, xs: np.ndarray, ys: np.ndarray, allocate: bool = False
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        local_xs = xs - self.origins[grids, 0]
+        local_ys = ys - self.origins[grids, 1]
+        page_xs = local_xs >> CHUNK_BITS
+        page_ys = local_ys >> CHUNK_BITS
+
+        page_height, page_width = self.page_table.shape[1:]
+        if len(grids) > 0 and (
+            page_xs.min() < 0 or page_ys.min() < 0 or page_xs.max() >= page_width or page_ys.max() >= page_height
+        ):
+            self.__grow_page_table(page_xs, page_ys)
+            return self.__locate(grids, xs, ys, allocate)
+
+        chunks = self.page_table[grids, page_ys, page_xs]
+
+        if allocate and (chunks == 0).any():
+            missing = chunks == 0
+            pages, inverse = np.unique(
+                np.stack([grids[missing], page_ys[missing], page_xs[missing]]), axis=1, return_inverse=True
+            )
+            new_chunks = self.__allocate_chunks(pages.shape[1])
+            self.page_table[pages[0], pages[1], pages[2]] = new_chunks
+            chunks[missing] = new_chunks[inverse.ravel()]
+
+        return chunks, local_ys & CHUNK_MASK, local_xs & CHUNK_MASK
+
+    def __allocate_chunks(self, count: int) -> np.ndarray:
+        reused = self.__free_chunks[len(self.__free_chunks) - min(count, len(self.__free_chunks)) :]
+        del self.__free_chunks[len(self.__free_chunks) - len(reused) :]
+
+        num_new = count - len(reused)
+        if self.__num_chunks + num_new > len(self.lines):
+            capacity = max(len(self.lines) * 2, self.__num_chunks + num_new)
+            for layer_name in ("lines", "stops"):
+                layer = np.zeros((capacity, CHUNK_SIZE, CHUNK_SIZE), dtype=np.int16)
+                layer[: self.__num_chunks] = getattr(self, layer_name)[: self.__num_chunks]
+                setattr(self, layer_name, layer)
+
+        new_chunks = np.arange(self.__num_chunks, self.__num_chunks + num_new, dtype=np.int32)
+        self.__num_chunks += num_new
+
+        return np.concatenate([np.array(reused, dtype=np.int32), new_chunks])
+
+    def __grow_page_table(self, page_xs: np.ndarray, page_ys: np.ndarray) -> None:
+        page_height, page_width = self.page_table.shape[1:]
+
+        pad_left = max(0, -int(page_xs.min()))
+        pad_bottom = max(0, -int(page_ys.min()))
+        pad_right = max(0, int(page_xs.max()) - page_width + 1)
+        pad_top = max(0, int(page_ys.max()) - page_height + 1)
+
+        # Grow at least geometrically on every side that overflowed, so long straight runs stay amortized O(1)
+        pad_left = max(pad_left, page_width // 2) if pad_left else 0
+        pad_right = max(pad_right, page_width // 2) if pad_right else 0
+        pad_bottom = max(pad_bottom, page_height // 2) if pad_bottom else 0
+        pad_top = max(pad_top, page_height // 2) if pad_top else 0
+
+        self.page_table = np.pad(self.page_table, ((0, 0), (pad_bottom, pad_top), (pad_left, pad_right)))
+        self.origins[:, 0] -= pad_left * CHUNK_SIZE
+        self.origins[:, 1] -= pad_bottom * CHUNK_SIZE
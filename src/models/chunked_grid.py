@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class ChunkedGrid:
+    """
+    Sparse integer grid made of square NumPy chunks, each allocated the first time one of its fields is written.
+
+    Coordinates are global and never shift, and fields outside of any allocated chunk read as 0, so the grid has no
+    edges. Memory grows with the area that has been drawn on rather than with the extent of the map. Each field holds
+    one value per layer, and ``bounds`` tracks the box around every non-zero write.
+    """
+
+    def __init__(self, chunk_size: int = 64, layers: int = 1, dtype: type = np.int16) -> None:
+        assert chunk_size > 0 and chunk_size & (chunk_size - 1) == 0, "The chunk size must be a power of two"
+        assert layers > 0, "The grid needs at least one layer"
+
+        self.chunk_size = chunk_size
+        self.layers = layers
+        self.dtype = dtype
+        self.shift = chunk_size.bit_length() - 1
+        self.mask = chunk_size - 1
+
+        # Keyed by (x >> shift, y >> shift), each of shape (layers, chunk_size, chunk_size) and indexed [layer, y, x]
+        self.chunks: dict[tuple[int, int], np.ndarray] = {}
+        self.bounds: tuple[int, int, int, int] | None = None
+        """``(min_x, min_y, max_x, max_y)`` of all non-zero writes, inclusive."""
+
+    @property
+    def nbytes(self) -> int:
+        return sum(chunk.nbytes for chunk in self.chunks.values())
+
+    def get(self, x: int, y: int, layer: int = 0) -> int:
+        chunk = self.chunks.get((x >> self.shift, y >> self.shift))
+        if chunk is None:
+            return 0
+
+        return int(chunk[layer, y & self.mask, x & self.mask])
+
+    def set(self, x: int, y: int, value: int, layer: int = 0) -> None:
+        key = (x >> self.shift, y >> self.shift)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if value == 0:
+                return
+
+            chunk = self.chunks[key] = np.zeros((self.layers, self.chunk_size, self.chunk_size), dtype=self.dtype)
+
+        chunk[layer, y & self.mask, x & self.mask] = value
+
+        if value != 0:
+            self.__include(x, y)
+
+    def chunk_at(self, x: int, y: int) -> np.ndarray | None:
+        """The chunk holding ``(x, y)``, if one was allocated. Its field is at ``[:, y & mask, x & mask]``."""
+        return self.chunks.get((x >> self.shift, y >> self.shift))
+
+    def window(self, min_x: int, min_y: int, width: int, height: int) -> np.ndarray:
+        """Dense copy of the fields in the given box, of shape ``(layers, height, width)``."""
+        window = np.zeros((self.layers, height, width), dtype=self.dtype)
+        max_x, max_y = min_x + width - 1, min_y + height - 1
+
+        for chunk_y in range(min_y >> self.shift, (max_y >> self.shift) + 1):
+            for chunk_x in range(min_x >> self.shift, (max_x >> self.shift) + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    continue
+
+                start_x = max(min_x, chunk_x << self.shift)
+                end_x = min(max_x, ((chunk_x + 1) << self.shift) - 1) + 1
+                start_y = max(min_y, chunk_y << self.shift)
+                end_y = min(max_y, ((chunk_y + 1) << self.shift) - 1) + 1
+
+                window[:, start_y - min_y : end_y - min_y, start_x - min_x : end_x - min_x] = chunk[
+                    :,
+                    start_y & self.mask : ((end_y - 1) & self.mask) + 1,
+                    start_x & self.mask : ((end_x - 1) & self.mask) + 1,
+                ]
+
+        return window
+
+    def to_array(self) -> tuple[np.ndarray, int, int]:
+        """Dense copy of everything within ``bounds``, with the global ``x`` and ``y`` of its first field."""
+        if self.bounds is None:
+            return np.zeros((self.layers, 0, 0), dtype=self.dtype), 0, 0
+
+        min_x, min_y, max_x, max_y = self.bounds
+
+        return self.window(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1), min_x, min_y
+
+    def clear(self) -> None:
+        self.chunks.clear()
+        self.bounds = None
+
+    def __include(self, x: int, y: int) -> None:
+        bounds = self.bounds
+        if bounds is None:
+            self.bounds = (x, y, x, y)
+        elif not (bounds[0] <= x <= bounds[2] and bounds[1] <= y <= bounds[3]):
+            self.bounds = (min(bounds[0], x), min(bounds[1], y), max(bounds[2], x), max(bounds[3], y))
@@ -1,42 +1,60 @@
-from dataclasses import dataclass
+from operator import itemgetter
 from typing import Union
 import math
 from src.utils.math import angle_between_points
 
 
-@dataclass(frozen=True)
-class Coordinates2d:
-    x: float
-    y: float
+class Coordinates2d(tuple):
+    """
+    Immutable ``(x, y)`` pair.
+
+    Backed by a plain tuple so creating, hashing and adding coordinates stays in C; it still only compares equal to
+    other ``Coordinates2d``.
+    """
+
+    __slots__ = ()
+
+    x: float = property(itemgetter(0))  # type: ignore
+    y: float = property(itemgetter(1))  # type: ignore
+
+    def __new__(cls, x: float, y: float) -> "Coordinates2d":
+        return tuple.__new__(cls, (x, y))
+
+    def __getnewargs__(self) -> tuple[float, float]:
+        return tuple(self)  # type: ignore
 
     def to_tuple(self) -> tuple[float, float]:
-        return (self.x, self.y)
+        return (self[0], self[1])
 
     def distance_to(self, position: "Coordinates2d") -> float:
-        return math.sqrt((self.x - position.x) ** 2 + (self.y - position.y) ** 2)
+        return math.sqrt((self[0] - position[0]) ** 2 + (self[1] - position[1]) ** 2)
 
     def angle_to(self, position: "Coordinates2d") -> float:
         return angle_between_points(self, position)
 
-    def __add__(self, value: Union[tuple[float, float], "Coordinates2d"]) -> "Coordinates2d":
-        assert isinstance(value, tuple) or isinstance(value, Coordinates2d), (
+    def __add__(self, value: Union[tuple[float, float], "Coordinates2d"]) -> "Coordinates2d":  # type: ignore
+        assert isinstance(value, tuple) and len(value) == 2, (
             f"{value.__class__.__name__} cannot be added to Coordinates2d."
             + "Use a tuple with 2 ints or another Coordinates2d."
         )
 
-        if isinstance(value, tuple):
-            value = Coordinates2d(*value)
+        return tuple.__new__(Coordinates2d, (self[0] + value[0], self[1] + value[1]))
 
-        return Coordinates2d(self.x + value.x, self.y + value.y)
+    __radd__ = __add__
 
     def __eq__(self, __o: object) -> bool:
         if not isinstance(__o, Coordinates2d):
             return False
 
-        return self.x == __o.x and self.y == __o.y
+        return tuple.__eq__(self, __o)
+
+    def __ne__(self, __o: object) -> bool:
+        return not self.__eq__(__o)
+
+    __hash__ = tuple.__hash__
 
-    def __hash__(self) -> int:
-        return hash(self.x) ^ hash(self.y)
+    def __repr__(self) -> str:
+        return f"Coordinates2d(x={self[0]!r}, y={self[1]!r})"
 
     def __str__(self) -> str:
         return str(self.to_tuple())
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 from src.models import Coordinates2d, Stop, Direction
+from src.models.stop_angles import StopAngles
+from src.models.episode_schedule import EpisodeSchedule
 from typing import Any
 
 
@@ -8,10 +10,12 @@ class EnvData:
     lines: dict[str, list[Stop]]
     starting_stops: list[str]
     starting_positions: dict[str, tuple[Coordinates2d, Direction]]
-    stop_angle_mapping: dict[str, dict[str, float]]
+    stop_angle_mapping: StopAngles
     line_color_map: dict[str, tuple[int, int, int]]
     turn_limits: tuple[int, int]
     stop_spacing: int
+    schedule: EpisodeSchedule | None = None
+    name: str | None = None
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+import numpy as np
+from src.models.coordinates2d import Coordinates2d
+from src.models.grid import Direction
+
+
+@dataclass(frozen=True)
+class EnvSnapshot:
+    """
+    State of a ``MetroMapEnv`` episode at one point, as taken by ``MetroMapEnv.snapshot``.
+
+    Placed cells, stops and adjacencies are not copied: ``journal_length`` and ``marker`` locate the point in the
+    env's undo journal that ``restore`` rolls back to, so a snapshot costs the same regardless of the map size.
+    """
+
+    episode: int
+    journal_length: int
+    marker: object
+    curr_position: Coordinates2d
+    curr_direction: Direction
+    curr_line_index: int
+    lines_remaining_all: int
+    curr_stop_index: int
+    cursor: int
+    curr_stop_init_distance: float
+    curr_stop_prev_distance: float
+    steps_since_stop: int
+    consecutive_overlaps: int
+    total_steps: int
+    recent_turns: tuple[int, ...]
+    stop_in_adjacent_fields: np.ndarray
+    line_in_adjacent_fields: np.ndarray
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+import numpy as np
+from src.models.coordinates2d import Coordinates2d
+from src.models.grid import Direction
+from src.models.episode_template import EpisodeTemplate, StopTemplate
+from src.models.stop import Stop
+
+
+@dataclass(frozen=True)
+class EpisodeSchedule:
+    """
+    Array form of an ``EpisodeTemplate``: every stop of every line flattened in placement order.
+
+    The stops of line ``i`` are ``stop_ids[line_offsets[i]:line_offsets[i + 1]]``, with their target positions in the
+    matching rows of ``targets``. Directions are stored as their index in ``Direction.list()``.
+    """
+
+    line_ids: tuple[str, ...]
+    line_offsets: np.ndarray
+    stop_ids: tuple[str, ...]
+    targets: np.ndarray
+    start_positions: np.ndarray
+    start_directions: np.ndarray
+
+    @property
+    def num_lines(self) -> int:
+        return len(self.line_ids)
+
+    @property
+    def num_stops(self) -> int:
+        return len(self.stop_ids)
+
+    @staticmethod
+    def compile(
+        template: EpisodeTemplate, starting_positions: dict[str, tuple[Coordinates2d, Direction]]
+    ) -> "EpisodeSchedule":
+        return EpisodeSchedule.from_lines(template.lines, starting_positions)
+
+    @staticmethod
+    def from_lines(
+        lines: Iterable[tuple[str, Sequence[StopTemplate | Stop]]],
+        starting_positions: dict[str, tuple[Coordinates2d, Direction]],
+    ) -> "EpisodeSchedule":
+        lines = list(lines)
+        line_ids = tuple(line_id for line_id, _ in lines)
+        line_offsets = np.cumsum([0] + [len(stops) for _, stops in lines], dtype=np.int64)
+        stops = [stop for _, line_stops in lines for stop in line_stops]
+
+        targets = np.array([stop.position.to_tuple() for stop in stops], dtype=np.float64).reshape(-1, 2)
+        start_positions = np.array(
+            [starting_positions[line_id][0].to_tuple() for line_id in line_ids], dtype=np.int64
+        ).reshape(-1, 2)
+        start_directions = np.array([int(starting_positions[line_id][1]) for line_id in line_ids], dtype=np.int64)
+
+        for array in (line_offsets, targets, start_positions, start_directions):
+            array.setflags(write=False)
+
+        return EpisodeSchedule(
+            line_ids,
+            line_offsets,
+            tuple(stop.id for stop in stops),
+            targets,
+            start_positions,
+            start_directions,
+        )
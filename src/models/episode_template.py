@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from typing import NamedTuple
+from src.models.coordinates2d import Coordinates2d
+from src.models.stop import Stop
+from src.models.stop_angles import StopAngles
+
+
+class StopTemplate(NamedTuple):
+    title: str
+    id: str
+    position: Coordinates2d
+    original_position: Coordinates2d
+
+    @staticmethod
+    def from_stop(stop: Stop) -> "StopTemplate":
+        return StopTemplate(stop.title, stop.id, stop.position, stop.get_original_position())
+
+    def to_stop(self) -> Stop:
+        return Stop(self.title, self.id, self.position, self.original_position)
+
+
+@dataclass(frozen=True)
+class EpisodeTemplate:
+    """
+    Immutable, pre-normalized result of compiling an ``EnvDataDef`` against the stop and route tables.
+
+    Only the ``Stop`` objects are mutated during an episode, so ``instantiate_lines`` is all a reset has to pay for.
+    """
+
+    lines: tuple[tuple[str, tuple[StopTemplate, ...]], ...]
+    stop_angle_mapping: StopAngles
+
+    @staticmethod
+    def from_routes(routes: dict[str, list[Stop]], stop_angle_mapping: StopAngles) -> "EpisodeTemplate":
+        lines = tuple(
+            (line_id, tuple(StopTemplate.from_stop(stop) for stop in stops)) for line_id, stops in routes.items()
+        )
+
+        return EpisodeTemplate(lines, stop_angle_mapping)
+
+    def instantiate_lines(self) -> dict[str, list[Stop]]:
+        return {line_id: [stop.to_stop() for stop in stops] for line_id, stops in self.lines}
@@ -1,11 +1,11 @@
 import math
+from src.models.chunked_grid import ChunkedGrid
 from src.models.coordinates2d import Coordinates2d
 from typing import TypeVar, Generic
 from src.exceptions import OutOfBoundsException
 from src.models.stop import Stop
 from enum import Enum
 import numpy as np
-import cv2  # type: ignore
 import hashlib
 
 T = TypeVar("T")
@@ -16,97 +16,101 @@ class Grid(Generic[T]):
     2D array container that provides (x,y) access instead of always having to access it by (y,x)
 
     Each field is made of a list, and assignemnt automatically appends to the list, instead of overwriting
+
+    The first value of every field is also kept as a small integer in a ``ChunkedGrid``, indexing a table where each
+    distinct line id or stop is hashed once, so observations and renders are lookups over the whole array. The grid
+    covers ``width`` x ``height`` fields starting at ``(min_x, min_y)``; ``expand_grid`` grows it without moving any
+    field, and with ``auto_expand`` writes outside of it expand it instead of raising ``OutOfBoundsException``.
     """
 
-    def __init__(self, width: int, height: int) -> None:
+    def __init__(self, width: int, height: int, auto_expand: bool = False, chunk_size: int = 64) -> None:
         self.width = width
         self.height = height
-        self.grid: list[list[list[T]]] = [[[] for _ in range(width)] for _ in range(height)]
-
-    def to_observation(self) -> list[int]:
-        observation_list = []
-
-        for row in self.grid:
-            for x in row:
-                if len(x) <= 0:
-                    observation_list.append(0)
-                    continue
-
-                string_to_hash = x[0]
-                if isinstance(x[0], Stop):
-                    string_to_hash = x[0].id  # type: ignore
-
-                hashed_string = int(hashlib.sha1(string_to_hash.encode("utf-8")).hexdigest(), 16) % (  # type:ignore
-                    10**8
-                )
-                observation_list.append(hashed_string)
-
-        return observation_list
+        self.min_x = 0
+        self.min_y = 0
+        self.auto_expand = auto_expand
+        self.__id_grid = ChunkedGrid(chunk_size, dtype=np.int32)
+
+        self.__fields: dict[tuple[int, int], list[T]] = {}
+        self.__value_ids: dict[tuple[bool, object], int] = {}
+        # Entry 0 of the id table is the empty field
+        self.__values: list[T | None] = [None]
+        self.__hashes = np.zeros((16,), dtype=np.int64)
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Id of the first value of every field (0 when empty), as a ``(height, width)`` array."""
+        return self.__id_grid.window(self.min_x, self.min_y, self.width, self.height)[0]
+
+    def to_observation(self) -> np.ndarray:
+        """Hash of the first value of every field (0 when empty), row by row."""
+        return self.__hashes[self.ids].ravel()
 
     def is_empty(self, position: tuple[int, int] | Coordinates2d) -> bool:
         if isinstance(position, tuple):
             position = Coordinates2d(*position)
 
         if not self.is_in_bounds(position):
+            if self.auto_expand:
+                return True
+
             raise OutOfBoundsException(position)
 
-        return len(self[position]) == 0
+        return self.__id_grid.get(*self.__cell(position)) == 0
 
     def is_in_bounds(self, position: tuple[int, int] | Coordinates2d) -> bool:
         if isinstance(position, tuple):
             position = Coordinates2d(*position)
 
-        return 0 <= position.x < self.width and 0 <= position.y < self.height
+        return (
+            self.min_x <= position.x < self.min_x + self.width and self.min_y <= position.y < self.min_y + self.height
+        )
 
     def expand_grid(self, direction: "Direction") -> None:
-        pass
+        """
+        Doubles the grid towards ``direction`` (both ways for combined directions). Fields keep their coordinates, so
+        growing north or west extends the grid into lower coordinates. Nothing is copied, chunks are only allocated
+        once written to.
+        """
+        if direction in (Direction.E, Direction.NE, Direction.SE):
+            self.width += max(self.width, 1)
+        elif direction in (Direction.W, Direction.NW, Direction.SW):
+            self.min_x -= max(self.width, 1)
+            self.width += max(self.width, 1)
+
+        if direction in (Direction.S, Direction.SE, Direction.SW):
+            self.height += max(self.height, 1)
+        elif direction in (Direction.N, Direction.NE, Direction.NW):
+            self.min_y -= max(self.height, 1)
+            self.height += max(self.height, 1)
 
     def render(self, color_map: dict[str, tuple[int, int, int]]) -> np.ndarray:
-
-        # cv2.imshow("a", self.img)
-        # cv2.waitKey(1)
-        img = np.zeros((self.height * 2, self.width * 2, 3), dtype="uint8")
-
-        for y, row in enumerate(self.grid):
-            for x, field in enumerate(row):
-                if len(field) == 0:
-                    continue
-
-                if isinstance(field[0], Stop):
-                    cv2.rectangle(
-                        img,
-                        (x * 2, y * 2),
-                        (x * 2 + 1, y * 2 + 1),
-                        (255, 255, 255),
-                        thickness=cv2.FILLED,
-                    )
-                elif isinstance(field[0], str):
-                    try:
-                        cv2.rectangle(
-                            img,
-                            (x * 2, y * 2),
-                            (x * 2 + 1, y * 2 + 1),
-                            color_map[field[0]],
-                            thickness=cv2.FILLED,
-                        )
-                    except KeyError:
-                        print(f"Field with value {field} has skipped rendering. No color value found.")
+        palette = np.zeros((len(self.__values), 3), dtype="uint8")
+        for value_id, value in enumerate(self.__values[1:], start=1):
+            if isinstance(value, Stop):
+                palette[value_id] = (255, 255, 255)
+            elif isinstance(value, str):
+                if value in color_map:
+                    palette[value_id] = color_map[value]
                 else:
-                    print(f"Non renderable grid item found: {field} at {(x, y)}. Implementation missing.")
+                    print(f"Fields with value {value} have skipped rendering. No color value found.")
+            else:
+                print(f"Non renderable grid item found: {value}. Implementation missing.")
 
-        return img
+        # Every field is drawn as a 2x2 block
+        return palette[self.ids].repeat(2, axis=0).repeat(2, axis=1)
 
     def __direction_of_outside_bounds(self, position: Coordinates2d) -> "Direction":
         out_of_bounds_directions: list[Direction] = []
 
-        if position.x >= self.width:
+        if position.x >= self.min_x + self.width:
             out_of_bounds_directions.append(Direction.E)
-        elif position.x < 0:
+        elif position.x < self.min_x:
             out_of_bounds_directions.append(Direction.W)
 
-        if position.y >= self.height:
+        if position.y >= self.min_y + self.height:
             out_of_bounds_directions.append(Direction.S)
-        elif position.y < 0:
+        elif position.y < self.min_y:
             out_of_bounds_directions.append(Direction.N)
 
         if len(out_of_bounds_directions) > 1:
@@ -115,26 +119,20 @@ class Grid(Generic[T]):
         return out_of_bounds_directions[0]
 
     def __getitem__(self, key: tuple[int, int] | Coordinates2d) -> list[T]:
-        assert (isinstance(key, tuple) and len(key) == 2) or isinstance(
-            key, Coordinates2d
-        ), "You must use 2 dimensional access with the grid, nothing else"
+        """The values of the field at ``key``. Empty fields return a new list, so appending to it has no effect."""
+        return self.__fields.get(self.__checked_cell(key, expand=False), [])
 
-        if isinstance(key, tuple):
-            key = Coordinates2d(*key)
+    def __setitem__(self, key: tuple[int, int] | Coordinates2d, value: T):
+        cell = self.__checked_cell(key, expand=True)
 
-        if not self.is_in_bounds(key):
-            raise OutOfBoundsException(key)
+        field = self.__fields.get(cell)
+        if field is None:
+            field = self.__fields[cell] = []
+            self.__id_grid.set(*cell, self.__value_id(value))
 
-        try:
-            return self.grid[math.floor(key.y)][math.floor(key.x)]
-        except IndexError:
-            print("Index error occurred in grid, with following data:")
-            print(f"Position: {key}")
-            print(f"Out of bounds reported: {self.is_in_bounds(key)}")
-            print(f"Size is: {self.width}x{self.height}")
-            raise OutOfBoundsException(key)
+        field.append(value)
 
-    def __setitem__(self, key: tuple[int, int] | Coordinates2d, value: T):
+    def __checked_cell(self, key: tuple[int, int] | Coordinates2d, expand: bool) -> tuple[int, int]:
         assert (isinstance(key, tuple) and len(key) == 2) or isinstance(
             key, Coordinates2d
         ), "You must use 2 dimensional access with the grid, nothing else"
@@ -143,22 +141,38 @@ class Grid(Generic[T]):
             key = Coordinates2d(*key)
 
         if not self.is_in_bounds(key):
-            raise OutOfBoundsException(key)
+            if not self.auto_expand:
+                raise OutOfBoundsException(key)
+
+            while expand and not self.is_in_bounds(key):
+                self.expand_grid(self.__direction_of_outside_bounds(key))
+
+        return self.__cell(key)
+
+    def __cell(self, position: Coordinates2d) -> tuple[int, int]:
+        return math.floor(position.x), math.floor(position.y)
+
+    def __value_id(self, value: T) -> int:
+        is_stop = isinstance(value, Stop)
+        key = (is_stop, value.id if is_stop else value)  # type: ignore
 
-        try:
-            self.grid[math.floor(key.y)][math.floor(key.x)].append(value)
-        except IndexError:
-            print("Index error occurred in grid, with following data:")
-            print(f"Position: {key}")
-            print(f"Out of bounds reported: {self.is_in_bounds(key)}")
-            print(f"Size is: {self.width}x{self.height}")
-            raise OutOfBoundsException(key)
+        value_id = self.__value_ids.get(key)
+        if value_id is None:
+            value_id = self.__value_ids[key] = len(self.__values)
+            self.__values.append(value)
+
+            if value_id >= len(self.__hashes):
+                self.__hashes = np.concatenate([self.__hashes, np.zeros_like(self.__hashes)])
+            if isinstance(key[1], str):
+                self.__hashes[value_id] = int(hashlib.sha1(key[1].encode("utf-8")).hexdigest(), 16) % (10**8)
+
+        return value_id
 
     def __str__(self) -> str:
         return_str = ""
 
-        for row in self.grid:
-            return_str += f"{row}\n"
+        for y in range(self.min_y, self.min_y + self.height):
+            return_str += f"{[self.__fields.get((x, y), []) for x in range(self.min_x, self.min_x + self.width)]}\n"
 
         return return_str
 
@@ -173,9 +187,12 @@ class Direction(Enum):
     W = (-1, 0)
     NW = (-1, 1)
 
+    # Position in ``Direction.list()``, assigned below the class
+    _index: int
+
     @classmethod
     def list(cls) -> list["Direction"]:
-        return list(cls)
+        return list(_DIRECTIONS)
 
     @classmethod
     def from_str_val(cls, str_val: str) -> "Direction":
@@ -201,7 +218,7 @@ class Direction(Enum):
 
     @staticmethod
     def direction_is_not_combined(direction: "Direction") -> bool:
-        return Direction.list().index(direction) % 2 == 0
+        return direction._index % 2 == 0
 
     @staticmethod
     def from_degree(degrees: float) -> "Direction":
@@ -224,7 +241,7 @@ class Direction(Enum):
         raise ValueError(f"The degree value passed in ({degrees}) could not be parsed into a direction.")
 
     def __int__(self):
-        return self.list().index(self)
+        return self._index
 
     def get_45_right(self) -> "Direction":
         return self.__get_angle_by_index(1)
@@ -239,11 +256,7 @@ class Direction(Enum):
         return self.__get_angle_by_index(-2)
 
     def get_difference(self, direction: "Direction") -> int:
-        directions = Direction.list()
-        i = directions.index(self)
-        j = directions.index(direction)
-
-        return abs(i - j) * 45
+        return abs(self._index - direction._index) * 45
 
     def combine(self, direction: "Direction") -> "Direction":
         assert Direction.direction_is_not_combined(direction), "Cannot combine already combined direction."
@@ -266,6 +279,14 @@ class Direction(Enum):
         ) or ((self == Direction.E or self == Direction.W) and (direction == Direction.N or direction == Direction.S))
 
     def __get_angle_by_index(self, index_offset: int) -> "Direction":
-        directions = Direction.list()
-        i = directions.index(self)
-        return directions[(i + index_offset) % len(directions)]
+        return _ROTATIONS[self._index][index_offset]
+
+
+_DIRECTIONS: tuple[Direction, ...] = tuple(Direction)
+for i, direction in enumerate(_DIRECTIONS):
+    direction._index = i
+# _ROTATIONS[i][k] is the direction k steps of 45 degrees clockwise from _DIRECTIONS[i] (k may be negative).
+_ROTATIONS: tuple[tuple[Direction, ...], ...] = tuple(
+    tuple(_DIRECTIONS[(i + offset) % len(_DIRECTIONS)] for offset in range(len(_DIRECTIONS)))
+    for i in range(len(_DIRECTIONS))
+)
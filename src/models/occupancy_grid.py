@@ -0,0 +1,93 @@
+import numpy as np
+from src.models.chunked_grid import ChunkedGrid
+from src.models.coordinates2d import Coordinates2d
+
+# Row/column offsets into a 3x3 block centered on a field, in the same order as ``Direction.list()``
+_NEIGHBOUR_ROWS = np.array([2, 2, 1, 0, 0, 0, 1, 2])
+_NEIGHBOUR_COLS = np.array([1, 2, 2, 2, 1, 0, 0, 0])
+
+
+LINES = 0
+STOPS = 1
+
+
+class OccupancyGrid:
+    """
+    Occupancy map of placed lines and stops, addressed by world coordinates.
+
+    Both layers live in one ``ChunkedGrid`` where 0 means empty and any other value is the (1-based) ID of the line or
+    stop occupying the field. Chunks are allocated as the map is drawn, so positions are free to drift anywhere and
+    memory only grows with the drawn area.
+    """
+
+    def __init__(self, chunk_size: int = 64) -> None:
+        self.grid = ChunkedGrid(chunk_size, layers=2)
+        self.__chunks = self.grid.chunks
+        self.__shift = self.grid.shift
+        self.__mask = self.grid.mask
+
+    def line_at(self, position: Coordinates2d) -> int:
+        x, y = int(position.x), int(position.y)
+        chunk = self.__chunks.get((x >> self.__shift, y >> self.__shift))
+        if chunk is None:
+            return 0
+
+        return int(chunk[LINES, y & self.__mask, x & self.__mask])
+
+    def stop_at(self, position: Coordinates2d) -> int:
+        x, y = int(position.x), int(position.y)
+        chunk = self.__chunks.get((x >> self.__shift, y >> self.__shift))
+        if chunk is None:
+            return 0
+
+        return int(chunk[STOPS, y & self.__mask, x & self.__mask])
+
+    def line_overlap(self, position: Coordinates2d) -> bool:
+        return self.line_at(position) != 0
+
+    def stop_overlap(self, position: Coordinates2d) -> bool:
+        return self.stop_at(position) != 0
+
+    def any_overlap(self, position: Coordinates2d) -> bool:
+        x, y = int(position.x), int(position.y)
+        chunk = self.__chunks.get((x >> self.__shift, y >> self.__shift))
+        if chunk is None:
+            return False
+
+        row, col = y & self.__mask, x & self.__mask
+        return bool(chunk[LINES, row, col] or chunk[STOPS, row, col])
+
+    def set_line(self, position: Coordinates2d, line_id: int) -> None:
+        self.grid.set(int(position.x), int(position.y), line_id, LINES)
+
+    def set_stop(self, position: Coordinates2d, stop_id: int) -> None:
+        self.grid.set(int(position.x), int(position.y), stop_id, STOPS)
+
+    def to_arrays(self) -> tuple[np.ndarray, np.ndarray, int, int]:
+        """Dense copies of the line and stop layers around everything placed, with the world ``x``/``y`` of ``[0, 0]``."""
+        layers, min_x, min_y = self.grid.to_array()
+        return layers[LINES], layers[STOPS], min_x, min_y
+
+    def fill_adjacent_fields(self, position: Coordinates2d, stop_fields: np.ndarray, line_fields: np.ndarray) -> None:
+        """
+        Flags the 8 neighbours of ``position`` in ``stop_fields`` and ``line_fields`` (ordered as ``Direction.list()``).
+
+        Fields holding a stop are only flagged as a stop. Flags are only ever set, never cleared.
+        """
+        x, y = int(position.x), int(position.y)
+        row, col = y & self.__mask, x & self.__mask
+
+        if 0 < row < self.__mask and 0 < col < self.__mask:
+            # The whole neighbourhood is inside this field's chunk
+            chunk = self.__chunks.get((x >> self.__shift, y >> self.__shift))
+            if chunk is None:
+                return
+            block = chunk[:, row - 1 : row + 2, col - 1 : col + 2]
+        else:
+            block = self.grid.window(x - 1, y - 1, 3, 3)
+
+        stops = block[STOPS][_NEIGHBOUR_ROWS, _NEIGHBOUR_COLS] != 0
+        lines = block[LINES][_NEIGHBOUR_ROWS, _NEIGHBOUR_COLS] != 0
+
+        stop_fields[stops] = 1
+        line_fields[lines & ~stops] = 1
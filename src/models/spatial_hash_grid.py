@@ -0,0 +1,110 @@
+from typing import Generic, TypeVar
+import heapq
+import math
+from src.models.coordinates2d import Coordinates2d
+
+T = TypeVar("T")
+
+
+class SpatialHashGrid(Generic[T]):
+    """
+    Uniform hash grid of items at 2D positions, for nearest and k-nearest queries.
+
+    Items are bucketed into square cells of ``cell_size``, and queries only visit the cells around the queried
+    position, ring by ring, until no unvisited cell could hold anything closer. Empty cells cost nothing, so the
+    positions may be spread over any area.
+    """
+
+    def __init__(self, cell_size: float = 25) -> None:
+        assert cell_size > 0, "The cell size must be positive"
+
+        self.cell_size = cell_size
+        self.__cells: dict[tuple[int, int], list[tuple[float, float, T]]] = {}
+        self.__size = 0
+        self.__cell_bounds: tuple[int, int, int, int] | None = None
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def insert(self, position: Coordinates2d, item: T) -> None:
+        cell = self.__cell(position.x, position.y)
+        self.__cells.setdefault(cell, []).append((position.x, position.y, item))
+        self.__size += 1
+
+        bounds = self.__cell_bounds
+        if bounds is None:
+            self.__cell_bounds = (cell[0], cell[1], cell[0], cell[1])
+        else:
+            self.__cell_bounds = (
+                min(bounds[0], cell[0]),
+                min(bounds[1], cell[1]),
+                max(bounds[2], cell[0]),
+                max(bounds[3], cell[1]),
+            )
+
+    def remove(self, position: Coordinates2d, item: T) -> None:
+        cell = self.__cell(position.x, position.y)
+        entries = self.__cells[cell]
+        entries.remove((position.x, position.y, item))
+        if len(entries) == 0:
+            del self.__cells[cell]
+        self.__size -= 1
+
+    def nearest(self, position: Coordinates2d, k: int = 1) -> list[tuple[float, T]]:
+        """The (up to) ``k`` nearest items to ``position`` as ``(distance, item)``, closest first."""
+        if self.__cell_bounds is None or k <= 0:
+            return []
+
+        x, y = position.x, position.y
+        center_x, center_y = self.__cell(x, y)
+        min_cell_x, min_cell_y, max_cell_x, max_cell_y = self.__cell_bounds
+        max_ring = max(center_x - min_cell_x, max_cell_x - center_x, center_y - min_cell_y, max_cell_y - center_y, 0)
+
+        # Max-heap (by negated distance) of the best k so far; the counter keeps items themselves from being compared
+        best: list[tuple[float, int, T]] = []
+        counter = 0
+        visited = 0
+        for ring in range(max_ring + 1):
+            cells = self.__ring(center_x, center_y, ring)
+            last_ring = visited + len(cells) > len(self.__cells)
+            if last_ring:
+                # Walking on through mostly empty rings would cost more than looking at every occupied cell left
+                cells = [cell for cell in self.__cells if max(abs(cell[0] - center_x), abs(cell[1] - center_y)) >= ring]
+            visited += len(cells)
+
+            for cell in cells:
+                for item_x, item_y, item in self.__cells.get(cell, ()):
+                    distance = math.hypot(item_x - x, item_y - y)
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, counter, item))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, counter, item))
+                    counter += 1
+
+            # Anything in the next ring is at least ``ring * cell_size`` away
+            if last_ring or (len(best) == k and -best[0][0] <= ring * self.cell_size):
+                break
+
+        return [(-negated_distance, item) for negated_distance, _, item in sorted(best, reverse=True)]
+
+    def clear(self) -> None:
+        self.__cells.clear()
+        self.__size = 0
+        self.__cell_bounds = None
+
+    def __cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def __ring(self, center_x: int, center_y: int, ring: int) -> list[tuple[int, int]]:
+        if ring == 0:
+            return [(center_x, center_y)]
+
+        cells = []
+        for offset in range(-ring, ring + 1):
+            cells.append((center_x + offset, center_y - ring))
+            cells.append((center_x + offset, center_y + ring))
+        for offset in range(-ring + 1, ring):
+            cells.append((center_x - ring, center_y + offset))
+            cells.append((center_x + ring, center_y + offset))
+
+        return cells
@@ -2,11 +2,15 @@ from src.models.coordinates2d import Coordinates2d
 
 
 class Stop:
-    def __init__(self, title: str, id: str, position: Coordinates2d) -> None:
+    __slots__ = ("title", "id", "position", "__original_position")
+
+    def __init__(
+        self, title: str, id: str, position: Coordinates2d, original_position: Coordinates2d | None = None
+    ) -> None:
         self.title = title
         self.id = id
         self.position = position
-        self.__original_position = position
+        self.__original_position = position if original_position is None else original_position
 
     def get_original_position(self) -> Coordinates2d:
         return self.__original_position
@@ -3,8 +3,16 @@ import math
 
 
 class StopAdjacency:
+    """
+    Positions next to which each stop's later placements should go, so that interchange stops line up.
+
+    Every stop maps its adjacent positions to how often they were added, and a reverse index maps each position to
+    the stops it is adjacent to, so membership, removal and checks against other stops are all dict lookups.
+    """
+
     def __init__(self) -> None:
-        self.__adjacency_map: dict[str, list[Coordinates2d]] = {}
+        self.__adjacency_map: dict[str, dict[Coordinates2d, int]] = {}
+        self.__stops_at: dict[Coordinates2d, dict[str, int]] = {}
 
     def is_adjacent(self, stop_id: str, position: Coordinates2d) -> bool:
         assert stop_id in self.__adjacency_map.keys(), "Check is_first before calling is_adjacent"
@@ -15,14 +23,11 @@ class StopAdjacency:
         return stop_id not in self.__adjacency_map.keys()
 
     def adjacent_to_other(self, stop_id: str, position: Coordinates2d) -> bool:
-        for id, adjacencies in self.__adjacency_map.items():
-            if id == stop_id:
-                continue
+        stops = self.__stops_at.get(position)
+        if stops is None:
+            return False
 
-            if position in adjacencies:
-                return True
-
-        return False
+        return len(stops) > 1 or stop_id not in stops
 
     def get_nearest_adjacent(self, stop_id: str, position: Coordinates2d) -> Coordinates2d | None:
         assert stop_id in self.__adjacency_map.keys(), "Check is_first before calling is_adjacent"
@@ -37,17 +42,41 @@ class StopAdjacency:
 
         return best_adjacency
 
-    def remove_adjacency_position(self, stop_id: str, position: Coordinates2d) -> None:
+    def remove_adjacency_position(self, stop_id: str, position: Coordinates2d) -> bool:
+        """Removes ``position`` once from the adjacencies of ``stop_id``, returning whether it had any to remove."""
         if stop_id not in self.__adjacency_map.keys():
-            return
+            return False
 
-        self.__adjacency_map[stop_id].remove(position)
+        self.__decrement(self.__adjacency_map[stop_id], position)
+        self.__decrement(self.__stops_at[position], stop_id)
+        if len(self.__stops_at[position]) == 0:
+            del self.__stops_at[position]
 
-    def add_adjacency_position(self, stop_id: str, position: Coordinates2d) -> None:
-        if stop_id not in self.__adjacency_map.keys():
-            self.__adjacency_map[stop_id] = []
+        return True
+
+    def add_adjacency_position(self, stop_id: str, position: Coordinates2d) -> bool:
+        """Adds ``position`` to the adjacencies of ``stop_id``, returning whether this was its first one."""
+        is_first = stop_id not in self.__adjacency_map.keys()
+        adjacencies = self.__adjacency_map.setdefault(stop_id, {})
+        adjacencies[position] = adjacencies.get(position, 0) + 1
+
+        stops = self.__stops_at.setdefault(position, {})
+        stops[stop_id] = stops.get(stop_id, 0) + 1
+
+        return is_first
+
+    def undo_add_adjacency_position(self, stop_id: str, position: Coordinates2d, was_first: bool) -> None:
+        """Undoes ``add_adjacency_position``, given what it returned."""
+        self.remove_adjacency_position(stop_id, position)
+        if was_first:
+            del self.__adjacency_map[stop_id]
 
-        self.__adjacency_map[stop_id].append(position)
+    def __decrement(self, counts: dict, key: object) -> None:
+        count = counts[key]
+        if count > 1:
+            counts[key] = count - 1
+        else:
+            del counts[key]
 
     def __getitem__(self, key: str) -> list[Coordinates2d]:
-        return self.__adjacency_map[key]
+        return [position for position, count in self.__adjacency_map[key].items() for _ in range(count)]
@@ -0,0 +1,85 @@
+from collections.abc import Iterator, Mapping
+import math
+import numpy as np
+from src.models.stop import Stop
+
+
+class StopAngles(Mapping[str, Mapping[str, float]]):
+    """
+    Relative angle (in degrees, counter-clockwise from east with y pointing down) from every stop to every other stop.
+
+    Reads like the old ``dict[str, dict[str, float]]``: ``angles[from_id][to_id]``. Single pairs are computed on demand
+    with ``angle``; the full ``matrix`` is vectorized and only built the first time it is asked for.
+    """
+
+    def __init__(self, stop_ids: tuple[str, ...], positions: np.ndarray) -> None:
+        assert positions.shape == (len(stop_ids), 2), "Expected one (x, y) position per stop id"
+
+        self.stop_ids = stop_ids
+        self.positions = positions
+        self.indices = {stop_id: index for index, stop_id in enumerate(stop_ids)}
+        self.__matrix: np.ndarray | None = None
+
+    @staticmethod
+    def from_routes(routes: dict[str, list[Stop]]) -> "StopAngles":
+        positions: dict[str, tuple[float, float]] = {}
+        for stops in routes.values():
+            for stop in stops:
+                positions[stop.id] = stop.position.to_tuple()
+
+        return StopAngles(tuple(positions.keys()), np.array(list(positions.values()), dtype=np.float64).reshape(-1, 2))
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self.__matrix is None:
+            deltas = self.positions[np.newaxis, :, :] - self.positions[:, np.newaxis, :]
+            self.__matrix = np.degrees(np.arctan2(-deltas[:, :, 1], deltas[:, :, 0])) % 360
+
+        return self.__matrix
+
+    def angle(self, from_id: str, to_id: str) -> float:
+        from_index = self.indices[from_id]
+        to_index = self.indices[to_id]
+
+        if self.__matrix is not None:
+            return float(self.__matrix[from_index, to_index])
+
+        from_x, from_y = self.positions[from_index]
+        to_x, to_y = self.positions[to_index]
+
+        return math.degrees(math.atan2(-(to_y - from_y), to_x - from_x)) % 360
+
+    def __getitem__(self, from_id: str) -> Mapping[str, float]:
+        if from_id not in self.indices:
+            raise KeyError(from_id)
+
+        return _StopAnglesRow(self, from_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.stop_ids)
+
+    def __len__(self) -> int:
+        return len(self.stop_ids)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_StopAngles__matrix"] = None
+        return state
+
+
+class _StopAnglesRow(Mapping[str, float]):
+    def __init__(self, angles: StopAngles, from_id: str) -> None:
+        self.angles = angles
+        self.from_id = from_id
+
+    def __getitem__(self, to_id: str) -> float:
+        if to_id == self.from_id or to_id not in self.angles.indices:
+            raise KeyError(to_id)
+
+        return self.angles.angle(self.from_id, to_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return (stop_id for stop_id in self.angles.stop_ids if stop_id != self.from_id)
+
+    def __len__(self) -> int:
+        return len(self.angles.stop_ids) - 1
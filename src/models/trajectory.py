@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator
+import struct
+import zlib
+import numpy as np
+
+TRAJECTORY_FILE_MAGIC = b"MMTRAJ1\n"
+
+# seed, map_drawn, map id length, termination reason length, number of actions, packed actions length
+_RECORD_HEADER = struct.Struct("<Q?HBII")
+
+
+@dataclass(frozen=True)
+class Trajectory:
+    """
+    One recorded episode of a ``MetroMapEnv``: enough to replay it on an env built with the same options.
+
+    ``map_drawn`` tells whether ``reset`` drew the map (and its turn limits and stop spacing) from the seed, or was
+    given ``map_id`` through the ``env_data_def`` option, since the two consume the seed differently.
+    """
+
+    seed: int
+    map_id: str
+    map_drawn: bool
+    actions: np.ndarray
+    termination_reason: str | None = None
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    @property
+    def reset_options(self) -> dict[str, str] | None:
+        return None if self.map_drawn else {"env_data_def": self.map_id}
+
+    def encode(self) -> bytes:
+        map_id = self.map_id.encode("utf-8")
+        reason = (self.termination_reason or "").encode("utf-8")
+        packed = pack_actions(self.actions)
+
+        return (
+            _RECORD_HEADER.pack(self.seed, self.map_drawn, len(map_id), len(reason), len(self.actions), len(packed))
+            + map_id
+            + reason
+            + packed
+        )
+
+    @staticmethod
+    def read(file: BinaryIO) -> "Trajectory | None":
+        """Reads the next record of ``file``, or None at its end (including a record cut short by a crash)."""
+        header = file.read(_RECORD_HEADER.size)
+        if len(header) < _RECORD_HEADER.size:
+            return None
+
+        seed, map_drawn, map_id_length, reason_length, num_actions, packed_length = _RECORD_HEADER.unpack(header)
+        body = file.read(map_id_length + reason_length + packed_length)
+        if len(body) < map_id_length + reason_length + packed_length:
+            return None
+
+        map_id = body[:map_id_length].decode("utf-8")
+        reason = body[map_id_length : map_id_length + reason_length].decode("utf-8")
+
+        return Trajectory(
+            seed,
+            map_id,
+            map_drawn,
+            unpack_actions(body[map_id_length + reason_length :], num_actions),
+            reason if reason != "" else None,
+        )
+
+
+def pack_actions(actions: np.ndarray) -> bytes:
+    """Packs actions two per byte (one per nibble) and compresses them, as long runs of moving forward are common."""
+    actions = np.asarray(actions, dtype=np.uint8)
+    assert len(actions) == 0 or actions.max() < 16, "Only actions below 16 fit into a nibble"
+
+    if len(actions) % 2 == 1:
+        actions = np.append(actions, np.uint8(0))
+
+    return zlib.compress(((actions[0::2] << 4) | actions[1::2]).tobytes())
+
+
+def unpack_actions(packed: bytes, num_actions: int) -> np.ndarray:
+    nibbles = np.frombuffer(zlib.decompress(packed), dtype=np.uint8)
+    actions = np.empty((len(nibbles) * 2,), dtype=np.uint8)
+    actions[0::2] = nibbles >> 4
+    actions[1::2] = nibbles & 0x0F
+
+    return actions[:num_actions]
+
+
+def read_trajectories(path: str) -> Iterator[Trajectory]:
+    """Every trajectory recorded to ``path``, in the order they were written."""
+    with open(path, "rb") as file:
+        assert file.read(len(TRAJECTORY_FILE_MAGIC)) == TRAJECTORY_FILE_MAGIC, f"{path} is not a trajectory file"
+
+        while (trajectory := Trajectory.read(file)) is not None:
+            yield trajectory
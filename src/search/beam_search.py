@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from typing import Any
+import time
+import numpy as np
+import torch as th
+from sb3_contrib import QRDQN
+from src.environment.metro_map_env import MetroMapEnv
+from src.models.env_snapshot import EnvSnapshot
+
+
+@dataclass(eq=False)
+class _BeamNode:
+    parent: "_BeamNode | None"
+    action: int
+    depth: int
+    reward: float
+    observation: Any
+
+
+@dataclass
+class BeamSearchResult:
+    actions: list[int]
+    reward: float
+    finished: bool
+    """Whether every stop was placed; if no layout finished, this is the highest-return state that stayed alive."""
+    expanded: int
+    elapsed: float
+
+
+class PolicyBeamSearch:
+    """
+    Searches the layouts of one map with a beam of env states, expanding the ``top_k`` actions by QRDQN value.
+
+    Every step the observations of all beam members go through the quantile network in one batch, and the children
+    are pruned to the ``beam_width`` with the highest return under the env's ``score_funcs`` rewards. Children that
+    overlap or run out of steps are dropped, finished ones are kept as candidates. The search stops once the beam is
+    empty or ``time_budget`` seconds have passed, and returns the best finished layout, or the highest-return state
+    that was ever alive in the beam if none finished.
+
+    All states live in the one env: it walks between beam members by restoring the snapshot where their paths split
+    and replaying the actions after it, so beam members are visited in action order to keep those replays short.
+    The env should be created without a render mode, since restoring repaints a rendered map from scratch.
+    """
+
+    def __init__(
+        self, model: QRDQN, env: MetroMapEnv, beam_width: int = 8, top_k: int = 2, time_budget: float = 60.0
+    ) -> None:
+        assert beam_width > 0, "The beam must hold at least one state"
+        assert 0 < top_k <= int(env.action_space.n), "top_k must be between 1 and the number of actions"
+
+        self.model = model
+        self.env = env
+        self.beam_width = beam_width
+        self.top_k = top_k
+        self.time_budget = time_budget
+
+        self.__path: list[_BeamNode] = []
+        self.__path_snapshots: list[EnvSnapshot] = []
+
+    def search(self, map_id: str, seed: int | None = None) -> BeamSearchResult:
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+
+        observation, _ = self.env.reset(seed=seed, options={"env_data_def": map_id})
+        root = _BeamNode(None, -1, 0, 0.0, _copy_observation(observation))
+        self.__path = [root]
+        self.__path_snapshots = [self.env.snapshot()]
+
+        beam = [root]
+        best_finished: _BeamNode | None = None
+        best_unfinished: _BeamNode | None = None
+        expanded = 0
+
+        while len(beam) > 0 and time.perf_counter() < deadline:
+            top_actions = self.__top_actions(beam)
+
+            children: list[tuple[int, _BeamNode]] = []
+            for rank, (node, actions) in enumerate(zip(beam, top_actions)):
+                if time.perf_counter() >= deadline:
+                    break
+
+                self.__goto(node)
+                for action in actions:
+                    observation, reward, terminated, truncated, _ = self.env.step(action)
+                    child = _BeamNode(
+                        node, action, node.depth + 1, node.reward + float(reward), _copy_observation(observation)
+                    )
+                    expanded += 1
+
+                    if terminated and self.env.finished:
+                        if best_finished is None or child.reward > best_finished.reward:
+                            best_finished = child
+                    elif not terminated and not truncated:
+                        children.append((rank, child))
+                        if best_unfinished is None or child.reward > best_unfinished.reward:
+                            best_unfinished = child
+
+                    self.env.restore(self.__path_snapshots[-1])
+
+            children.sort(key=lambda ranked_child: ranked_child[1].reward, reverse=True)
+            survivors = children[: self.beam_width]
+            # Keep the beam in action order, so neighbouring members share as much of their path as possible
+            survivors.sort(key=lambda ranked_child: (ranked_child[0], ranked_child[1].action))
+            beam = [child for _, child in survivors]
+
+        best = best_finished or best_unfinished or root
+
+        return BeamSearchResult(
+            self.__actions(best), best.reward, best is best_finished, expanded, time.perf_counter() - start
+        )
+
+    def __top_actions(self, beam: list[_BeamNode]) -> list[list[int]]:
+        observations = [node.observation for node in beam]
+        if isinstance(observations[0], dict):
+            batch: Any = {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+        else:
+            batch = np.stack(observations)
+
+        policy = self.model.policy
+        obs_tensor, _ = policy.obs_to_tensor(batch)
+        with th.no_grad():
+            q_values = policy.quantile_net(obs_tensor).mean(dim=1)
+
+        return th.topk(q_values, self.top_k, dim=1).indices.cpu().tolist()
+
+    def __goto(self, node: _BeamNode) -> None:
+        """Brings the env to the state of ``node``, taking a snapshot at every step of the way."""
+        suffix: list[_BeamNode] = []
+        common = node
+        while common.depth >= len(self.__path) or self.__path[common.depth] is not common:
+            suffix.append(common)
+            common = common.parent  # type: ignore
+
+        if len(suffix) == 0 and common is self.__path[-1]:
+            return
+
+        del self.__path[common.depth + 1 :]
+        del self.__path_snapshots[common.depth + 1 :]
+        self.env.restore(self.__path_snapshots[-1])
+        for step_node in reversed(suffix):
+            self.env.step(step_node.action)
+            self.__path.append(step_node)
+            self.__path_snapshots.append(self.env.snapshot())
+
+    def __actions(self, node: _BeamNode) -> list[int]:
+        actions = []
+        while node.parent is not None:
+            actions.append(node.action)
+            node = node.parent
+
+        return actions[::-1]
+
+
+def _copy_observation(observation: Any) -> Any:
+    """Observations outlive the env step that made them, so they must not share the env's reused buffers."""
+    if isinstance(observation, dict):
+        return {key: np.copy(value) for key, value in observation.items()}
+
+    return np.copy(observation)
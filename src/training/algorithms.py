@@ -0,0 +1,65 @@
+import os
+from typing import Any
+from sb3_contrib import QRDQN, MaskablePPO
+from src.environment.metro_map_env import MetroMapEnv
+
+ALGORITHMS: dict[str, type[QRDQN] | type[MaskablePPO]] = {"qrdqn": QRDQN, "maskable_ppo": MaskablePPO}
+ALGORITHM_FILE_NAME = "algorithm.txt"
+# Models trained before the algorithm was recorded next to them are all QRDQN
+DEFAULT_ALGORITHM = "qrdqn"
+
+
+def make_model(
+    algorithm: str, env: Any, num_envs: int, tensorboard_log: str, device: str, seed: int | None = None
+) -> QRDQN | MaskablePPO:
+    """The untrained model of ``algorithm`` that every training entry point starts from, for ``num_envs`` envs."""
+    assert algorithm in ALGORITHMS, f"Unknown algorithm {algorithm}, expected one of {', '.join(ALGORITHMS)}"
+
+    if algorithm == "maskable_ppo":
+        return MaskablePPO("MultiInputPolicy", env, tensorboard_log=tensorboard_log, device=device, seed=seed)
+
+    return QRDQN(
+        "MultiInputPolicy",
+        env,
+        tensorboard_log=tensorboard_log,
+        device=device,
+        seed=seed,
+        # train_freq counts steps of the whole batch, so this keeps one update per 4 transitions
+        gradient_steps=num_envs,
+    )
+
+
+def save_algorithm(models_dir: str, algorithm: str) -> None:
+    """Records which algorithm trains the models saved to ``models_dir``, so ``load_model`` can load them."""
+    assert algorithm in ALGORITHMS, f"Unknown algorithm {algorithm}, expected one of {', '.join(ALGORITHMS)}"
+
+    os.makedirs(models_dir, exist_ok=True)
+    with open(os.path.join(models_dir, ALGORITHM_FILE_NAME), "w") as algorithm_file:
+        algorithm_file.write(algorithm)
+
+
+def model_algorithm(models_dir: str) -> str:
+    path = os.path.join(models_dir, ALGORITHM_FILE_NAME)
+    if not os.path.exists(path):
+        return DEFAULT_ALGORITHM
+
+    with open(path) as algorithm_file:
+        algorithm = algorithm_file.read().strip()
+
+    assert algorithm in ALGORITHMS, f"{path} names the unknown algorithm {algorithm}"
+    return algorithm
+
+
+def load_model(path: str, env: Any = None, device: str = "auto") -> QRDQN | MaskablePPO:
+    """Loads the model at ``path`` with the algorithm recorded in its directory."""
+    return ALGORITHMS[model_algorithm(os.path.dirname(path))].load(path, env, device=device)
+
+
+def predict(model: QRDQN | MaskablePPO, obs: Any, env: MetroMapEnv) -> int:
+    """The deterministic action of ``model`` in ``env``, restricted to the env's ``action_masks`` for MaskablePPO."""
+    if isinstance(model, MaskablePPO):
+        action, _ = model.predict(obs, deterministic=True, action_masks=env.action_masks())
+    else:
+        action, _ = model.predict(obs, deterministic=True)
+
+    return int(action)
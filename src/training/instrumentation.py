@@ -0,0 +1,40 @@
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import VecEnv, VecEnvWrapper
+from src.utils.instrumentation import merge_snapshots
+
+
+class InstrumentationCallback(BaseCallback):
+    """
+    Records the phase timings of instrumented envs in the SB3 logger every ``log_freq`` calls to ``env.step``, under
+    ``instrumentation/<phase>/...``. They are written to TensorBoard with the algorithm's own logs, so every dump
+    shows the timings of the last ``log_freq`` steps before it.
+
+    Works with any ``VecEnv`` whose envs have ``pop_instrumentation_stats`` (``MetroMapEnv`` behind ``DummyVecEnv`` or
+    ``SubprocVecEnv``, or ``MetroMapVecEnv`` itself). Instrumentation has to be enabled on the envs separately.
+    """
+
+    def __init__(self, log_freq: int = 1000, verbose: int = 0) -> None:
+        super().__init__(verbose)
+        self.log_freq = log_freq
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.log_freq == 0:
+            self.__log_stats()
+
+        return True
+
+    def __log_stats(self) -> None:
+        assert self.training_env is not None
+
+        venv: VecEnv = self.training_env
+        while isinstance(venv, VecEnvWrapper):
+            venv = venv.venv
+
+        if hasattr(venv, "pop_instrumentation_stats"):
+            snapshots = [venv.pop_instrumentation_stats()]
+        else:
+            snapshots = venv.env_method("pop_instrumentation_stats")
+
+        for key, value in merge_snapshots(snapshots).items():
+            # Kept out of the stdout table, where the long phase names would collide once truncated
+            self.logger.record(f"instrumentation/{key}", value, exclude="stdout")
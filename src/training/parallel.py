@@ -0,0 +1,82 @@
+import os
+import shutil
+import signal
+import tempfile
+from typing import Callable
+import gymnasium as gym
+from pandas import DataFrame  # type: ignore
+from stable_baselines3.common.monitor import Monitor
+from src.data_handling.columnar import write_columnar_table, read_columnar_table
+from src.data_handling.parser import StopsPerRouteParser, StopsParser
+from src.environment.metro_map_env import MetroMapEnv
+from src.environment.random_options import RandomOptions
+from src.models.env_data import EnvDataDef
+
+ROUTES_TABLE_NAME = "stops_per_route"
+STOPS_TABLE_NAME = "stops"
+
+
+class SharedMapData:
+    """
+    Stop and route tables written once to memory-mapped column files, for env workers to attach to.
+
+    Workers map the same files read-only, so the tables live in the page cache once no matter how many workers
+    there are. A temporary directory is used (and removed again on ``close``) unless ``directory`` is given.
+    """
+
+    def __init__(self, routes_data: DataFrame, stops_data: DataFrame, directory: str | None = None) -> None:
+        self.__owns_directory = directory is None
+        self.directory = directory if directory is not None else tempfile.mkdtemp(prefix="metro_map_tables_")
+
+        write_columnar_table(routes_data, os.path.join(self.directory, ROUTES_TABLE_NAME))
+        write_columnar_table(stops_data, os.path.join(self.directory, STOPS_TABLE_NAME))
+
+    def close(self) -> None:
+        if self.__owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> "SharedMapData":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def attach_random_options(
+    training_data: dict[str, EnvDataDef], tables_dir: str, cache_dir: str | None = None
+) -> RandomOptions:
+    routes_parser = StopsPerRouteParser(read_columnar_table(os.path.join(tables_dir, ROUTES_TABLE_NAME)))
+    stops_parser = StopsParser(read_columnar_table(os.path.join(tables_dir, STOPS_TABLE_NAME)))
+
+    return RandomOptions(training_data, cache_dir=cache_dir, routes_parser=routes_parser, stops_parser=stops_parser)
+
+
+def make_worker_env(
+    rank: int,
+    seed: int,
+    training_data: dict[str, EnvDataDef],
+    tables_dir: str,
+    max_steps: int,
+    cache_dir: str | None = None,
+    instrument: bool = False,
+) -> Callable[[], gym.Env]:
+    """
+    Returns a factory for the env of worker ``rank``, to be called inside the worker process.
+
+    Each worker is seeded with ``seed + rank`` and ignores SIGINT, leaving shutdown to the parent process. With
+    ``instrument`` the env times its phases, for ``InstrumentationCallback`` to collect.
+    """
+
+    def _init() -> gym.Env:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        random_options = attach_random_options(training_data, tables_dir, cache_dir)
+        env = MetroMapEnv(training_data=training_data, max_steps=max_steps, random_options=random_options)
+        if instrument:
+            env.enable_instrumentation()
+        env.reset(seed=seed + rank)
+        env.action_space.seed(seed + rank)
+
+        return Monitor(env)  # type: ignore
+
+    return _init
@@ -0,0 +1,180 @@
+import json
+import os
+import shutil
+import signal
+import time
+from dataclasses import dataclass
+from typing import Any
+import cv2  # type: ignore
+import torch as th
+from sb3_contrib import QRDQN, MaskablePPO
+from src.data_handling.load import load_training_data
+from src.environment.metro_map_env import MetroMapEnv
+from src.environment.random_options import RandomOptions
+from src.environment.trajectory_recorder import TrajectoryRecorder
+from src.training.algorithms import load_model, predict
+
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass(frozen=True)
+class ProductionJob:
+    version: str
+    map_id: str
+    checkpoint: str
+
+    @property
+    def key(self) -> str:
+        return f"v{self.version}/{self.map_id}/{self.checkpoint}"
+
+    @property
+    def model_path(self) -> str:
+        return os.path.join(model_dir(self.version), f"{self.checkpoint}.zip")
+
+    @property
+    def image_name(self) -> str:
+        return f"RewardFunctions_v{self.version}_{self.map_id}_{self.checkpoint}.png"
+
+    @property
+    def trajectory_name(self) -> str:
+        return f"RewardFunctions_v{self.version}_{self.map_id}_{self.checkpoint}.traj"
+
+
+def model_dir(version: str) -> str:
+    return f"./generated_models/RewardFunctions_v{version}"
+
+
+def log_dir(version: str) -> str:
+    return f"./logs/RewardFunctions_v{version}_logs"
+
+
+# Set up once per worker process by ``init_worker``
+_worker_env: MetroMapEnv | None = None
+_worker_models: dict[str, tuple[float, QRDQN | MaskablePPO]] = {}
+
+
+def init_worker(training_data_path: str, max_steps: int, cache_dir: str | None = None) -> None:
+    """Builds the env a producer process reuses for all of its jobs."""
+    global _worker_env
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Every process runs its own rollouts, so intra-op threads would only compete with the other workers
+    th.set_num_threads(1)
+
+    training_data = load_training_data(training_data_path)
+    random_options = RandomOptions(training_data, cache_dir=cache_dir)
+    _worker_env = MetroMapEnv(
+        training_data=training_data, max_steps=max_steps, render_mode="rgb_array", random_options=random_options
+    )
+
+
+def produce_map(job: ProductionJob, out_dir: str, record: bool = False) -> dict[str, Any]:
+    """
+    Runs the greedy rollout of ``job`` on CPU, saves its map to ``out_dir`` and returns its manifest entry. With
+    ``record`` the rollout is also saved as a trajectory next to the map, to be replayed by ``TrajectoryReplayer``.
+    """
+    assert _worker_env is not None, "Call init_worker in the process first"
+
+    start = time.perf_counter()
+    model_mtime = os.path.getmtime(job.model_path)
+    model = __load_model(job.model_path, model_mtime)
+
+    os.makedirs(out_dir, exist_ok=True)
+    env = _worker_env
+    if record:
+        trajectory_path = os.path.join(out_dir, job.trajectory_name)
+        if os.path.exists(trajectory_path):
+            os.remove(trajectory_path)
+        env.recorder = TrajectoryRecorder(trajectory_path)
+
+    obs, info = env.reset(options={"env_data_def": job.map_id})
+    terminated, truncated = False, False
+    reward = 0.0
+    steps = 0
+
+    while not terminated and not truncated:
+        action = predict(model, obs, env)
+        obs, step_reward, terminated, truncated, info = env.step(action)
+        reward += float(step_reward)
+        steps += 1
+
+    if env.recorder is not None:
+        env.recorder.close()
+        env.recorder = None
+
+    cv2.imwrite(os.path.join(out_dir, job.image_name), cv2.cvtColor(env.render(), cv2.COLOR_RGB2BGR))  # type: ignore
+
+    return {
+        "version": job.version,
+        "map_id": job.map_id,
+        "checkpoint": job.checkpoint,
+        "model_mtime": model_mtime,
+        "reward": reward,
+        "steps": steps,
+        "termination_reason": info["termination_reason"],
+        "image": job.image_name,
+        "trajectory": job.trajectory_name if record else None,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def __load_model(path: str, mtime: float) -> QRDQN | MaskablePPO:
+    cached = _worker_models.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_model(path, device="cpu"))
+        _worker_models[path] = cached
+
+    return cached[1]
+
+
+def load_manifest(out_dir: str) -> dict[str, dict[str, Any]]:
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def write_manifest(out_dir: str, manifest: dict[str, dict[str, Any]]) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, MANIFEST_NAME)
+
+    # Written to a temporary file first, so an interrupted run never leaves a truncated manifest behind
+    with open(f"{path}.tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def is_up_to_date(job: ProductionJob, manifest: dict[str, dict[str, Any]], out_dir: str) -> bool:
+    entry = manifest.get(job.key)
+    if entry is None or not os.path.exists(os.path.join(out_dir, job.image_name)):
+        return False
+
+    return entry["model_mtime"] == os.path.getmtime(job.model_path)
+
+
+def sync_file(source: str, destination_dir: str) -> bool:
+    """Copies ``source`` into ``destination_dir`` unless an identical-looking copy is already there."""
+    destination = os.path.join(destination_dir, os.path.basename(source))
+    source_stat = os.stat(source)
+    if os.path.exists(destination):
+        destination_stat = os.stat(destination)
+        if destination_stat.st_size == source_stat.st_size and destination_stat.st_mtime >= source_stat.st_mtime:
+            return False
+
+    os.makedirs(destination_dir, exist_ok=True)
+    shutil.copy2(source, destination)
+
+    return True
+
+
+def sync_tree(source_dir: str, destination_dir: str) -> int:
+    """Mirrors the files of ``source_dir`` that are new or changed into ``destination_dir``, returning their count."""
+    copied = 0
+    for root, _, file_names in os.walk(source_dir):
+        target_dir = os.path.join(destination_dir, os.path.relpath(root, source_dir))
+        for file_name in file_names:
+            copied += sync_file(os.path.join(root, file_name), target_dir)
+
+    return copied
@@ -0,0 +1,188 @@
+import importlib.util
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator
+import numpy as np
+from src.environment import batched_score_funcs, score_funcs
+from src.environment.metro_map_env import MetroMapEnv
+from src.models.trajectory import Trajectory
+
+
+@dataclass(frozen=True)
+class RewardVersion:
+    """
+    An alternative reward structure: ``constants`` overrides the ``C_*`` constants (or ``STOP_PLACEMENT_RADIUS``) of
+    ``score_funcs``, and ``functions`` replaces reward functions by name with array versions taking the same
+    arguments. Everything else is scored by ``batched_score_funcs``, or ``score_funcs`` where it has no array version.
+    """
+
+    name: str
+    constants: dict[str, float] = field(default_factory=dict)
+    functions: dict[str, Callable[..., np.ndarray]] = field(default_factory=dict)
+
+    @contextmanager
+    def applied(self) -> Iterator[None]:
+        """Sets ``constants`` on ``score_funcs`` for the duration of the block."""
+        for name in self.constants.keys():
+            assert hasattr(score_funcs, name), f"score_funcs has no constant {name}"
+
+        previous = {name: getattr(score_funcs, name) for name in self.constants.keys()}
+        try:
+            for name, value in self.constants.items():
+                setattr(score_funcs, name, value)
+            yield
+        finally:
+            for name, value in previous.items():
+                setattr(score_funcs, name, value)
+
+
+@dataclass(frozen=True)
+class RewardTrace:
+    """
+    The arguments of every reward function call made while replaying a batch of trajectories.
+
+    ``calls`` maps each function name to the global step index of every call and its arguments, one array per
+    argument. Steps of episode ``i`` are ``episode_offsets[i]:episode_offsets[i + 1]``, and ``rewards`` holds the
+    reward the env returned for each of them.
+    """
+
+    map_ids: list[str]
+    episode_offsets: np.ndarray
+    rewards: np.ndarray
+    calls: dict[str, tuple[np.ndarray, tuple[np.ndarray, ...]]]
+
+    @property
+    def num_steps(self) -> int:
+        return len(self.rewards)
+
+
+class _TracedScoreFuncs:
+    """Stands in for ``score_funcs`` on an env, logging every call before scoring it as usual."""
+
+    def __init__(self) -> None:
+        self.step = 0
+        self.calls: dict[str, tuple[list[int], list[tuple[Any, ...]]]] = {}
+        self.__functions: dict[str, Callable[..., float]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(score_funcs, name)
+        if not callable(value):
+            return value
+
+        traced = self.__functions.get(name)
+        if traced is None:
+            steps, arguments = self.calls.setdefault(name, ([], []))
+
+            def traced(*args: Any) -> float:
+                steps.append(self.step)
+                arguments.append(args)
+                return value(*args)
+
+            self.__functions[name] = traced
+
+        return traced
+
+
+def trace_rewards(env: MetroMapEnv, trajectories: Iterable[Trajectory]) -> RewardTrace:
+    """
+    Replays ``trajectories`` on ``env`` (built like the env that recorded them) and records every reward call.
+
+    Only the rewards are relabeled later on, the episodes themselves always play out as recorded. Reward functions
+    the env does not call (such as the commented out ones, or ``stop_adjacency`` without ``adjacency_features``)
+    leave no calls to relabel.
+    """
+    traced = _TracedScoreFuncs()
+    map_ids: list[str] = []
+    episode_offsets = [0]
+    rewards: list[float] = []
+
+    previous = vars(env).get("score_funcs")
+    env.score_funcs = traced
+    try:
+        for trajectory in trajectories:
+            env.reset(seed=trajectory.seed, options=trajectory.reset_options)
+            for action in trajectory.actions.tolist():
+                traced.step = len(rewards)
+                _, reward, _, _, _ = env.step(action)
+                rewards.append(float(reward))
+
+            map_ids.append(trajectory.map_id)
+            episode_offsets.append(len(rewards))
+    finally:
+        if previous is None:
+            del env.score_funcs
+        else:
+            env.score_funcs = previous
+
+    calls = {}
+    for name, (steps, arguments) in traced.calls.items():
+        columns = tuple(np.asarray(column) for column in zip(*arguments)) if len(arguments) > 0 else ()
+        calls[name] = (np.asarray(steps, dtype=np.int64), columns)
+
+    return RewardTrace(map_ids, np.asarray(episode_offsets, dtype=np.int64), np.asarray(rewards), calls)
+
+
+def relabel(trace: RewardTrace, version: RewardVersion) -> np.ndarray:
+    """The reward of every step of ``trace`` under ``version``."""
+    rewards = np.zeros((trace.num_steps,), dtype=np.float64)
+
+    with version.applied():
+        for name, (steps, arguments) in trace.calls.items():
+            if len(steps) == 0:
+                continue
+
+            function = version.functions.get(name, getattr(batched_score_funcs, name, None))
+            if function is not None:
+                values = function(*arguments) if len(arguments) > 0 else function()
+            else:
+                scalar_function = getattr(score_funcs, name)
+                if len(arguments) == 0:
+                    values = scalar_function()
+                else:
+                    values = np.fromiter(
+                        (scalar_function(*args) for args in zip(*arguments)), dtype=np.float64, count=len(steps)
+                    )
+
+            rewards += np.bincount(steps, weights=np.broadcast_to(values, steps.shape), minlength=trace.num_steps)
+
+    return rewards
+
+
+def episode_returns(trace: RewardTrace, rewards: np.ndarray) -> np.ndarray:
+    cumulative = np.concatenate([[0.0], np.cumsum(rewards)])
+
+    return cumulative[trace.episode_offsets[1:]] - cumulative[trace.episode_offsets[:-1]]
+
+
+def return_stats(trace: RewardTrace, returns: np.ndarray) -> dict[str, Any]:
+    stats: dict[str, Any] = {
+        "episodes": len(returns),
+        "mean": float(returns.mean()),
+        "std": float(returns.std()),
+        "min": float(returns.min()),
+        "median": float(np.median(returns)),
+        "max": float(returns.max()),
+    }
+
+    map_ids = np.asarray(trace.map_ids)
+    stats["per_map"] = {map_id: float(returns[map_ids == map_id].mean()) for map_id in sorted(set(trace.map_ids))}
+
+    return stats
+
+
+def load_versions(path: str) -> list[RewardVersion]:
+    """
+    Reads reward versions from a JSON file of ``{name: {constant: value}}``, or from a Python file defining
+    ``VERSIONS``, a list of ``RewardVersion`` (needed to replace reward functions, not just constants).
+    """
+    if path.endswith(".json"):
+        with open(path) as versions_file:
+            return [RewardVersion(name, constants) for name, constants in json.load(versions_file).items()]
+
+    spec = importlib.util.spec_from_file_location("reward_versions", path)
+    assert spec is not None and spec.loader is not None, f"Could not load reward versions from {path}"
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return list(module.VERSIONS)
@@ -0,0 +1,86 @@
+from functools import wraps
+from typing import Any, Callable
+import time
+
+
+class Instrumentation:
+    """
+    Accumulates wall-clock time and call counts per named phase.
+
+    Methods are only timed once ``wrap`` has replaced them on a specific object, so nothing pays for instrumentation
+    unless it was explicitly turned on for it. Phases are inclusive: a phase called from inside another is counted in
+    both.
+    """
+
+    def __init__(self) -> None:
+        self.__stats: dict[str, list[float]] = {}
+        self.__counters: dict[str, int] = {}
+
+    def wrap(self, target: Any, phases: dict[str, str]) -> None:
+        """Times the methods of ``target`` named by the keys of ``phases`` under the phase each is mapped to."""
+        for method_name, phase in phases.items():
+            method = getattr(target, method_name)
+            # Marked on the wrapper itself, so the check lives and dies with the target
+            if getattr(method, "_instrumentation", None) is self:
+                continue
+
+            wrapper = self.timed(phase, method)
+            wrapper._instrumentation = self  # type: ignore
+            setattr(target, method_name, wrapper)
+
+    def timed(self, phase: str, func: Callable) -> Callable:
+        stats = self.__stats.setdefault(phase, [0.0, 0])
+        perf_counter = time.perf_counter
+
+        @wraps(func)
+        def timed_wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats[0] += perf_counter() - start
+                stats[1] += 1
+
+        return timed_wrapper
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        self.__counters[counter] = self.__counters.get(counter, 0) + amount
+
+    def snapshot(self) -> dict[str, float]:
+        snapshot: dict[str, float] = {}
+        for phase, (total, calls) in self.__stats.items():
+            snapshot[f"{phase}/total_ms"] = total * 1000
+            snapshot[f"{phase}/calls"] = calls
+
+        for counter, amount in self.__counters.items():
+            snapshot[counter] = amount
+
+        return snapshot
+
+    def clear(self) -> None:
+        # The wrappers hold on to their lists, so these are zeroed in place rather than replaced
+        for stats in self.__stats.values():
+            stats[0], stats[1] = 0.0, 0
+
+        self.__counters.clear()
+
+    def pop(self) -> dict[str, float]:
+        snapshot = self.snapshot()
+        self.clear()
+
+        return snapshot
+
+
+def merge_snapshots(snapshots: list[dict[str, float]]) -> dict[str, float]:
+    """Sums snapshots (e.g. one per env) and adds the mean time per call of every phase."""
+    merged: dict[str, float] = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            merged[key] = merged.get(key, 0) + value
+
+    for key in [key for key in merged if key.endswith("/total_ms")]:
+        phase = key.removesuffix("/total_ms")
+        calls = merged.get(f"{phase}/calls", 0)
+        merged[f"{phase}/mean_us"] = merged[key] * 1000 / calls if calls > 0 else 0.0
+
+    return merged
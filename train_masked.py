@@ -0,0 +1,11 @@
+from main import train
+
+
+def main() -> None:
+    """Runs ``main.py``'s training with MaskablePPO on the env's ``action_masks``, so no steps go to certain overlaps."""
+    # PPO with an MLP policy trains faster on the CPU than on a GPU
+    train(version=29, algorithm="maskable_ppo", num_envs=16, device="cpu")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import os
+import signal
+from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.callbacks import EvalCallback, BaseCallback
+from src.environment import MetroMapEnv
+from src.environment.random_options import RandomOptions
+from src.data_handling.load import load_training_data
+from src.training.parallel import SharedMapData, make_worker_env, attach_random_options
+from src.training.algorithms import make_model, save_algorithm
+from src.training.instrumentation import InstrumentationCallback
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train QRDQN with environment workers in a process pool.")
+    parser.add_argument("--version", type=int, default=28)
+    parser.add_argument("--timesteps", type=int, default=10000000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=8000)
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--instrument", action="store_true", help="Log per-phase env timings to TensorBoard")
+    args = parser.parse_args()
+
+    assert args.workers > 0, "You must run at least one worker"
+
+    models_dir = f"./generated_models/RewardFunctions_v{args.version}"
+    log_dir = f"./logs/RewardFunctions_v{args.version}_logs"
+    episode_cache_dir = "./src/data/cache"
+
+    os.makedirs(log_dir, exist_ok=True)
+    save_algorithm(models_dir, "qrdqn")
+
+    # Turn SIGTERM into the same clean shutdown path as Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    training_data = load_training_data("./src/data/train_data.json")
+
+    random_options = RandomOptions(training_data, cache_dir=episode_cache_dir)
+    random_options.precompile()
+
+    with SharedMapData(random_options.routes_parser.data, random_options.stops_parser.data) as shared_data:
+        # Workers and the eval env read the shared copy from here on
+        del random_options
+
+        env = SubprocVecEnv(
+            [
+                make_worker_env(
+                    rank,
+                    args.seed,
+                    training_data,
+                    shared_data.directory,
+                    args.max_steps,
+                    episode_cache_dir,
+                    instrument=args.instrument,
+                )
+                for rank in range(args.workers)
+            ],
+            # spawn is available on every platform, and the workers reattach to the tables through shared_data
+            start_method="spawn",
+        )
+
+        eval_env = MetroMapEnv(
+            training_data=training_data,
+            max_steps=args.max_steps,
+            random_options=attach_random_options(training_data, shared_data.directory, episode_cache_dir),
+        )
+        eval_env.reset(seed=args.seed + args.workers)
+
+        eval_callback = EvalCallback(
+            Monitor(eval_env),  # type: ignore
+            best_model_save_path=models_dir,
+            eval_freq=max(50000 // args.workers, 1),
+            n_eval_episodes=5,
+        )
+        callbacks: list[BaseCallback] = [eval_callback]
+        if args.instrument:
+            callbacks.append(InstrumentationCallback())
+
+        model = make_model("qrdqn", env, args.workers, log_dir, args.device, seed=args.seed)
+
+        try:
+            model.learn(
+                callback=callbacks,
+                total_timesteps=args.timesteps,
+                log_interval=2,
+                tb_log_name=f"RewardFunctions_v{args.version}",
+                progress_bar=True,
+            )
+            model.save(os.path.join(models_dir, "final_model"))
+        except KeyboardInterrupt:
+            model.save(os.path.join(models_dir, "interrupted_model"))
+        finally:
+            env.close()
+
+
+if __name__ == "__main__":
+    main()